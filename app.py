@@ -1,7 +1,18 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, session
+import time
+
+_START = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, session, Response, stream_with_context
+import json
 import os
-from mieten import fuehre_mietabgleich_durch
-import traceback
+import re
+import threading
+from jobs import JobQueue, QueueFull
+from ergebnis_cache import ErgebnisCache
+from konto_cache import KontoCache, arrow_verfuegbar
+from messung import Fortschritt, Messung, MetrikRegister
+from vorladen import LADEZEITEN, lade_abgleich, vorladen
+from werkzeug.utils import secure_filename
 from datetime import timedelta, datetime
 
 UPLOAD_FOLDER = "uploads"
@@ -14,6 +25,57 @@ app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["RESULTS_FOLDER"] = RESULTS_FOLDER
 app.secret_key = os.environ.get("SECRET_KEY", "please-change-me-very-secret")
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(minutes=60)
+# Parallel laufende Mietabgleiche und max. Anzahl wartender Aufträge (danach HTTP 429)
+app.config["MAX_PARALLEL_JOBS"] = int(os.environ.get("MAX_PARALLEL_JOBS", "2"))
+app.config["MAX_QUEUED_JOBS"] = int(os.environ.get("MAX_QUEUED_JOBS", "10"))
+# Laufzeitmessung je Phase (Antwort von /jobs/<id> und /metrics); METRIKEN=0 schaltet sie ab
+app.config["METRIKEN"] = os.environ.get("METRIKEN", "1") != "0"
+# /metrics verlangt wie alle Seiten eine Anmeldung; METRICS_PUBLIC=1 gibt es ohne frei (z. B. für Prometheus
+# hinter einer Firewall)
+app.config["METRICS_PUBLIC"] = os.environ.get("METRICS_PUBLIC") == "1"
+# /jobs/<id>/events: Kommentarzeile nach so vielen Sekunden ohne neuen Zwischenstand (hält Proxys offen)
+app.config["SSE_PING_SECONDS"] = 15
+# Uploads werden nach dem Lauf gelöscht, Ergebnisse (und Aufträge in der Warteschlange) nach JOB_TTL_SECONDS
+app.config["JOB_TTL_SECONDS"] = int(os.environ.get("JOB_TTL_SECONDS", "3600"))
+AUFRAEUMEN_INTERVALL = 60
+
+# Dateinamen je Auftrag (Präfix = Zeitstempel mit Mikrosekunden, siehe process); nur diese räumt _raeume_auf ab
+_UPLOAD_DATEI = re.compile(r"\d{20}_.+")
+_ERGEBNIS_DATEI = re.compile(r"mieten_abgleich_\d{20}\.xlsx")
+
+job_queue = JobQueue(
+    max_workers=app.config["MAX_PARALLEL_JOBS"],
+    max_queued=app.config["MAX_QUEUED_JOBS"],
+    keep_seconds=app.config["JOB_TTL_SECONDS"],
+)
+# Probeläufe mit /process?format=ndjson laufen im Anfrage-Thread; höchstens so viele gleichzeitig (sonst HTTP 429)
+ndjson_plaetze = threading.BoundedSemaphore(app.config["MAX_PARALLEL_JOBS"])
+
+# Ergebnis-Cache für wiederholt hochgeladene Dateipaare (Größe in MB, Alter in Tagen)
+ergebnis_cache = ErgebnisCache(
+    os.path.join(RESULTS_FOLDER, "cache"),
+    max_bytes=int(os.environ.get("RESULT_CACHE_MB", "500")) * 1024 * 1024,
+    max_alter_sekunden=int(os.environ.get("RESULT_CACHE_DAYS", "30")) * 24 * 3600,
+)
+
+# Aufbereitete Kontoauszüge (Arrow IPC) für erneute Läufe mit anderer Mieterliste; braucht pyarrow, KONTO_CACHE_MB=0 schaltet ab
+konto_cache = (
+    KontoCache(
+        os.path.join(RESULTS_FOLDER, "konto_cache"),
+        max_bytes=int(os.environ.get("KONTO_CACHE_MB", "1000")) * 1024 * 1024,
+        max_alter_sekunden=int(os.environ.get("RESULT_CACHE_DAYS", "30")) * 24 * 3600,
+    )
+    if arrow_verfuegbar() and os.environ.get("KONTO_CACHE_MB") != "0"
+    else None
+)
+
+metriken = MetrikRegister()
+
+# Verlauf der Buchungen und Zuordnungen in SQLite (optional, z. B. HISTORIE_DB=results/historie.sqlite)
+historie = None
+if os.environ.get("HISTORIE_DB"):
+    from historie import Historie
+    historie = Historie(os.environ["HISTORIE_DB"])
 
 # Upload-Verzeichnis erzeugen
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -24,6 +86,8 @@ os.makedirs(RESULTS_FOLDER, exist_ok=True)
 @app.before_request
 def require_login():
     open_endpoints = {"login", "static"}
+    if app.config["METRICS_PUBLIC"]:
+        open_endpoints.add("metrics")
     if request.endpoint in open_endpoints or request.endpoint is None:
         return
     if not session.get("user_email"):
@@ -65,38 +129,251 @@ def index():
     return render_template("upload.html")
 
 
+def _entferne(pfade):
+    for p in pfade:
+        if os.path.exists(p):
+            os.remove(p)
+
+
+_aufgeraeumt = 0.0
+_aufraeumen_lock = threading.Lock()
+
+
+def _raeume_auf():
+    # abgelaufene Ergebnisse und liegengebliebene Uploads (z. B. vor dem Start abgebrochener Aufträge) löschen,
+    # höchstens alle AUFRAEUMEN_INTERVALL Sekunden
+    global _aufgeraeumt
+    with _aufraeumen_lock:
+        if time.time() - _aufgeraeumt < AUFRAEUMEN_INTERVALL:
+            return
+        _aufgeraeumt = time.time()
+    grenze = time.time() - app.config["JOB_TTL_SECONDS"]
+    for ordner, muster in ((UPLOAD_FOLDER, _UPLOAD_DATEI), (RESULTS_FOLDER, _ERGEBNIS_DATEI)):
+        with os.scandir(ordner) as eintraege:
+            for e in eintraege:
+                if e.is_file(follow_symlinks=False) and muster.fullmatch(e.name) and e.stat().st_mtime < grenze:
+                    try:
+                        os.remove(e.path)
+                    except FileNotFoundError:
+                        pass
+
+
+def _run_abgleich(job, excel_path, konto_paths, result_path, inkrementell=False, unscharf=False):
+    messung = Messung() if app.config["METRIKEN"] else None
+    status = "error"
+    try:
+        # pandas/openpyxl erst beim ersten Auftrag laden (oder vorab mit VORLADEN=1)
+        fuehre_mietabgleich_durch = lade_abgleich()
+        metriken.setze("stack_laden_seconds", LADEZEITEN["laden"])
+        result_path = fuehre_mietabgleich_durch(
+            excel_path, konto_paths, result_path, abbruch=job.cancel_event, cache=ergebnis_cache,
+            inkrementell=inkrementell, messung=messung, unscharf=unscharf, historie=historie,
+            konto_cache=konto_cache, fortschritt=Fortschritt(job.melde),
+        )
+        if not result_path or not os.path.exists(result_path):
+            raise RuntimeError("Ergebnisdatei wurde nicht erstellt.")
+        status = "ok"
+        return result_path
+    finally:
+        # Eingaben werden nach dem Lauf nicht mehr gebraucht
+        _entferne([excel_path, *konto_paths])
+        if messung is not None:
+            messung.ende()
+            if job.cancel_event.is_set():
+                status = "cancelled"
+            metriken.erfasse(messung, status)
+            job.info["metriken"] = messung.to_dict()
+
+
+def _job_json(job):
+    data = job.to_dict()
+    data["status_url"] = url_for("job_status", job_id=job.id)
+    data["events_url"] = url_for("job_events", job_id=job.id)
+    if job.status == "done":
+        data["download"] = f"/results/{os.path.basename(job.result)}"
+        data["result_url"] = url_for("job_result", job_id=job.id)
+    return data
+
+
+def _ndjson_zeile(daten):
+    return json.dumps(daten, ensure_ascii=False) + "\n"
+
+
+def _ndjson_abgleich(excel_path, konto_paths, inkrementell=False, unscharf=False):
+    # Zuordnungen als NDJSON, sobald sie feststehen; letzte Zeile {"typ": "ende", ...} oder {"typ": "fehler", ...}
+    messung = Messung() if app.config["METRIKEN"] else None
+    status = "error"
+    anzahl = 0
+    try:
+        mietabgleich_entscheidungen = lade_abgleich("mietabgleich_entscheidungen")
+        metriken.setze("stack_laden_seconds", LADEZEITEN["laden"])
+        for entscheidung in mietabgleich_entscheidungen(
+            excel_path, konto_paths, inkrementell=inkrementell, unscharf=unscharf, messung=messung,
+            konto_cache=konto_cache,
+        ):
+            anzahl += 1
+            yield _ndjson_zeile({"typ": "zuordnung", **entscheidung})
+        status = "ok"
+        ende = {"typ": "ende", "zuordnungen": anzahl}
+        if messung is not None:
+            messung.ende()
+            ende["metriken"] = messung.to_dict()
+        yield _ndjson_zeile(ende)
+    except Exception as e:
+        yield _ndjson_zeile({"typ": "fehler", "message": str(e)})
+    finally:
+        if messung is not None:
+            messung.ende()
+            metriken.erfasse(messung, status)
+
+
+def _ndjson_fertig(pfade):
+    # nach dem Senden (auch bei abgebrochener Verbindung): Platz freigeben, Uploads löschen
+    ndjson_plaetze.release()
+    _entferne(pfade)
+
+
 @app.route("/process", methods=["POST"])
 def process():
-    excel = request.files["excel"]
-    konto_file = request.files["konto"]
+    excel = request.files.get("excel")
+    # Ein oder mehrere Kontoauszüge (werden gemeinsam in einem Durchlauf abgeglichen)
+    konto_files = [f for f in request.files.getlist("konto") if f and f.filename]
 
-    if not excel or not konto_file:
-        return jsonify({"status": "error", "message": "Bitte Excel (Mieter) und Excel (Kontoauszug) hochladen."}), 400
+    if not excel or not konto_files:
+        return jsonify({"status": "error", "message": "Bitte Excel (Mieter) und Kontoauszug (XLSX, CSV oder CAMT) hochladen."}), 400
+    _raeume_auf()
 
-    excel_path = os.path.join(UPLOAD_FOLDER, excel.filename)
-    konto_path = os.path.join(UPLOAD_FOLDER, konto_file.filename)
+    # Eindeutige Dateinamen je Auftrag, damit parallele Läufe sich nicht überschreiben
+    prefix = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    excel_path = os.path.join(UPLOAD_FOLDER, f"{prefix}_{secure_filename(excel.filename) or 'mieter.xlsx'}")
+    konto_paths = [
+        os.path.join(UPLOAD_FOLDER, f"{prefix}_{i}_{secure_filename(f.filename) or 'konto.xlsx'}")
+        for i, f in enumerate(konto_files)
+    ]
+    result_path = os.path.join(RESULTS_FOLDER, f"mieten_abgleich_{prefix}.xlsx")
+
+    # format=ndjson: Probelauf ohne Ergebnisdatei, Zuordnungen werden direkt gestreamt
+    if request.args.get("format") == "ndjson":
+        if not ndjson_plaetze.acquire(blocking=False):
+            return jsonify({"status": "error", "message": "Zu viele Mietabgleiche in Bearbeitung, bitte später erneut versuchen."}), 429
+        try:
+            excel.save(excel_path)
+            for konto_file, konto_path in zip(konto_files, konto_paths):
+                konto_file.save(konto_path)
+        except Exception:
+            _ndjson_fertig([excel_path, *konto_paths])
+            raise
+        zeilen = _ndjson_abgleich(
+            excel_path, konto_paths,
+            inkrementell=request.form.get("inkrementell") in ("1", "on", "true"),
+            unscharf=request.form.get("unscharf") in ("1", "on", "true"),
+        )
+        antwort = Response(stream_with_context(zeilen), mimetype="application/x-ndjson")
+        antwort.call_on_close(lambda: _ndjson_fertig([excel_path, *konto_paths]))
+        return antwort
 
     excel.save(excel_path)
-    konto_file.save(konto_path)
+    for konto_file, konto_path in zip(konto_files, konto_paths):
+        konto_file.save(konto_path)
 
-    # Script aufrufen → Übergib Datei-Pfade
+    # Abgleich im Hintergrund starten → sofort Job-ID zurückgeben
     try:
-        result_path = fuehre_mietabgleich_durch(excel_path, konto_path)
-        if not result_path or not os.path.exists(result_path):
-            return jsonify({"status": "error", "message": "Ergebnisdatei wurde nicht erstellt."}), 500
-
-        download_name = os.path.basename(result_path)
-        return jsonify({
-            "status": "ok",
-            "message": "Mietabgleich abgeschlossen",
-            "download": f"/results/{download_name}"
-        })
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": str(e),
-            "trace": traceback.format_exc()
-        })
+        job = job_queue.submit(
+            _run_abgleich, excel_path, konto_paths, result_path,
+            inkrementell=request.form.get("inkrementell") in ("1", "on", "true"),
+            unscharf=request.form.get("unscharf") in ("1", "on", "true"),
+        )
+    except QueueFull:
+        _entferne([excel_path, *konto_paths])
+        return jsonify({"status": "error", "message": "Zu viele Mietabgleiche in Bearbeitung, bitte später erneut versuchen."}), 429
+
+    return jsonify(_job_json(job)), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Auftrag nicht gefunden"}), 404
+    return jsonify(_job_json(job))
+
+
+def _sse(ereignis, daten):
+    return f"event: {ereignis}\ndata: {json.dumps(daten, ensure_ascii=False)}\n\n"
+
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    # Server-Sent Events: "fortschritt" bei jedem Statuswechsel/Zwischenstand, zum Schluss "ende" mit dem
+    # Auftragsstatus wie /jobs/<id>
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Auftrag nicht gefunden"}), 404
+
+    def ereignisse():
+        version = None
+        while True:
+            neu = job.warte(version, app.config["SSE_PING_SECONDS"])
+            if job.is_finished:
+                yield _sse("ende", _job_json(job))
+                return
+            if neu == version:
+                yield ": ping\n\n"
+                continue
+            version = neu
+            yield _sse("fortschritt", {"status": job.status, **(job.fortschritt or {})})
+
+    return Response(stream_with_context(ereignisse()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Auftrag nicht gefunden"}), 404
+    if job.status != "done":
+        return jsonify(_job_json(job)), 409
+    return download_result(os.path.basename(job.result))
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Auftrag nicht gefunden"}), 404
+    if not job_queue.cancel(job_id):
+        return jsonify(_job_json(job)), 409
+    return jsonify(_job_json(job))
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    statistik = ergebnis_cache.statistik()
+    if konto_cache is not None:
+        statistik["konto"] = konto_cache.statistik()
+    return jsonify(statistik)
+
+
+@app.route("/historie/zahlungen")
+def historie_zahlungen():
+    # zugeordnete Zahlungen aus dem Verlauf, z. B. /historie/zahlungen?jahr=2025&bis=2025-06-30&mieter=hans+mueller
+    # (optional &mappe=<Schlüssel der Mieterliste>, siehe historie.py)
+    if historie is None:
+        return jsonify({"status": "error", "message": "Kein Verlauf konfiguriert (HISTORIE_DB)"}), 404
+    df = historie.zahlungen(
+        jahr=request.args.get("jahr", type=int),
+        mieter=request.args.get("mieter"),
+        bis=request.args.get("bis"),
+        mappe=request.args.get("mappe"),
+    )
+    return jsonify(df.astype(object).where(df.notna(), None).to_dict(orient="records"))
+
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus-Textformat: Histogramme je Phase über alle Läufe seit dem Start
+    return Response(metriken.prometheus_text(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/results/<path:filename>")
@@ -113,5 +390,16 @@ def download_result(filename):
     )
 
 
+# Abgleich-Stack vorab laden, z. B. für gunicorn --preload -w 1 --threads N (Aufträge liegen im Prozess,
+# daher nur ein Worker, siehe vorladen.py)
+if os.environ.get("VORLADEN") == "1":
+    vorladen(gc_einfrieren=True)
+    metriken.setze("stack_laden_seconds", LADEZEITEN["laden"])
+# Startzeit des Moduls (ohne Python-Interpreter), in /metrics als mietabgleich_start_seconds
+startzeit = time.perf_counter() - _START
+metriken.setze("start_seconds", startzeit)
+app.logger.info("Start in %.3fs (Abgleich-Stack vorgeladen: %s)", startzeit, bool(LADEZEITEN))
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
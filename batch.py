@@ -0,0 +1,204 @@
+# Stapelverarbeitung ohne Weboberfläche: viele Mietabgleiche (z. B. nächtlich je Eigentümer) aus einer
+# Auftragsliste, verteilt auf einen Prozess-Pool. Je Auftrag Status und Laufzeit, am Ende eine Zusammenfassung;
+# Exit-Code 1, wenn ein Auftrag fehlschlägt (2 bei fehlerhafter Auftragsliste).
+#
+#   python batch.py auftraege.json --prozesse 8 --bericht bericht.json
+#
+# Auftragsliste als JSON (Liste oder {"jobs": [...]}):
+#   [{"mieter": "eigentuemer_a/Mieter.xlsx", "konto": ["a_jan.csv", "a_feb.xml"], "ergebnis": "out/a.xlsx",
+#     "inkrementell": false, "unscharf": false, "schnell_speichern": false, "historie_mappe": "eigentuemer_a"}, ...]
+# oder als CSV (Semikolon, Kopfzeile mieter;konto;ergebnis, mehrere Auszüge durch "|" getrennt).
+# Relative Pfade gelten relativ zur Auftragsliste.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+JOB_OPTIONEN = ("inkrementell", "unscharf", "schnell_speichern", "suchtreffer_pfad", "konto_engine", "historie_mappe")
+_JA_NEIN = ("inkrementell", "unscharf", "schnell_speichern")
+
+
+class AuftragslisteFehlerhaft(Exception):
+    pass
+
+
+def _pfad(basis, pfad):
+    return pfad if os.path.isabs(pfad) else os.path.normpath(os.path.join(basis, pfad))
+
+
+def lade_auftraege(manifest_pfad) -> list:
+    # Aufträge als Liste von dicts mit absoluten Pfaden: mieter, konto (Liste), ergebnis, Optionen
+    basis = os.path.dirname(os.path.abspath(manifest_pfad))
+    try:
+        if manifest_pfad.lower().endswith(".csv"):
+            with open(manifest_pfad, newline="", encoding="utf-8-sig") as f:
+                roh = [
+                    {**zeile, "konto": [k.strip() for k in (zeile.get("konto") or "").split("|") if k.strip()]}
+                    for zeile in csv.DictReader(f, delimiter=";")
+                ]
+        else:
+            with open(manifest_pfad, encoding="utf-8") as f:
+                roh = json.load(f)
+            if isinstance(roh, dict):
+                roh = roh.get("jobs", [])
+    except (OSError, ValueError) as e:
+        raise AuftragslisteFehlerhaft(f"{manifest_pfad}: {e}") from e
+
+    auftraege = []
+    ergebnisse = set()
+    for nr, eintrag in enumerate(roh, 1):
+        if not isinstance(eintrag, dict):
+            raise AuftragslisteFehlerhaft(f"Auftrag {nr}: Objekt erwartet")
+        konto = eintrag.get("konto")
+        konto = [konto] if isinstance(konto, str) else list(konto or [])
+        if not eintrag.get("mieter") or not konto or not eintrag.get("ergebnis"):
+            raise AuftragslisteFehlerhaft(f"Auftrag {nr}: mieter, konto und ergebnis sind Pflicht")
+        ergebnis = _pfad(basis, eintrag["ergebnis"])
+        if ergebnis in ergebnisse:
+            raise AuftragslisteFehlerhaft(f"Auftrag {nr}: Ergebnisdatei {ergebnis} mehrfach verwendet")
+        ergebnisse.add(ergebnis)
+        auftrag = {
+            "nr": nr,
+            "name": eintrag.get("name") or os.path.splitext(os.path.basename(ergebnis))[0],
+            "mieter": _pfad(basis, eintrag["mieter"]),
+            "konto": [_pfad(basis, k) for k in konto],
+            "ergebnis": ergebnis,
+        }
+        for option in JOB_OPTIONEN:
+            wert = eintrag.get(option)
+            if wert not in (None, ""):
+                if option in _JA_NEIN and isinstance(wert, str):
+                    wert = wert.strip().lower() in ("1", "ja", "true", "on")
+                elif option == "suchtreffer_pfad":
+                    wert = _pfad(basis, wert)
+                auftrag[option] = wert
+        auftraege.append(auftrag)
+    return auftraege
+
+
+# je Worker-Prozess einmal angelegt (SQLite-Verbindung/Cache-Verzeichnis)
+_historie = None
+_konto_cache = None
+
+
+def _initialisiere_worker(historie_pfad, konto_cache_pfad):
+    global _historie, _konto_cache
+    if historie_pfad:
+        from historie import Historie
+        _historie = Historie(historie_pfad)
+    if konto_cache_pfad:
+        from konto_cache import KontoCache
+        _konto_cache = KontoCache(konto_cache_pfad)
+
+
+def fuehre_auftrag_aus(auftrag, optionen) -> dict:
+    # läuft im Worker; Fehler werden als Status zurückgegeben, nicht geworfen
+    from messung import Messung
+    from mieten import fuehre_mietabgleich_durch
+
+    start = time.perf_counter()
+    messung = Messung()
+    ergebnis = {"nr": auftrag["nr"], "name": auftrag["name"], "ergebnis": auftrag["ergebnis"]}
+    try:
+        os.makedirs(os.path.dirname(auftrag["ergebnis"]) or ".", exist_ok=True)
+        kwargs = {**optionen, **{k: auftrag[k] for k in JOB_OPTIONEN if k in auftrag}}
+        pfad = fuehre_mietabgleich_durch(
+            auftrag["mieter"], auftrag["konto"], auftrag["ergebnis"],
+            messung=messung, historie=_historie, konto_cache=_konto_cache, **kwargs,
+        )
+        if not pfad or not os.path.exists(pfad):
+            raise RuntimeError("Mieterliste oder Kontoauszug nicht lesbar, keine Ergebnisdatei erstellt")
+        ergebnis["status"] = "ok"
+    except Exception as e:
+        ergebnis["status"] = "error"
+        ergebnis["message"] = f"{type(e).__name__}: {e}"
+        ergebnis["trace"] = traceback.format_exc()
+    messung.ende()
+    ergebnis["sekunden"] = round(time.perf_counter() - start, 3)
+    ergebnis["metriken"] = messung.to_dict()
+    return ergebnis
+
+
+def fuehre_stapel_aus(auftraege, prozesse=None, optionen=None, historie_pfad=None, konto_cache_pfad=None,
+                      fortschritt=None) -> list:
+    # Ergebnisse in Reihenfolge der Auftragsliste; fortschritt(ergebnis) wird je fertigem Auftrag aufgerufen
+    optionen = optionen or {}
+    prozesse = max(1, min(len(auftraege) or 1, prozesse or os.cpu_count() or 1))
+    # CPUs auf die Aufträge verteilen: ohne Grenze startet jeder Auftrag für mehrere Auszüge bzw. parallel
+    # eigene Prozesse je CPU (bis zu CPUs² Prozesse)
+    optionen = {"max_prozesse": max(1, (os.cpu_count() or 1) // prozesse), **optionen}
+    ergebnisse = {}
+    with ProcessPoolExecutor(max_workers=prozesse, initializer=_initialisiere_worker,
+                             initargs=(historie_pfad, konto_cache_pfad)) as pool:
+        futures = {pool.submit(fuehre_auftrag_aus, a, optionen): a for a in auftraege}
+        for future in as_completed(futures):
+            auftrag = futures[future]
+            try:
+                ergebnis = future.result()
+            except Exception as e:
+                # Worker abgestürzt (z. B. Speicher erschöpft)
+                ergebnis = {"nr": auftrag["nr"], "name": auftrag["name"], "ergebnis": auftrag["ergebnis"],
+                            "status": "error", "message": f"{type(e).__name__}: {e}", "sekunden": None}
+            ergebnisse[auftrag["nr"]] = ergebnis
+            if fortschritt is not None:
+                fortschritt(ergebnis)
+    return [ergebnisse[a["nr"]] for a in auftraege]
+
+
+def _drucke_zeile(ergebnis):
+    sekunden = f"{ergebnis['sekunden']:8.2f}s" if ergebnis.get("sekunden") is not None else "        –"
+    zeile = f"[{ergebnis['status']:>5}] {sekunden}  {ergebnis['name']}"
+    if ergebnis["status"] == "ok":
+        zeile += f" → {ergebnis['ergebnis']}"
+    else:
+        zeile += f": {ergebnis.get('message', '')}"
+    print(zeile, flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mietabgleiche aus einer Auftragsliste im Prozess-Pool ausführen")
+    parser.add_argument("auftragsliste", help="JSON- oder CSV-Datei mit Aufträgen (mieter, konto, ergebnis)")
+    parser.add_argument("--prozesse", type=int, default=None, help="parallele Aufträge (Standard: Anzahl CPUs)")
+    parser.add_argument("--inkrementell", action="store_true", help="Standard für Aufträge ohne eigene Angabe")
+    parser.add_argument("--unscharf", action="store_true", help="Standard für Aufträge ohne eigene Angabe")
+    parser.add_argument("--schnell-speichern", action="store_true",
+                        help="Ergebnis als gepatchte Kopie der Mieterliste speichern (xlsx_patch)")
+    parser.add_argument("--historie", help="SQLite-Datei für den Verlauf (historie.Historie)")
+    parser.add_argument("--konto-cache", help="Verzeichnis für aufbereitete Kontoauszüge (konto_cache.KontoCache)")
+    parser.add_argument("--bericht", help="Ergebnisse und Messwerte je Auftrag als JSON speichern")
+    args = parser.parse_args(argv)
+
+    try:
+        auftraege = lade_auftraege(args.auftragsliste)
+    except AuftragslisteFehlerhaft as e:
+        print(f"Auftragsliste fehlerhaft: {e}", file=sys.stderr)
+        return 2
+    if not auftraege:
+        print("Auftragsliste enthält keine Aufträge", file=sys.stderr)
+        return 2
+
+    optionen = {"inkrementell": args.inkrementell, "unscharf": args.unscharf, "schnell_speichern": args.schnell_speichern}
+    start = time.perf_counter()
+    ergebnisse = fuehre_stapel_aus(auftraege, args.prozesse, optionen, args.historie, args.konto_cache,
+                                   fortschritt=_drucke_zeile)
+    dauer = time.perf_counter() - start
+
+    fehler = [e for e in ergebnisse if e["status"] != "ok"]
+    rechenzeit = sum(e["sekunden"] or 0 for e in ergebnisse)
+    print(f"\n{len(ergebnisse)} Aufträge: {len(ergebnisse) - len(fehler)} ok, {len(fehler)} fehlgeschlagen; "
+          f"Dauer {dauer:.1f}s (Summe je Auftrag {rechenzeit:.1f}s)")
+    for e in fehler:
+        print(f"  Fehler in Auftrag {e['nr']} ({e['name']}): {e.get('message', '')}", file=sys.stderr)
+
+    if args.bericht:
+        with open(args.bericht, "w", encoding="utf-8") as f:
+            json.dump({"dauer_s": round(dauer, 3), "auftraege": ergebnisse}, f, indent=2, ensure_ascii=False)
+    return 1 if fehler else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# Benchmark: alte zeilenweise Klassifizierung (klassifiziere + finde_suchwort per .apply)
+# gegen die kompilierte Alternation aus klassifikation.py.
+#
+#   python benchmarks/bench_klassifikation.py --zeilen 50000
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from klassifikation import klassifiziere_spalte  # noqa: E402
+
+
+# --- Referenz: bisherige Implementierung aus mieten.py ---
+def klassifiziere_alt(text: str) -> str:
+    t = (text or "").lower()
+    patterns = [
+        ("Miete", [r"\bmiet\w*\b", r"\bkm\b", r"\bkaltmiete\b", r"\bstellplatz\b", r"\bgarage\b"]),
+        ("Nebenkosten", [r"\bnebenkosten\b", r"\bnk\b", r"\bbetriebskosten\b", r"\bbk\b",
+                         r"\bhausgeld\b", r"\bheizkosten\b"]),
+        ("Nachzahlung", [r"\bnach\-?zahlung\b", r"\bnachz\b"]),
+        ("Rate", [r"\brate(nzahlung)?\b"]),
+        ("Honorar", [r"\bhonorar\b"]),
+    ]
+    for label, pats in patterns:
+        for p in pats:
+            if re.search(p, t, re.IGNORECASE):
+                return label
+    return "Sonstiges"
+
+
+def finde_suchwort_alt(text: str) -> str:
+    t = (text or "").lower()
+    patterns = [
+        ("Miete", [r"\bmiet\w*\b", r"\bkm\b", r"\bkaltmiete\b", r"\bstellplatz\b", r"\bgarage\b"]),
+        ("Nebenkosten", [r"\bnebenkosten\b", r"\bnk\b", r"\bbetriebskosten\b", r"\bbk\b"]),
+        ("Nachzahlung", [r"\bnach\-?zahlung\b", r"\bnachz\b"]),
+        ("Rate", [r"\brate(nzahlung)?\b"]),
+        ("Honorar", [r"\bhonorar\b"]),
+    ]
+    for _, pats in patterns:
+        for p in pats:
+            m = re.search(p, t, re.IGNORECASE)
+            if m:
+                return m.group(0)
+    return ""
+
+
+WOERTER = [
+    "Miete", "MIETE Januar", "Mietzahlung", "Kaltmiete", "KM", "Stellplatz", "Garage", "Nebenkosten", "NK",
+    "Betriebskosten", "BK", "Hausgeld", "Heizkosten", "Nachzahlung", "Nach-Zahlung", "Nachz", "Rate",
+    "Ratenzahlung", "Honorar", "Überweisung", "Gutschrift", "Abrechnung 30.12.2024", "Kontogebühren & Zinsen",
+    "Lastschrift", "SEPA", "Tagesgeldkonto Neuenteich 2A", "WEG Plüschow Str. 13", "Rücklage", "Dauerauftrag",
+]
+
+
+def erzeuge_texte(n: int, seed: int = 42) -> pd.Series:
+    rnd = random.Random(seed)
+    texte = []
+    for _ in range(n):
+        teile = rnd.sample(WOERTER, rnd.randint(1, 5))
+        if rnd.random() < 0.5:
+            teile = [w for w in teile if w not in WOERTER[:19]] or teile
+        texte.append(" ".join(teile) + "\n" + rnd.choice(WOERTER))
+    return pd.Series(texte)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zeilen", type=int, default=50000)
+    args = parser.parse_args()
+
+    texte = erzeuge_texte(args.zeilen)
+
+    t0 = time.perf_counter()
+    klass_alt = texte.apply(klassifiziere_alt)
+    hit_alt = texte.apply(finde_suchwort_alt)
+    dauer_alt = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    neu = klassifiziere_spalte(texte)
+    dauer_neu = time.perf_counter() - t0
+
+    gleich = (bool((klass_alt.astype(str) == neu["__klass"].astype(str)).all())
+              and bool((hit_alt.astype(str) == neu["__hit"].astype(str)).all()))
+    print(f"Zeilen:           {args.zeilen}")
+    print(f"alt (.apply x2):  {dauer_alt:.3f} s")
+    print(f"neu (Alternation): {dauer_neu:.3f} s")
+    print(f"Speedup:          {dauer_alt / dauer_neu:.1f}x")
+    print(f"Ergebnis gleich:  {'ja' if gleich else 'NEIN'}")
+    if not gleich:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
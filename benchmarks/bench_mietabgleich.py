@@ -0,0 +1,182 @@
+# Benchmark: fuehre_mietabgleich_durch auf synthetischen Daten (1k … 1M Buchungen).
+# Je Größe ein frischer Prozess: Laufzeit je Phase (eingebaute Messung), Spitzen-Speicher (RSS, optional tracemalloc),
+# Bericht als JSON, der sich mit einem früheren Bericht vergleichen lässt.
+#
+#   python benchmarks/bench_mietabgleich.py --groessen 1000,10000,100000 --bericht vorher.json
+#   python benchmarks/bench_mietabgleich.py --groessen 1000,10000,100000 --vergleich vorher.json
+#   python benchmarks/bench_mietabgleich.py --groessen 1000000 --format csv
+#   python benchmarks/bench_mietabgleich.py --groessen 1000000 --parallel 4
+#   python benchmarks/bench_mietabgleich.py --groessen 100000 --schnell-speichern
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Windows: Spitzen-Speicher über psutil (siehe _rss_spitze_mb)
+    resource = None
+
+BASIS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASIS)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from testdaten import erzeuge_datensatz, mieter_anzahl  # noqa: E402
+
+# Phasen in Berichtsreihenfolge (Namen wie in messung.Messung bzw. fuehre_mietabgleich_durch)
+PHASEN = ["mieterliste", "kontoauszug", "suchtreffer", "zuordnung", "zellen_schreiben", "speichern"]
+
+
+def _einzellauf(mieter_pfad, konto_pfad, wiederholungen, mit_tracemalloc, prozesse=None, schnell_speichern=False):
+    # läuft im Kindprozess: Abgleich mit eingebauter Phasenmessung ausführen, Messwerte zurückgeben
+    os.chdir(BASIS)
+    import mieten
+    from messung import Messung
+
+    laeufe = []
+    tm_spitze = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(wiederholungen):
+            if mit_tracemalloc:
+                tracemalloc.start()
+            messung = Messung()
+            mieten.fuehre_mietabgleich_durch(mieter_pfad, konto_pfad, os.path.join(tmp, f"ergebnis_{i}.xlsx"),
+                                             messung=messung, parallel=bool(prozesse), max_prozesse=prozesse,
+                                             schnell_speichern=schnell_speichern)
+            if mit_tracemalloc:
+                tm_spitze = max(tm_spitze or 0, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            laeufe.append(messung)
+
+    # Median über die Wiederholungen (je Phase getrennt)
+    ergebnis = {
+        "gesamt_s": statistics.median(m.gesamt for m in laeufe),
+        "phasen_s": {p: statistics.median(m.phasen.get(p, 0.0) for m in laeufe) for p in PHASEN},
+        "zaehler": laeufe[-1].zaehler,
+        "rss_spitze_mb": _rss_spitze_mb(),
+    }
+    if tm_spitze is not None:
+        ergebnis["tracemalloc_spitze_mb"] = tm_spitze / (1024 * 1024)
+    return ergebnis
+
+
+def _rss_spitze_mb():
+    # Spitzen-Speicher des Prozesses in MB; None, wenn er sich nicht bestimmen lässt (Windows ohne psutil)
+    if resource is not None:
+        # ru_maxrss: Linux KiB, macOS Byte
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    spitze = getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return spitze / (1024 * 1024) if spitze is not None else None
+
+
+def _umgebung():
+    import openpyxl
+    import pandas as pd
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASIS, capture_output=True,
+                                text=True, check=False).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "openpyxl": openpyxl.__version__,
+        "plattform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def _drucke_bericht(bericht):
+    kopf = f"{'Buchungen':>10} {'Mieter':>7} {'gesamt':>8} " + " ".join(f"{p[:12]:>12}" for p in PHASEN) + f" {'RSS MB':>8} {'Buch./s':>9}"
+    print(kopf)
+    for lauf in bericht["laeufe"]:
+        print(
+            f"{lauf['buchungen']:>10} {lauf['mieter']:>7} {lauf['gesamt_s']:>8.2f} "
+            + " ".join(f"{lauf['phasen_s'][p]:>12.3f}" for p in PHASEN)
+            + (f" {lauf['rss_spitze_mb']:>8.0f}" if lauf.get("rss_spitze_mb") is not None else f" {'–':>8}")
+            + f" {lauf['buchungen'] / lauf['gesamt_s']:>9.0f}"
+        )
+
+
+def _vergleiche(bericht, basis):
+    # Veränderung je Größe und Phase gegenüber einem früheren Bericht (negativ = schneller)
+    alt = {(l["buchungen"], l["format"]): l for l in basis["laeufe"]}
+    print(f"\nVergleich mit {basis['umgebung'].get('commit') or '?'} ({basis['erstellt']}):")
+    print(f"{'Buchungen':>10} {'Phase':<18} {'vorher':>9} {'nachher':>9} {'Δ':>8}")
+    for lauf in bericht["laeufe"]:
+        vorher = alt.get((lauf["buchungen"], lauf["format"]))
+        if vorher is None:
+            continue
+        zeilen = [("gesamt", vorher["gesamt_s"], lauf["gesamt_s"])]
+        zeilen += [(p, vorher["phasen_s"].get(p, 0.0), lauf["phasen_s"][p]) for p in PHASEN]
+        if vorher.get("rss_spitze_mb") is not None and lauf.get("rss_spitze_mb") is not None:
+            zeilen.append(("rss_spitze_mb", vorher["rss_spitze_mb"], lauf["rss_spitze_mb"]))
+        for name, a, b in zeilen:
+            delta = f"{(b - a) / a * 100:+7.1f}%" if a else "       –"
+            print(f"{lauf['buchungen']:>10} {name:<18} {a:>9.3f} {b:>9.3f} {delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuehre_mietabgleich_durch mit synthetischen Daten")
+    parser.add_argument("--groessen", default="1000,10000,100000", help="Buchungen je Lauf, kommagetrennt")
+    parser.add_argument("--mieter", type=int, default=None, help="Anzahl Mieter (Standard: aus Buchungen abgeleitet)")
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx", help="Format des Kontoauszugs")
+    parser.add_argument("--wiederholungen", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--daten", default=os.path.join(BASIS, "benchmarks", "daten"), help="Ablage der erzeugten Testdaten")
+    parser.add_argument("--parallel", type=int, default=None, metavar="PROZESSE",
+                        help="Aufbereitung auf so viele Prozesse verteilen (fuehre_mietabgleich_durch(parallel=True))")
+    parser.add_argument("--schnell-speichern", action="store_true",
+                        help="Ergebnis über xlsx_patch speichern (fuehre_mietabgleich_durch(schnell_speichern=True))")
+    parser.add_argument("--tracemalloc", action="store_true", help="Python-Allokationen verfolgen (langsamer)")
+    parser.add_argument("--bericht", help="Bericht als JSON speichern")
+    parser.add_argument("--vergleich", help="früheren JSON-Bericht zum Vergleich")
+    args = parser.parse_args()
+
+    bericht = {"erstellt": datetime.now().isoformat(timespec="seconds"), "umgebung": _umgebung(), "laeufe": []}
+    ctx = multiprocessing.get_context("spawn")
+    for groesse in [int(g) for g in args.groessen.split(",") if g.strip()]:
+        t0 = time.perf_counter()
+        mieter_pfad, konto_pfad = erzeuge_datensatz(args.daten, groesse, args.format, args.mieter, args.seed)
+        print(f"[{groesse}] Testdaten bereit ({time.perf_counter() - t0:.1f}s): {os.path.basename(konto_pfad)}", file=sys.stderr)
+        # ProcessPoolExecutor statt multiprocessing.Pool: dessen Worker dürfen für --parallel eigene Prozesse starten
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            messung = pool.submit(_einzellauf, mieter_pfad, konto_pfad, args.wiederholungen, args.tracemalloc,
+                                  args.parallel, args.schnell_speichern).result()
+        bericht["laeufe"].append({
+            "buchungen": groesse,
+            "mieter": args.mieter or mieter_anzahl(groesse),
+            "format": args.format,
+            "wiederholungen": args.wiederholungen,
+            "prozesse": args.parallel or 1,
+            "schnell_speichern": args.schnell_speichern,
+            **messung,
+        })
+
+    _drucke_bericht(bericht)
+    if args.bericht:
+        with open(args.bericht, "w", encoding="utf-8") as f:
+            json.dump(bericht, f, indent=2, ensure_ascii=False)
+    if args.vergleich:
+        with open(args.vergleich, encoding="utf-8") as f:
+            _vergleiche(bericht, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# Synthetische Testdaten für Benchmarks: Mieterliste (wie uploads/Mieter.xlsx) und Kontoauszug
+# (XLSX oder CSV) in frei wählbarer Größe, reproduzierbar über den Seed.
+#
+#   python benchmarks/testdaten.py --buchungen 100000 --ziel /tmp/bench
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+from openpyxl.comments import Comment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kontoauszug import KONTO_SPALTEN  # noqa: E402
+from mieten import BLATTNAME, MONATS_ZUORDNUNG  # noqa: E402
+
+VORNAMEN = ["Anna", "Jürgen", "Gökhan", "Sören", "Ayşe", "Björn", "Maria", "Claude", "Jörg", "Elif", "Mehmet",
+            "Ute", "Dennis", "Celine", "Özlem", "Frank", "Katrin", "Hüseyin", "Lena", "Bünyamin"]
+NACHNAMEN = ["Müller", "Schöppen", "Wißmann", "Kahraman", "Dogan", "Mölders", "Schmidt", "Weiß", "Yılmaz",
+             "Becker", "Krüger", "Hoffmann", "Zielinski", "Almasri", "Groß", "Köhler", "Ahmady", "Fuß"]
+STRASSEN = ["Plüschow Str.", "Kuller Str.", "Neuenteich", "Langerfelder Str.", "Nathrather Str.", "Aktien Str.",
+            "Neue Friedrichstr.", "Gathe", "Hünefeldstr.", "Wittensteinstr."]
+LAGEN = ["EG li", "EG re", "1.OG li", "1.OG re", "2.OG li", "2.OG re", "DG", "Stellplatz", "Garage"]
+BEHOERDEN = ["Jobcenter Wuppertal", "JOBCENTER WUPPERTAL AöR", "Bundesagentur für Arbeit-Service-Haus",
+             "Stadt Wuppertal"]
+MONATSWOERTER = ["Januar", "Februar", "März", "April", "Mai", "Juni", "Juli", "August", "September", "Oktober",
+                 "November", "Dezember", "Jan", "Feb", "Mrz", "Okt", "Dez"]
+SONSTIGE_ZAHLENDE = ["Stadtwerke Wuppertal", "Telekom Deutschland GmbH", "Allianz Versicherungs-AG",
+                     "Hausverwaltung Nord", "Finanzamt Wuppertal", "Handwerker Schulz & Sohn", None]
+SONSTIGE_VWZ = ["Abrechnung 30.12.2024 siehe Anlage", "Abschlag Strom", "Beitrag Gebäudeversicherung",
+                "Rechnung 2025-0815", "Grundsteuer Q1", "Hausgeld Rücklage", "Heizkosten Wartung"]
+MIET_VWZ = ["Miete {monat}", "Mietzahlung {objekt}", "KM + NK {monat}", "Miete {objekt} {lage}", "Nebenkosten",
+            "Kaltmiete {monat} {jahr}", "Stellplatz {monat}", "Nachzahlung NK {jahr}", "Rate {monat}",
+            "Miete und Nebenkosten", "Überweisung {objekt}"]
+KATEGORIEN = ["Mieteinnahmen", "Sonstige Einnahmen", "Kontogebühren & Zinsen", "Versicherungen", "Umbuchung"]
+
+
+def _name(rnd):
+    return f"{rnd.choice(VORNAMEN)} {rnd.choice(NACHNAMEN)}"
+
+
+def erzeuge_mieter(anzahl, seed=1):
+    # Liste von (Spalte A, Spalte B, Objekt, Lage); ca. 10 % Behördenzeilen mit Mietername in Spalte B
+    rnd = random.Random(seed)
+    mieter = []
+    namen = set()
+    while len(mieter) < anzahl:
+        objekt = f"WEG {rnd.choice(STRASSEN)} {rnd.randint(1, 180)}"
+        if rnd.random() < 0.1:
+            eintrag = (rnd.choice(BEHOERDEN), _name(rnd) + f" {len(mieter)}", objekt, rnd.choice(LAGEN))
+        else:
+            name = f"{_name(rnd)} {len(mieter)}" if rnd.random() < 0.5 else _name(rnd).upper()
+            if name in namen:
+                continue
+            namen.add(name)
+            eintrag = (name, None, objekt, rnd.choice(LAGEN))
+        mieter.append(eintrag)
+    return mieter
+
+
+def schreibe_mieterliste(pfad, mieter, jahr=2025, seed=1):
+    # Aufbau wie die echte Mieterliste: A–D Stammdaten, E–AB Betrag/Datum je Monat, AC Summenformel.
+    # Enthält verbundene Zellen und bereits vorhandene Beträge/Kommentare aus einem früheren Lauf.
+    rnd = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BLATTNAME
+    kopf = ["Eigentümer/Mieter", "Mieter", "Objekt", "Wohnung"]
+    for i, monat in enumerate(MONATS_ZUORDNUNG):
+        kopf += [monat, "Zahl-Datum" + (str(i + 1) if i else "")]
+    ws.append(kopf + ["Gesamt"])
+    monate = list(MONATS_ZUORDNUNG.values())
+    for r, (a, b, objekt, lage) in enumerate(mieter, start=2):
+        zeile = [a, b, objekt, lage] + [None] * 24
+        zeile.append("=" + "+".join(f"{sp}{r}" for sp, _ in monate))
+        ws.append(zeile)
+        # bereits eingetragene Monate (teils mit Kommentar aus früherem Abgleich)
+        if rnd.random() < 0.2:
+            m = rnd.randrange(12)
+            betrag_sp, datum_sp = monate[m]
+            tag = date(jahr, m + 1, rnd.randint(1, 28))
+            betrag = round(rnd.uniform(250, 1200), 2)
+            ws[f"{betrag_sp}{r}"] = betrag
+            ws[f"{datum_sp}{r}"] = tag
+            ws[f"{datum_sp}{r}"].number_format = "DD.MM.YYYY"
+            if rnd.random() < 0.5:
+                betrag_text = f"{betrag:.2f}".replace(".", ",")
+                ws[f"{datum_sp}{r}"].comment = Comment(f"{tag:%d.%m.%Y} [miete]: {betrag_text} EUR", "System")
+    # verbundene Zellen: Objekt/Wohnung über zwei Spalten, Dezember-Datum über zwei Zeilen
+    r = 2
+    while r <= len(mieter):
+        x = rnd.random()
+        if x < 0.03:
+            ws.merge_cells(f"C{r}:D{r}")
+        elif x < 0.05:
+            ws.merge_cells(f"{monate[11][1]}{r}:{monate[11][1]}{r + 1}")
+            r += 1
+        r += 1
+    wb.save(pfad)
+    return pfad
+
+
+def _datum_text(tag, rnd):
+    # gemischte Datumsformate wie in echten Exporten
+    x = rnd.random()
+    if x < 0.55:
+        return f"{tag:%d.%m.%Y}"
+    if x < 0.8:
+        return f"{tag:%Y-%m-%d}"
+    if x < 0.95:
+        return f"{tag:%d/%m/%Y}"
+    return "" if x < 0.98 else "unbekannt"
+
+
+def _betrag_text(betrag, rnd):
+    x = rnd.random()
+    if x < 0.5:
+        return f"{betrag:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    if x < 0.7:
+        return f"{betrag:.2f}".replace(".", ",") + " €"
+    if x < 0.9:
+        return f"{betrag:.2f}"
+    return "\xa0" + f"{betrag:.2f}".replace(".", ",")
+
+
+def erzeuge_buchungen(anzahl, mieter, jahr=2025, seed=2, als_text=True):
+    # Zeilen in Reihenfolge KONTO_SPALTEN; als_text=False liefert echte Datums-/Zahlwerte (XLSX-Zellen)
+    rnd = random.Random(seed)
+    start = date(jahr, 1, 1)
+    for _ in range(anzahl):
+        tag = start + timedelta(days=rnd.randrange(365))
+        a, b, objekt, lage = rnd.choice(mieter)
+        x = rnd.random()
+        if x < 0.55:
+            # Mietzahlung durch Mieter (Schreibweise wie im Kontoauszug, teils kleingeschrieben)
+            zahlender = a if b is None else _name(rnd)
+            if rnd.random() < 0.2:
+                zahlender = zahlender.lower()
+            vwz = rnd.choice(MIET_VWZ).format(monat=rnd.choice(MONATSWOERTER), objekt=objekt, lage=lage, jahr=jahr)
+            kategorie = "Mieteinnahmen"
+            betrag = round(rnd.uniform(150, 1500), 2)
+        elif x < 0.7:
+            # Behörde zahlt für einen Mieter (Name aus Spalte B im Verwendungszweck)
+            zahlender = rnd.choice(BEHOERDEN)
+            person = b if b is not None else _name(rnd)
+            vwz = f"KdU {person} BG-Nr. {rnd.randint(10000, 99999)} Miete {rnd.choice(MONATSWOERTER)}"
+            kategorie = rnd.choice(KATEGORIEN[:2])
+            betrag = round(rnd.uniform(300, 900), 2)
+        else:
+            zahlender = rnd.choice(SONSTIGE_ZAHLENDE)
+            vwz = rnd.choice(SONSTIGE_VWZ)
+            kategorie = rnd.choice(KATEGORIEN)
+            betrag = round(rnd.uniform(-2000, 500), 2)
+        if als_text:
+            yield [_datum_text(tag, rnd), zahlender or "", vwz, kategorie, objekt, _betrag_text(betrag, rnd)]
+        else:
+            wert = tag if rnd.random() < 0.8 else _datum_text(tag, rnd)
+            yield [wert, zahlender, vwz, kategorie, objekt, betrag]
+
+
+def schreibe_kontoauszug(pfad, anzahl, mieter, jahr=2025, seed=2):
+    # Format nach Endung: .csv (Semikolon, EU-Zahlen) oder .xlsx (write_only, echte Datumszellen gemischt mit Text)
+    if pfad.lower().endswith(".csv"):
+        with open(pfad, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(KONTO_SPALTEN)
+            w.writerows(erzeuge_buchungen(anzahl, mieter, jahr, seed, als_text=True))
+        return pfad
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Umsätze")
+    ws.append(KONTO_SPALTEN)
+    for zeile in erzeuge_buchungen(anzahl, mieter, jahr, seed, als_text=False):
+        ws.append(zeile)
+    wb.save(pfad)
+    return pfad
+
+
+def mieter_anzahl(buchungen):
+    # realistisches Verhältnis: ca. eine Mietzahlung je Mieter und Monat, plus Rauschen
+    return max(50, min(20_000, buchungen // 20))
+
+
+def erzeuge_datensatz(ziel, buchungen, format="xlsx", mieter=None, seed=1):
+    # Erzeugt (bzw. verwendet bereits erzeugte) Dateien; Rückgabe (mieter_pfad, konto_pfad)
+    os.makedirs(ziel, exist_ok=True)
+    anzahl_mieter = mieter or mieter_anzahl(buchungen)
+    mieter_pfad = os.path.join(ziel, f"mieter_{anzahl_mieter}_s{seed}.xlsx")
+    konto_pfad = os.path.join(ziel, f"konto_{buchungen}_{anzahl_mieter}_s{seed}.{format}")
+    liste = erzeuge_mieter(anzahl_mieter, seed)
+    if not os.path.exists(mieter_pfad):
+        schreibe_mieterliste(mieter_pfad, liste, seed=seed)
+    if not os.path.exists(konto_pfad):
+        schreibe_kontoauszug(konto_pfad, buchungen, liste, seed=seed + 1)
+    return mieter_pfad, konto_pfad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetische Mieterliste und Kontoauszug erzeugen")
+    parser.add_argument("--buchungen", type=int, default=10_000)
+    parser.add_argument("--mieter", type=int, default=None)
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ziel", default=os.path.join("benchmarks", "daten"))
+    args = parser.parse_args()
+    for p in erzeuge_datensatz(args.ziel, args.buchungen, args.format, args.mieter, args.seed):
+        print(p)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import re
+
+import pandas as pd
+
+from kontoauszug import KONTO_BETRAG
+from normalisierung import normalisiere_spalte
+
+# Journal bereits verarbeiteter Buchungen als verstecktes Blatt in der Mieter-Arbeitsmappe.
+# Die Ergebnisdatei dient im Folgemonat wieder als Eingabe; im inkrementellen Modus werden
+# Buchungen, deren Schlüssel schon im Journal steht, vor der Zuordnung verworfen.
+# Spalten: Schlüssel (Buchung aus den typisierten Spalten, bei zugeordneten Buchungen mit
+# "@<Mieterzeile>"), Mieterzeile (leer = keinem Mieter zugeordnet), Datum, Betrag, Zahlender.
+# Der Buchungsschlüssel hängt nur von Datum (DD.MM.YYYY), Betrag und normalisiertem Zahlenden ab –
+# derselbe Auszug als XLSX, CSV oder mit anderer Engine gelesen ergibt dieselben Schlüssel.
+
+JOURNAL_BLATT = "_buchungen"
+JOURNAL_SPALTEN = ["Schluessel", "Mieterzeile", "Datum", "Betrag", "Zahlender"]
+
+# Schlüssel älterer Journale (Hash der Rohzeile, "<hash>-<n>") – werden aus Datum/Betrag/Zahlender umgerechnet
+_ROH_SCHLUESSEL = re.compile(r"[0-9a-f]{16}-\d+")
+
+
+def buchungs_hash(df_konto: pd.DataFrame) -> pd.Series:
+    # Hash der typisierten Spalten je Zeile (nach _bereite_konto_vor), vektorisiert
+    return _hash(df_konto["__datum_text"], df_konto[KONTO_BETRAG], df_konto["__norm_payee"])
+
+
+def _hash(datum: pd.Series, betrag: pd.Series, zahlender: pd.Series) -> pd.Series:
+    basis = datum.astype(str) + "|" + betrag.round(2).map("{:.2f}".format) + "|" + zahlender.astype(str)
+    return pd.util.hash_pandas_object(basis, index=False).map("{:016x}".format)
+
+
+def buchungs_schluessel(h: pd.Series, vorkommen: dict) -> pd.Series:
+    # Gleiche Buchungen (z. B. zwei gleiche Überweisungen am selben Tag) werden über ihr
+    # Vorkommen unterschieden: <hash>#1, <hash>#2, … – `vorkommen` zählt über alle Blöcke mit.
+    nr = h.groupby(h, sort=False).cumcount() + 1 + h.map(lambda x: vorkommen.get(x, 0))
+    for wert, anzahl in h.value_counts(sort=False).items():
+        vorkommen[wert] = vorkommen.get(wert, 0) + int(anzahl)
+    return h + "#" + nr.astype(str)
+
+
+def journal_schluessel(buchung: str, mieterzeile) -> str:
+    return buchung if mieterzeile is None else f"{buchung}@{mieterzeile}"
+
+
+def lade_journal(workbook) -> set:
+    # Rückgabe: Buchungsschlüssel (ohne Mieterzeile) aller verarbeiteten Buchungen
+    if JOURNAL_BLATT not in workbook.sheetnames:
+        return set()
+    ws = workbook[JOURNAL_BLATT]
+    bekannt = set()
+    alt = []
+    for values in ws.iter_rows(min_row=2, max_col=5, values_only=True):
+        if values[0] is None:
+            continue
+        schluessel = str(values[0])
+        if _ROH_SCHLUESSEL.fullmatch(schluessel):
+            # ohne Zahlenden (nicht relevante Zeile) nicht umrechenbar – entfällt ohnehin beim Filtern
+            if values[4] is not None:
+                alt.append((schluessel, values[2], values[3], values[4]))
+            continue
+        bekannt.add(schluessel.split("@", 1)[0])
+    if alt:
+        bekannt.update(_alte_schluessel(alt))
+    return bekannt
+
+
+def _alte_schluessel(zeilen) -> set:
+    # Rohzeilen-Schlüssel älterer Journale auf Buchungsschlüssel abbilden; eine Buchung mit mehreren
+    # Mieterzeilen steht dort mehrfach unter demselben Schlüssel
+    df = pd.DataFrame(zeilen, columns=["schluessel", "datum", "betrag", "zahlender"]).drop_duplicates("schluessel")
+    h = _hash(df["datum"].fillna(""), pd.to_numeric(df["betrag"], errors="coerce"),
+              normalisiere_spalte(df["zahlender"].fillna("").astype(str)))
+    return set(buchungs_schluessel(h, {}))
+
+
+def schreibe_journal(workbook, eintraege):
+    if JOURNAL_BLATT in workbook.sheetnames:
+        ws = workbook[JOURNAL_BLATT]
+    else:
+        ws = workbook.create_sheet(JOURNAL_BLATT)
+        ws.sheet_state = "hidden"
+        ws.append(JOURNAL_SPALTEN)
+    for eintrag in eintraege:
+        ws.append(list(eintrag))
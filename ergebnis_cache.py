@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+# Inhaltsadressierter Cache für Abgleich-Ergebnisse: Schlüssel = Hash über beide Eingabedateien,
+# die Regelversion und ergebnisrelevante Optionen. Ein Treffer liefert die zuvor erzeugte
+# Arbeitsmappe sofort, ohne den Abgleich erneut auszuführen.
+
+def datei_hash(pfad, blockgroesse=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(pfad, "rb") as f:
+        for block in iter(lambda: f.read(blockgroesse), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ErgebnisCache:
+    def __init__(self, verzeichnis, max_bytes=500 * 1024 * 1024, max_alter_sekunden=30 * 24 * 3600):
+        self.verzeichnis = verzeichnis
+        self.max_bytes = max_bytes
+        self.max_alter_sekunden = max_alter_sekunden
+        self._lock = threading.Lock()
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self.verdraengt = 0
+        os.makedirs(self.verzeichnis, exist_ok=True)
+
+    def schluessel(self, *pfade, **optionen) -> str:
+        # Regelversion erst hier importieren: klassifikation lädt pandas, der Cache soll den Serverstart nicht bremsen
+        from klassifikation import REGEL_VERSION
+        from konto_cache import AUFBEREITUNG_VERSION
+
+        h = hashlib.sha256()
+        h.update(f"regel-version:{REGEL_VERSION}|aufbereitung:{AUFBEREITUNG_VERSION}".encode())
+        for pfad in pfade:
+            h.update(datei_hash(pfad).encode())
+        h.update(json.dumps(optionen, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _pfad(self, schluessel) -> str:
+        return os.path.join(self.verzeichnis, f"{schluessel}.xlsx")
+
+    def hole(self, schluessel, ziel_pfad):
+        # Bei Treffer: Ergebnis nach ziel_pfad kopieren und ziel_pfad zurückgeben, sonst None
+        pfad = self._pfad(schluessel)
+        with self._lock:
+            gueltig = os.path.exists(pfad) and (time.time() - os.path.getmtime(pfad)) <= self.max_alter_sekunden
+            if not gueltig:
+                self.fehlschlaege += 1
+                return None
+            self.treffer += 1
+            # Zugriffszeit merken → Verdrängung nach "zuletzt benutzt"
+            os.utime(pfad, None)
+            if os.path.abspath(pfad) != os.path.abspath(ziel_pfad):
+                shutil.copyfile(pfad, ziel_pfad)
+        return ziel_pfad
+
+    def lege_ab(self, schluessel, ergebnis_pfad):
+        pfad = self._pfad(schluessel)
+        tmp = f"{pfad}.{threading.get_ident()}.tmp"
+        shutil.copyfile(ergebnis_pfad, tmp)
+        os.replace(tmp, pfad)
+        with self._lock:
+            self._raeume_auf()
+
+    def _eintraege(self):
+        eintraege = []
+        for name in os.listdir(self.verzeichnis):
+            if not name.endswith(".xlsx"):
+                continue
+            pfad = os.path.join(self.verzeichnis, name)
+            try:
+                st = os.stat(pfad)
+            except FileNotFoundError:
+                continue
+            eintraege.append((st.st_mtime, st.st_size, pfad))
+        return sorted(eintraege)
+
+    def _raeume_auf(self):
+        # Verdrängung: zuerst abgelaufene Einträge, dann die am längsten unbenutzten bis zur Größengrenze
+        grenze = time.time() - self.max_alter_sekunden
+        eintraege = self._eintraege()
+        gesamt = sum(groesse for _, groesse, _ in eintraege)
+        for mtime, groesse, pfad in eintraege:
+            if mtime >= grenze and gesamt <= self.max_bytes:
+                break
+            try:
+                os.remove(pfad)
+            except FileNotFoundError:
+                pass
+            gesamt -= groesse
+            self.verdraengt += 1
+
+    def statistik(self) -> dict:
+        with self._lock:
+            eintraege = self._eintraege()
+            return {
+                "hits": self.treffer,
+                "misses": self.fehlschlaege,
+                "evictions": self.verdraengt,
+                "entries": len(eintraege),
+                "bytes": sum(groesse for _, groesse, _ in eintraege),
+            }
@@ -0,0 +1,180 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from kontoauszug import KONTO_BETRAG, KONTO_DATUM, KONTO_KATEGORIE, KONTO_OBJEKT, KONTO_PAYEE, KONTO_VWZ
+from klassifikation import REGEL_VERSION
+
+# Verlauf aller Abgleiche in einer lokalen SQLite-Datei (optional): aufbereitete relevante Buchungen mit
+# Klassifikation und Zielmonat sowie die Zuordnungen zu Mietern. Schlüssel einer Buchung ist der
+# formatunabhängige Dedup-Schlüssel (Datum, Betrag, Zahlender, Verwendungszweck) – dieselbe Buchung aus
+# einem erneut hochgeladenen oder überlappenden Auszug wird nicht doppelt gespeichert.
+# Zuordnungen gehören zu einer Mieterliste (Spalte "mappe", siehe mieten._mieterlisten_schluessel) – Zeile 7
+# verschiedener Listen ist nicht derselbe Mieter.
+# Abfragen (z. B. Zahlungen eines Mieters seit Jahresbeginn) laufen über Indizes, ohne eine Arbeitsmappe
+# zu lesen.
+
+# PRAGMA user_version; ältere Dateien werden beim Öffnen migriert
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS laeufe (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    zeitpunkt TEXT NOT NULL,
+    mieterliste TEXT,
+    kontoauszuege TEXT,
+    regel_version TEXT,
+    mappe TEXT
+);
+CREATE TABLE IF NOT EXISTS buchungen (
+    schluessel TEXT PRIMARY KEY,
+    lauf INTEGER REFERENCES laeufe(id),
+    datum TEXT,
+    betrag REAL,
+    zahlender TEXT,
+    zahlender_norm TEXT,
+    verwendungszweck TEXT,
+    kategorie TEXT,
+    objekt TEXT,
+    klasse TEXT,
+    suchwort TEXT,
+    monat INTEGER
+);
+CREATE TABLE IF NOT EXISTS zuordnungen (
+    mappe TEXT NOT NULL,
+    buchung TEXT NOT NULL REFERENCES buchungen(schluessel),
+    mieterzeile INTEGER NOT NULL,
+    mieter TEXT,
+    mieter_norm TEXT,
+    art TEXT,
+    lauf INTEGER REFERENCES laeufe(id),
+    PRIMARY KEY (mappe, buchung, mieterzeile)
+);
+CREATE INDEX IF NOT EXISTS ix_buchungen_zahlender ON buchungen(zahlender_norm);
+CREATE INDEX IF NOT EXISTS ix_buchungen_datum ON buchungen(datum);
+CREATE INDEX IF NOT EXISTS ix_zuordnungen_mieter ON zuordnungen(mieter_norm);
+CREATE INDEX IF NOT EXISTS ix_zuordnungen_mieterzeile ON zuordnungen(mappe, mieterzeile);
+"""
+
+# Version 1 → 2: Mieterliste je Lauf und Zuordnung. Alte Läufe bekommen ihren Pfad als Schlüssel (der
+# Fingerabdruck der Mieterliste ist nachträglich nicht bekannt).
+MIGRATION_V2 = """
+ALTER TABLE laeufe ADD COLUMN mappe TEXT;
+UPDATE laeufe SET mappe = 'pfad:' || COALESCE(mieterliste, '');
+ALTER TABLE zuordnungen RENAME TO zuordnungen_v1;
+DROP INDEX IF EXISTS ix_zuordnungen_mieter;
+DROP INDEX IF EXISTS ix_zuordnungen_mieterzeile;
+CREATE TABLE zuordnungen (
+    mappe TEXT NOT NULL,
+    buchung TEXT NOT NULL REFERENCES buchungen(schluessel),
+    mieterzeile INTEGER NOT NULL,
+    mieter TEXT,
+    mieter_norm TEXT,
+    art TEXT,
+    lauf INTEGER REFERENCES laeufe(id),
+    PRIMARY KEY (mappe, buchung, mieterzeile)
+);
+INSERT INTO zuordnungen (mappe, buchung, mieterzeile, mieter, mieter_norm, art, lauf)
+    SELECT COALESCE(l.mappe, ''), z.buchung, z.mieterzeile, z.mieter, z.mieter_norm, z.art, z.lauf
+    FROM zuordnungen_v1 z LEFT JOIN laeufe l ON l.id = z.lauf;
+DROP TABLE zuordnungen_v1;
+"""
+
+BUCHUNG_SPALTEN = ["schluessel", "datum", "betrag", "zahlender", "zahlender_norm", "verwendungszweck",
+                   "kategorie", "objekt", "klasse", "suchwort", "monat"]
+
+
+def _text(werte: pd.Series) -> list:
+    return [None if pd.isna(v) else str(v) for v in werte.tolist()]
+
+
+class Historie:
+    def __init__(self, pfad):
+        self.pfad = pfad
+        self._lock = threading.Lock()  # Schreibzugriffe aus mehreren Worker-Threads nacheinander
+        with closing(self._verbinde()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            version = con.execute("PRAGMA user_version").fetchone()[0]
+            vorhanden = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'zuordnungen'").fetchone()
+            if vorhanden and version < 2:
+                con.executescript(MIGRATION_V2)
+            con.executescript(SCHEMA)
+            con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _verbinde(self):
+        return sqlite3.connect(self.pfad, timeout=30)
+
+    def speichere_lauf(self, excel_pfad, konto_pfade, df_such: pd.DataFrame, zuordnungen, mappe) -> int:
+        # df_such: aufbereitete relevante Buchungen (mit __dedup);
+        # zuordnungen: [(Dedup-Schlüssel, Mieterzeile, Mieter, normalisierter Mieter, Art)];
+        # mappe: Schlüssel der Mieterliste, zu der die Mieterzeilen gehören
+        datum = df_such[KONTO_DATUM]
+        betrag = df_such[KONTO_BETRAG]
+        spalten = [
+            _text(df_such["__dedup"]),
+            datum.dt.strftime("%Y-%m-%d").astype(object).where(datum.notna(), None).tolist(),
+            betrag.round(2).astype(object).where(betrag.notna(), None).tolist(),
+            _text(df_such[KONTO_PAYEE]),
+            _text(df_such["__norm_payee"]),
+            _text(df_such[KONTO_VWZ]),
+            _text(df_such[KONTO_KATEGORIE]),
+            _text(df_such[KONTO_OBJEKT]),
+            _text(df_such["__klass"]),
+            _text(df_such["__hit"]),
+            [None if pd.isna(m) else int(m) for m in df_such["__monat"].tolist()],
+        ]
+        with self._lock, closing(self._verbinde()) as con, con:
+            lauf = con.execute(
+                "INSERT INTO laeufe (zeitpunkt, mieterliste, kontoauszuege, regel_version, mappe) VALUES (?, ?, ?, ?, ?)",
+                (time.strftime("%Y-%m-%dT%H:%M:%S"), str(excel_pfad), json.dumps([str(p) for p in konto_pfade]),
+                 REGEL_VERSION, mappe),
+            ).lastrowid
+            con.executemany(
+                f"INSERT OR IGNORE INTO buchungen (lauf, {', '.join(BUCHUNG_SPALTEN)}) "
+                f"VALUES (?, {', '.join('?' * len(BUCHUNG_SPALTEN))})",
+                ((lauf, *zeile) for zeile in zip(*spalten)),
+            )
+            con.executemany(
+                "INSERT OR REPLACE INTO zuordnungen (mappe, buchung, mieterzeile, mieter, mieter_norm, art, lauf) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((mappe, *z, lauf) for z in zuordnungen),
+            )
+        return lauf
+
+    def abfrage(self, sql, parameter=()) -> pd.DataFrame:
+        with closing(self._verbinde()) as con:
+            return pd.read_sql_query(sql, con, params=parameter)
+
+    def zahlungen(self, jahr=None, mieter=None, bis=None, mappe=None) -> pd.DataFrame:
+        # zugeordnete Zahlungen (optional einer Mieterliste bzw. eines Mieters, normalisierter Name) im Jahr bis
+        # einschließlich `bis` (YYYY-MM-DD), z. B. seit Jahresbeginn: zahlungen(jahr=2025, bis="2025-06-30")
+        bedingungen, parameter = [], []
+        if mappe is not None:
+            bedingungen.append("z.mappe = ?")
+            parameter.append(mappe)
+        if jahr is not None:
+            bedingungen.append("b.datum >= ? AND b.datum < ?")
+            parameter += [f"{int(jahr):04d}-01-01", f"{int(jahr) + 1:04d}-01-01"]
+        if bis is not None:
+            bedingungen.append("b.datum <= ?")
+            parameter.append(str(bis))
+        if mieter is not None:
+            bedingungen.append("z.mieter_norm = ?")
+            parameter.append(mieter)
+        wo = ("WHERE " + " AND ".join(bedingungen)) if bedingungen else ""
+        return self.abfrage(
+            "SELECT z.mappe, z.mieterzeile, z.mieter, z.art, b.datum, b.betrag, b.zahlender, b.verwendungszweck, "
+            "b.klasse, b.monat FROM zuordnungen z JOIN buchungen b ON b.schluessel = z.buchung "
+            f"{wo} ORDER BY z.mappe, z.mieterzeile, b.datum",
+            parameter,
+        )
+
+    def summen(self, jahr=None, bis=None, mappe=None) -> pd.DataFrame:
+        # Summe der zugeordneten Beträge je Mieter (Mieterliste und Zeile)
+        df = self.zahlungen(jahr=jahr, bis=bis, mappe=mappe)
+        return (df.groupby(["mappe", "mieterzeile", "mieter"], sort=True)["betrag"].agg(["sum", "count"])
+                .reset_index().rename(columns={"sum": "summe", "count": "buchungen"}))
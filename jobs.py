@@ -0,0 +1,131 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Hintergrund-Warteschlange für Mietabgleiche: begrenzter Worker-Pool, Job-IDs zum Abfragen,
+# Rückstau-Grenze (volle Warteschlange → QueueFull) und Abbruch. Statuswechsel und Zwischenstände
+# (Job.melde) wecken Wartende in Job.warte, z. B. Event-Streams.
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"  # queued → running → done | error | cancelled
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.trace = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.info = {}  # zusätzliche Angaben für die Statusabfrage (z. B. Messwerte)
+        self.fortschritt = None  # letzter Zwischenstand (messung.Fortschritt)
+        self.version = 0  # zählt Statuswechsel und Zwischenstände
+        self._geaendert = threading.Condition()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    def aktualisiert(self):
+        with self._geaendert:
+            self.version += 1
+            self._geaendert.notify_all()
+
+    def melde(self, stand):
+        # Zwischenstand des laufenden Abgleichs übernehmen (Empfänger für messung.Fortschritt)
+        self.fortschritt = stand
+        self.aktualisiert()
+
+    def warte(self, version, timeout=None) -> int:
+        # blockiert, bis sich der Job gegenüber `version` geändert hat (oder timeout); Rückgabe: aktuelle Version
+        with self._geaendert:
+            self._geaendert.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.error:
+            data["message"] = self.error
+            data["trace"] = self.trace
+        if self.fortschritt is not None:
+            data["fortschritt"] = self.fortschritt
+        data.update(self.info)
+        return data
+
+
+class JobQueue:
+    def __init__(self, max_workers=2, max_queued=10, keep_seconds=3600):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queued = max(0, int(max_queued))
+        self.keep_seconds = keep_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mietabgleich")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, fn, *args, **kwargs) -> Job:
+        # fn wird im Worker als fn(job, *args, **kwargs) aufgerufen; job.cancel_event signalisiert Abbruch
+        with self._lock:
+            self._aufraeumen()
+            aktiv = sum(1 for j in self._jobs.values() if not j.is_finished)
+            if aktiv >= self.max_workers + self.max_queued:
+                raise QueueFull()
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._ausfuehren, job, fn, args, kwargs)
+        return job
+
+    def _ausfuehren(self, job, fn, args, kwargs):
+        if job.cancel_event.is_set():
+            return
+        job.status = "running"
+        job.started = time.time()
+        job.aktualisiert()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "cancelled" if job.cancel_event.is_set() else "done"
+        except Exception as e:
+            if job.cancel_event.is_set():
+                job.status = "cancelled"
+            else:
+                job.status = "error"
+                job.error = str(e)
+                job.trace = traceback.format_exc()
+        finally:
+            job.finished = time.time()
+            job.aktualisiert()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id) -> bool:
+        # Wartende Jobs werden sofort verworfen, laufende an der nächsten Prüfstelle abgebrochen
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status = "cancelled"
+            job.finished = time.time()
+            job.aktualisiert()
+        return True
+
+    def _aufraeumen(self):
+        # abgeschlossene Jobs nach Ablauf der Aufbewahrungszeit vergessen
+        grenze = time.time() - self.keep_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.is_finished and (j.finished or 0) < grenze]:
+            del self._jobs[job_id]
@@ -0,0 +1,79 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Regeln für den Zahlungsgrund; Reihenfolge = Priorität (Miete > Nebenkosten > Nachzahlung > Rate > Honorar).
+# Drittes Feld: ob ein Treffer dieses Musters auch als Suchwort (__hit) zählt.
+# "hausgeld"/"heizkosten" klassifizieren nur, liefern aber kein Suchwort (wie bisher).
+KLASSIFIKATIONS_REGELN = [
+    ("Miete", r"\bmiet\w*\b", True),  # deckt miete, mieten, mietzahlung, mietzins, mieter, etc. ab
+    ("Miete", r"\bkm\b", True),
+    ("Miete", r"\bkaltmiete\b", True),
+    ("Miete", r"\bstellplatz\b", True),
+    ("Miete", r"\bgarage\b", True),
+    ("Nebenkosten", r"\bnebenkosten\b", True),
+    ("Nebenkosten", r"\bnk\b", True),
+    ("Nebenkosten", r"\bbetriebskosten\b", True),
+    ("Nebenkosten", r"\bbk\b", True),
+    ("Nebenkosten", r"\bhausgeld\b", False),
+    ("Nebenkosten", r"\bheizkosten\b", False),
+    ("Nachzahlung", r"\bnach\-?zahlung\b", True),
+    ("Nachzahlung", r"\bnachz\b", True),
+    ("Rate", r"\brate(?:nzahlung)?\b", True),
+    ("Honorar", r"\bhonorar\b", True),
+]
+
+KLASSE_SONSTIGES = "Sonstiges"
+
+# Bei jeder Änderung an Regeln oder Abgleichlogik erhöhen – macht zwischengespeicherte Ergebnisse ungültig
+REGEL_VERSION = 1
+
+
+def _baue_regex(regeln):
+    # Eine einzige Alternation aller Suchmuster, je Regel eine Gruppe (Gruppe i+1 = Regel i).
+    # Alle Muster treffen nur ganze Wörter, daher findet ein einziger Durchlauf (finditer)
+    # jedes Vorkommen jeder Regel. Die Priorität wird danach über die Regelnummer bestimmt:
+    # kleinste Regelnummer gewinnt, bei gleicher Regel das erste Vorkommen im Text
+    # (entspricht der alten Schleife aus re.search je Muster).
+    alternativen = [f"({muster})" for _, muster, _ in regeln]
+    # Vorfilter: nur an Wortanfängen mit passendem Anfangsbuchstaben weiterprüfen
+    # (nur möglich, wenn alle Muster mit \b<Buchstabe> beginnen)
+    praefix = ""
+    if all(muster.startswith(r"\b") and muster[2:3].isalpha() for _, muster, _ in regeln):
+        anfaenge = sorted({muster[2] for _, muster, _ in regeln})
+        praefix = r"\b(?=[" + "".join(anfaenge) + "])"
+    return re.compile(praefix + "(?:" + "|".join(alternativen) + ")", flags=re.IGNORECASE)
+
+
+KLASSIFIKATIONS_REGEX = _baue_regex(KLASSIFIKATIONS_REGELN)
+_LABELS = [label for label, _, _ in KLASSIFIKATIONS_REGELN]
+_ALS_SUCHWORT = [als_suchwort for _, _, als_suchwort in KLASSIFIKATIONS_REGELN]
+
+
+def _klassifiziere_text(t: str):
+    regel = None
+    hit_regel = None
+    hit = ""
+    for m in KLASSIFIKATIONS_REGEX.finditer(t):
+        i = m.lastindex - 1
+        if regel is None or i < regel:
+            regel = i
+        if _ALS_SUCHWORT[i] and (hit_regel is None or i < hit_regel):
+            hit_regel = i
+            hit = m.group(i + 1)
+    if regel is None:
+        return KLASSE_SONSTIGES, ""
+    return _LABELS[regel], hit
+
+
+def klassifiziere_spalte(texte: pd.Series) -> pd.DataFrame:
+    # Liefert für eine ganze Textspalte die Spalten "__klass" und "__hit" in einem Regex-Durchlauf.
+    # Gleiche Texte (in Bankdaten sehr häufig) werden nur einmal ausgewertet.
+    t = texte.fillna("").astype(str).str.lower()
+    codes, uniques = pd.factorize(t, sort=False)
+    ergebnisse = [_klassifiziere_text(u) for u in uniques]
+    klass_u = np.array([k for k, _ in ergebnisse] + [KLASSE_SONSTIGES], dtype=object)
+    hit_u = np.array([h for _, h in ergebnisse] + [""], dtype=object)
+    # codes == -1 (fehlende Werte) → letzter Eintrag
+    return pd.DataFrame({"__klass": klass_u[codes], "__hit": hit_u[codes]}, index=texte.index)
@@ -0,0 +1,141 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+
+from ergebnis_cache import datei_hash
+
+
+# Spaltenorientierter Cache für aufbereitete Kontoauszüge (Arrow IPC, unkomprimiert → memory-mapped lesbar;
+# to_pandas und die Rückwandlung der Textspalten in Python-Objekte kopieren die Daten dennoch – gespart wird
+# das Lesen und Aufbereiten des Auszugs, nicht die Kopie in den DataFrame).
+# Schlüssel = Hash des Auszugs, Regelversion, AUFBEREITUNG_VERSION und Leseoptionen (Engine). Abgelegt werden
+# die aufbereiteten relevanten Buchungen (alle abgeleiteten Spalten, Journal-Schlüssel je Zeile) und die
+# Journal-Schlüssel der übrigen Zeilen – derselbe Auszug muss damit gegen andere Mieterlisten oder bei
+# Korrekturläufen nicht erneut gelesen und aufbereitet werden.
+# Benötigt pyarrow (optional, siehe arrow_verfuegbar).
+
+# erhöhen, wenn sich Typisierung, Normalisierung oder die abgeleiteten Spalten ändern
+AUFBEREITUNG_VERSION = 3
+
+_INDEX_SPALTE = "__zeile"
+
+
+def arrow_verfuegbar() -> bool:
+    # nur nachsehen, nicht importieren – pyarrow wird erst beim ersten Cache-Zugriff geladen
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class KontoCache:
+    # ohne Lock/offene Handles; Zähler (treffer, fehlschlaege, verdraengt) gelten nur für den Prozess, der
+    # hole/lege_ab aufruft – mieten greift deshalb nur aus dem aufrufenden Prozess zu
+    def __init__(self, verzeichnis, max_bytes=1024 * 1024 * 1024, max_alter_sekunden=30 * 24 * 3600):
+        self.verzeichnis = verzeichnis
+        self.max_bytes = max_bytes
+        self.max_alter_sekunden = max_alter_sekunden
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self.verdraengt = 0
+        os.makedirs(self.verzeichnis, exist_ok=True)
+
+    def schluessel(self, pfad, **optionen) -> str:
+        from klassifikation import REGEL_VERSION
+
+        h = hashlib.sha256()
+        h.update(f"regel-version:{REGEL_VERSION}|aufbereitung:{AUFBEREITUNG_VERSION}".encode())
+        h.update(datei_hash(pfad).encode())
+        h.update(json.dumps(optionen, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _pfade(self, schluessel):
+        basis = os.path.join(self.verzeichnis, schluessel)
+        return f"{basis}.arrow", f"{basis}.sonstige.arrow"
+
+    def hole(self, schluessel):
+        # Treffer: (relevante Buchungen, Journal-Schlüssel der übrigen Zeilen, gelesene Zeilen), sonst None
+        import pyarrow as pa
+
+        pfad, sonstige_pfad = self._pfade(schluessel)
+        try:
+            if (time.time() - os.path.getmtime(pfad)) > self.max_alter_sekunden:
+                raise FileNotFoundError(pfad)
+            with pa.memory_map(pfad) as quelle:
+                tabelle = pa.ipc.open_file(quelle).read_all()
+                meta = json.loads(tabelle.schema.metadata[b"konto_cache"])
+                df = tabelle.to_pandas()
+            with pa.memory_map(sonstige_pfad) as quelle:
+                sonstige = pa.ipc.open_file(quelle).read_all().column(0).to_pylist()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            self.fehlschlaege += 1
+            return None
+        self.treffer += 1
+        # Zugriffszeit merken → Verdrängung nach "zuletzt benutzt"
+        os.utime(pfad, None)
+        df = df.set_index(_INDEX_SPALTE)
+        df.index.name = None
+        for spalte in meta["objekt_spalten"]:
+            df[spalte] = df[spalte].astype(object)
+        return df, sonstige, meta["gelesen"]
+
+    def lege_ab(self, schluessel, relevant, sonstige, gelesen):
+        import pyarrow as pa
+
+        pfad, sonstige_pfad = self._pfade(schluessel)
+        meta = {
+            "gelesen": int(gelesen),
+            # Spalten mit Python-Objekten (z. B. normalisierte Texte) kommen sonst als str-Spalten zurück
+            "objekt_spalten": [str(c) for c in relevant.columns if relevant[c].dtype == object],
+        }
+        tabelle = pa.Table.from_pandas(relevant.reset_index(names=_INDEX_SPALTE), preserve_index=False)
+        tabelle = tabelle.replace_schema_metadata({**(tabelle.schema.metadata or {}), b"konto_cache": json.dumps(meta)})
+        sonstige_tabelle = pa.table({"schluessel": pa.array([str(s) for s in sonstige], type=pa.string())})
+        # erst die Nebendatei, zuletzt (atomar) die Hauptdatei – ein Eintrag gilt erst mit ihr als vorhanden
+        for ziel, daten in ((sonstige_pfad, sonstige_tabelle), (pfad, tabelle)):
+            tmp = f"{ziel}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp, "wb") as senke, pa.ipc.new_file(senke, daten.schema) as schreiber:
+                schreiber.write_table(daten)
+            os.replace(tmp, ziel)
+        self._raeume_auf()
+
+    def _eintraege(self):
+        eintraege = []
+        for name in os.listdir(self.verzeichnis):
+            if not name.endswith(".arrow") or name.endswith(".sonstige.arrow"):
+                continue
+            pfad = os.path.join(self.verzeichnis, name)
+            sonstige_pfad = pfad[:-len(".arrow")] + ".sonstige.arrow"
+            try:
+                st = os.stat(pfad)
+                groesse = st.st_size + os.path.getsize(sonstige_pfad)
+            except FileNotFoundError:
+                continue
+            eintraege.append((st.st_mtime, groesse, pfad, sonstige_pfad))
+        return sorted(eintraege)
+
+    def _raeume_auf(self):
+        # Verdrängung: zuerst abgelaufene Einträge, dann die am längsten unbenutzten bis zur Größengrenze
+        grenze = time.time() - self.max_alter_sekunden
+        eintraege = self._eintraege()
+        gesamt = sum(groesse for _, groesse, _, _ in eintraege)
+        for mtime, groesse, pfad, sonstige_pfad in eintraege:
+            if mtime >= grenze and gesamt <= self.max_bytes:
+                break
+            for p in (pfad, sonstige_pfad):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+            gesamt -= groesse
+            self.verdraengt += 1
+
+    def statistik(self) -> dict:
+        eintraege = self._eintraege()
+        return {
+            "hits": self.treffer,
+            "misses": self.fehlschlaege,
+            "evictions": self.verdraengt,
+            "entries": len(eintraege),
+            "bytes": sum(groesse for _, groesse, _, _ in eintraege),
+        }
@@ -0,0 +1,420 @@
+import csv
+import logging
+import os
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+
+import pandas as pd
+
+# Kontoauszug (XLSX) erwartete Spalten
+KONTO_DATUM = "Wertstellung"
+KONTO_PAYEE = "Empfänger/Auftraggeber"
+KONTO_VWZ = "Verwendungszweck"
+KONTO_KATEGORIE = "Kategorie"
+KONTO_OBJEKT = "Kontoname (Objekt)"
+KONTO_BETRAG = "Betrag"
+
+KONTO_SPALTEN = [KONTO_DATUM, KONTO_PAYEE, KONTO_VWZ, KONTO_KATEGORIE, KONTO_OBJEKT, KONTO_BETRAG]
+
+# Übliche Spaltennamen deutscher Bank-CSV-Exporte → KONTO_*-Spalten
+CSV_SPALTEN_ALIASE = {
+    "Wertstellung": KONTO_DATUM,
+    "Valutadatum": KONTO_DATUM,
+    "Valuta": KONTO_DATUM,
+    "Buchungstag": KONTO_DATUM,
+    "Buchungsdatum": KONTO_DATUM,
+    "Empfänger/Auftraggeber": KONTO_PAYEE,
+    "Auftraggeber/Empfänger": KONTO_PAYEE,
+    "Beguenstigter/Zahlungspflichtiger": KONTO_PAYEE,
+    "Begünstigter/Zahlungspflichtiger": KONTO_PAYEE,
+    "Zahlungspflichtige*r": KONTO_PAYEE,
+    "Name Zahlungsbeteiligter": KONTO_PAYEE,
+    "Verwendungszweck": KONTO_VWZ,
+    "Kategorie": KONTO_KATEGORIE,
+    "Buchungstext": KONTO_KATEGORIE,
+    "Umsatzart": KONTO_KATEGORIE,
+    "Kontoname (Objekt)": KONTO_OBJEKT,
+    "Kontoname": KONTO_OBJEKT,
+    "Bezeichnung Auftragskonto": KONTO_OBJEKT,
+    "Auftragskonto": KONTO_OBJEKT,
+    "Betrag": KONTO_BETRAG,
+    "Betrag (EUR)": KONTO_BETRAG,
+    "Umsatz": KONTO_BETRAG,
+}
+
+# Zeilen je Block beim streamenden Einlesen; begrenzt den Speicherbedarf unabhängig von der Dateigröße
+STANDARD_CHUNK_ZEILEN = 50_000
+
+# CSV-Zeilen mit falscher Feldzahl werden übersprungen und hier als Warnung (mit Zeilennummer) gemeldet
+_log = logging.getLogger(__name__)
+# so viele übersprungene Zeilen je Datei werden einzeln aufgeführt
+MAX_GEMELDETE_ZEILEN = 20
+
+
+def _zelle_als_text(v) -> str:
+    # Zellwert als Text – so wie pd.read_excel(dtype=str) ihn liefern würde
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        return str(v)
+    if isinstance(v, date):
+        return str(datetime(v.year, v.month, v.day))
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _spaltennamen(header_values) -> list:
+    namen = []
+    for i, v in enumerate(header_values):
+        name = _zelle_als_text(v) or f"Unnamed: {i}"
+        # doppelte Überschriften wie pandas durchnummerieren
+        namen.append(name if name not in namen else f"{name}.{i}")
+    return namen
+
+
+def wende_header_fallback_an(df_konto: pd.DataFrame) -> pd.DataFrame:
+    # Fallback für den Fall, dass keine Header vorhanden sind (A-F)
+    if not all(col in df_konto.columns for col in KONTO_SPALTEN):
+        if len(df_konto.columns) >= 6:
+            cols = list(df_konto.columns[:6])
+            mapping = dict(zip(cols, KONTO_SPALTEN))
+            df_konto = df_konto.rename(columns=mapping)
+    return df_konto
+
+
+def _wende_csv_aliase_an(df_konto: pd.DataFrame) -> pd.DataFrame:
+    # Bekannte Bank-Spaltennamen umbenennen; fehlen danach nur Kategorie/Objekt, werden sie leer ergänzt.
+    # Sonst greift der Positions-Fallback (A-F) wie bei XLSX.
+    mapping = {}
+    for col in df_konto.columns:
+        ziel = CSV_SPALTEN_ALIASE.get(str(col).strip())
+        if ziel and ziel not in mapping.values() and ziel not in df_konto.columns.drop(col):
+            mapping[col] = ziel
+    df_konto = df_konto.rename(columns=mapping)
+    if all(col in df_konto.columns for col in (KONTO_DATUM, KONTO_PAYEE, KONTO_VWZ, KONTO_BETRAG)):
+        for col in (KONTO_KATEGORIE, KONTO_OBJEKT):
+            if col not in df_konto.columns:
+                df_konto[col] = ""
+        return df_konto
+    return wende_header_fallback_an(df_konto)
+
+
+def _zeilen_openpyxl(pfad):
+    # openpyxl im read_only-Modus: Zeilen werden aus dem XML gestreamt, nicht als Zellobjekte gehalten
+    from openpyxl import load_workbook
+
+    wb = load_workbook(pfad, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        for values in ws.iter_rows(values_only=True):
+            yield values
+    finally:
+        wb.close()
+
+
+def _zeilen_calamine(pfad):
+    # python-calamine (Rust) – deutlich schneller als openpyxl, optional installiert
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_path(pfad)
+    try:
+        sheet = wb.get_sheet_by_index(0)
+        for values in sheet.iter_rows():
+            yield [None if v == "" else v for v in values]
+    finally:
+        if hasattr(wb, "close"):
+            wb.close()
+
+
+def _in_bloecken(zeilen, chunk_zeilen):
+    zeilen = iter(zeilen)
+    header = None
+    for values in zeilen:
+        if any(v is not None and v != "" for v in values):
+            header = _spaltennamen(values)
+            break
+    if header is None:
+        yield pd.DataFrame(columns=KONTO_SPALTEN, dtype=object)
+        return
+
+    breite = len(header)
+    block = []
+    offset = 0
+    geliefert = False
+    for values in zeilen:
+        texte = [_zelle_als_text(v) for v in values[:breite]]
+        if not any(texte):
+            # leere Zeilen überspringt auch pd.read_excel
+            continue
+        if len(texte) < breite:
+            texte.extend([""] * (breite - len(texte)))
+        block.append(texte)
+        if len(block) >= chunk_zeilen:
+            yield _als_dataframe(block, header, offset)
+            offset += len(block)
+            block = []
+            geliefert = True
+    if block or not geliefert:
+        yield _als_dataframe(block, header, offset)
+
+
+def _als_dataframe(block, header, offset):
+    df = pd.DataFrame(block, columns=header, dtype=object)
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    return wende_header_fallback_an(df)
+
+
+def _lese_pandas(pfad, chunk_zeilen):
+    # Bisheriges Verhalten: komplette Datei über pd.read_excel (openpyxl), ein einziger Block
+    df_konto = pd.read_excel(pfad, dtype=str).fillna("")
+    yield wende_header_fallback_an(df_konto)
+
+
+def _lese_openpyxl(pfad, chunk_zeilen):
+    yield from _in_bloecken(_zeilen_openpyxl(pfad), chunk_zeilen)
+
+
+def _lese_calamine(pfad, chunk_zeilen):
+    yield from _in_bloecken(_zeilen_calamine(pfad), chunk_zeilen)
+
+
+def _csv_format(pfad):
+    # Kodierung (UTF-8 oder Windows-1252, wie bei deutschen Banken üblich), Trennzeichen
+    # und Kopfzeile bestimmen. Kopfzeile ist die Zeile mit den meisten bekannten Spaltennamen
+    # (CSV_SPALTEN_ALIASE); Vorspann-Zeilen (Kontonummer, Zeitraum, …) davor werden übersprungen.
+    # Ohne erkennbare Überschriften: erste Zeile mit der größten Feldzahl (Positions-Fallback A-F).
+    with open(pfad, "rb") as f:
+        probe = f.read(256 * 1024)
+    try:
+        # Probe könnte mitten in einem Multibyte-Zeichen enden
+        probe[:max(0, len(probe) - 4)].decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "cp1252"
+    zeilen = probe.decode(encoding, errors="replace").splitlines()[:50]
+    sep = ";" if sum(z.count(";") for z in zeilen) >= sum(z.count(",") for z in zeilen) else ","
+    felder = [next(csv.reader([z], delimiter=sep)) if z.strip() else [] for z in zeilen]
+    bekannt = [sum(1 for name in f if name.strip() in CSV_SPALTEN_ALIASE) for f in felder]
+    if max(bekannt, default=0) >= 2:
+        kopfzeile = bekannt.index(max(bekannt))
+    else:
+        breite = max((len(f) for f in felder), default=0)
+        kopfzeile = next((i for i, f in enumerate(felder) if len(f) == breite), 0)
+    header = felder[kopfzeile] if felder else []
+    return encoding, sep, kopfzeile, header
+
+
+def _arrow_verfuegbar() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _lese_csv(pfad, chunk_zeilen):
+    # Semikolon-getrennte Bank-Exporte: alle Spalten explizit als Text, kein Excel-Umweg.
+    # Mit pyarrow wird blockweise über den Arrow-Streaming-Reader gelesen, sonst über die C-Engine von pandas.
+    # Zeilen mit falscher Feldzahl fehlen im Ergebnis – sie werden gesammelt und am Ende als Warnung gemeldet,
+    # damit keine Zahlung unbemerkt verloren geht
+    encoding, sep, kopfzeile, header = _csv_format(pfad)
+    bloecke = _csv_bloecke_arrow if _arrow_verfuegbar() else _csv_bloecke_pandas
+    uebersprungen = []
+    offset = 0
+    geliefert = False
+    for df in bloecke(pfad, encoding, sep, kopfzeile, _spaltennamen(header), chunk_zeilen, uebersprungen):
+        df = df.fillna("")
+        df = df[(df != "").any(axis=1)]
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        geliefert = True
+        yield _wende_csv_aliase_an(df)
+    if not geliefert:
+        yield pd.DataFrame(columns=KONTO_SPALTEN, dtype=object)
+    if uebersprungen:
+        _log.warning(
+            "%s: %d Zeile(n) mit falscher Feldzahl übersprungen: %s%s", pfad, len(uebersprungen),
+            "; ".join(uebersprungen[:MAX_GEMELDETE_ZEILEN]), " …" if len(uebersprungen) > MAX_GEMELDETE_ZEILEN else "",
+        )
+
+
+def _csv_bloecke_pandas(pfad, encoding, sep, kopfzeile, spalten, chunk_zeilen, uebersprungen):
+    # Zeilen mit überzähligen Feldern landen in Reservespalten und werden hier aussortiert (die C-Engine kann
+    # übersprungene Zeilen nicht melden); noch breitere Zeilen → Fehler statt stillem Verwerfen
+    reserve = [f"__ueberzaehlig{i}" for i in range(len(spalten))]
+    datenzeile = 0
+    for df in pd.read_csv(
+        pfad, sep=sep, encoding=encoding, skiprows=kopfzeile + 1, header=None, names=spalten + reserve,
+        dtype=str, keep_default_na=False, engine="c", chunksize=chunk_zeilen,
+    ):
+        # fehlende Felder kurzer Zeilen sind NaN
+        zu_breit = (df[reserve].fillna("") != "").any(axis=1).to_numpy()
+        if zu_breit.any():
+            for pos in zu_breit.nonzero()[0]:
+                werte = [v for v in df.iloc[pos].fillna("").tolist() if v != ""]
+                uebersprungen.append(f"Datenzeile {datenzeile + pos + 1}: {sep.join(werte)}")
+            df = df[~zu_breit]
+        datenzeile += len(zu_breit)
+        yield df[spalten]
+
+
+def _csv_bloecke_arrow(pfad, encoding, sep, kopfzeile, spalten, chunk_zeilen, uebersprungen):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    def zeile_ungueltig(zeile):
+        uebersprungen.append(f"Zeile {zeile.number}: {zeile.text}" if zeile.number is not None else zeile.text)
+        return "skip"
+
+    reader = pacsv.open_csv(
+        pfad,
+        read_options=pacsv.ReadOptions(
+            encoding="utf8" if encoding == "utf-8-sig" else encoding,
+            skip_rows=kopfzeile + 1,
+            column_names=spalten,
+            # grob ~200 Byte je Zeile
+            block_size=max(1 << 20, chunk_zeilen * 200),
+        ),
+        parse_options=pacsv.ParseOptions(delimiter=sep, invalid_row_handler=zeile_ungueltig),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in spalten},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    for batch in reader:
+        df = batch.to_pandas()
+        for start in range(0, len(df), chunk_zeilen):
+            yield df.iloc[start:start + chunk_zeilen].astype(object)
+
+
+def _xml_name(tag) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _kind(elem, *pfad):
+    # Kindelement über lokale Namen (Namespace-unabhängig, camt.053.001.02 … .08)
+    for name in pfad:
+        if elem is None:
+            return None
+        elem = next((c for c in elem if _xml_name(c.tag) == name), None)
+    return elem
+
+
+def _kind_text(elem, *pfad) -> str:
+    e = _kind(elem, *pfad)
+    return (e.text or "").strip() if e is not None else ""
+
+
+def _camt_name(parteien, rolle) -> str:
+    # <Dbtr><Nm> (bis .001.04) bzw. <Dbtr><Pty><Nm> (ab .001.08)
+    return _kind_text(parteien, rolle, "Nm") or _kind_text(parteien, rolle, "Pty", "Nm")
+
+
+def _camt_datum(elem, name) -> str:
+    d = _kind_text(elem, name, "Dt") or _kind_text(elem, name, "DtTm")[:10]
+    try:
+        return datetime.strptime(d, "%Y-%m-%d").strftime("%d.%m.%Y")
+    except ValueError:
+        return d
+
+
+def _camt_zeilen(ntry, objekt):
+    vorzeichen = "-" if _kind_text(ntry, "CdtDbtInd") == "DBIT" else ""
+    datum = _camt_datum(ntry, "ValDt") or _camt_datum(ntry, "BookgDt")
+    kategorie = _kind_text(ntry, "AddtlNtryInf") or _kind_text(ntry, "BkTxCd", "Prtry", "Cd")
+    betrag_ntry = _kind_text(ntry, "Amt")
+
+    details = _kind(ntry, "NtryDtls")
+    tx_liste = [c for c in details if _xml_name(c.tag) == "TxDtls"] if details is not None else []
+    for tx in tx_liste or [None]:
+        tx_vorzeichen = vorzeichen
+        if _kind_text(tx, "CdtDbtInd"):
+            tx_vorzeichen = "-" if _kind_text(tx, "CdtDbtInd") == "DBIT" else ""
+        # Gutschrift → Zahlender ist der Debitor, Lastschrift → Empfänger ist der Kreditor
+        payee = _camt_name(_kind(tx, "RltdPties"), "Cdtr" if tx_vorzeichen else "Dbtr")
+        rmt = _kind(tx, "RmtInf")
+        vwz_teile = [(c.text or "").strip() for c in rmt if _xml_name(c.tag) == "Ustrd"] if rmt is not None else []
+        vwz = " ".join(t for t in vwz_teile if t) or _kind_text(tx, "AddtlTxInf")
+        # Sammelbuchung: Einzelbetrag je Transaktion, sonst Betrag der Buchung
+        betrag = _kind_text(tx, "Amt") or _kind_text(tx, "AmtDtls", "TxAmt", "Amt")
+        if not betrag and len(tx_liste) <= 1:
+            betrag = betrag_ntry
+        yield [datum, payee, vwz, kategorie, objekt, f"{tx_vorzeichen}{betrag}" if betrag else ""]
+
+
+def _lese_camt(pfad, chunk_zeilen):
+    # CAMT.053 (ISO 20022 Kontoauszug) iterativ parsen: jedes <Ntry> wird nach der Verarbeitung
+    # verworfen, der Speicherbedarf hängt also nur von der Blockgröße ab.
+    block = []
+    offset = 0
+    geliefert = False
+    objekt = ""
+    stapel = []
+    for event, elem in ET.iterparse(pfad, events=("start", "end")):
+        name = _xml_name(elem.tag)
+        if event == "start":
+            stapel.append(elem)
+            continue
+        stapel.pop()
+        if name == "Acct" and stapel and _xml_name(stapel[-1].tag) in ("Stmt", "Rpt", "Ntfctn"):
+            # Kontoname (sonst IBAN) als Objekt
+            objekt = _kind_text(elem, "Nm") or _kind_text(elem, "Id", "IBAN") or _kind_text(elem, "Id", "Othr", "Id")
+        elif name == "Ntry":
+            block.extend(_camt_zeilen(elem, objekt))
+            elem.clear()
+            if stapel:
+                stapel[-1].remove(elem)
+            if len(block) >= chunk_zeilen:
+                yield _als_dataframe(block, KONTO_SPALTEN, offset)
+                offset += len(block)
+                block = []
+                geliefert = True
+    if block or not geliefert:
+        yield _als_dataframe(block, KONTO_SPALTEN, offset)
+
+
+# Verfügbare Leser; weitere Formate können hier registriert werden
+LESER = {
+    "calamine": _lese_calamine,
+    "openpyxl": _lese_openpyxl,
+    "pandas": _lese_pandas,
+    "csv": _lese_csv,
+    "camt": _lese_camt,
+}
+
+# Dateiendung → Leser (bei engine="auto"); alles andere wird als XLSX gelesen
+ENDUNGEN = {
+    ".csv": "csv",
+    ".txt": "csv",
+    ".xml": "camt",
+    ".camt": "camt",
+}
+
+
+def _calamine_verfuegbar() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def waehle_engine(engine: str = "auto", pfad=None) -> str:
+    if engine == "auto":
+        endung = os.path.splitext(str(pfad or ""))[1].lower()
+        if endung in ENDUNGEN:
+            return ENDUNGEN[endung]
+        return "calamine" if _calamine_verfuegbar() else "openpyxl"
+    if engine not in LESER:
+        raise ValueError(f"Unbekannte Engine für den Kontoauszug: {engine}")
+    return engine
+
+
+def lese_kontoauszug(pfad, engine: str = "auto", chunk_zeilen: int = STANDARD_CHUNK_ZEILEN):
+    # Liefert den Kontoauszug (XLSX, CSV oder CAMT.053) blockweise als DataFrames (alle Werte als Text, leere Zellen = "")
+    # mit den Spalten KONTO_* (bzw. den Originalspalten, falls weniger als sechs vorhanden sind).
+    # Der Index zählt über alle Blöcke hinweg die Datenzeilen.
+    leser = LESER[waehle_engine(engine, pfad)]
+    yield from leser(pfad, max(1, int(chunk_zeilen or STANDARD_CHUNK_ZEILEN)))
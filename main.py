@@ -1,18 +1,296 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+import time
+
+_START = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import multiprocessing
 import os
-from mieten import fuehre_mietabgleich_durch  # Deine Mietabgleich-Funktion
+import re
+import shutil
+import uuid
+from messung import Fortschritt, Messung, MetrikRegister
+from vorladen import lade_abgleich, vorladen
+
+UPLOAD_FOLDER = "uploads"
+RESULTS_FOLDER = "results"
+ERGEBNIS_DATEI = "mieten_abgleich.xlsx"
+# /process?format=ndjson: der Worker schreibt die Zuordnungen zeilenweise hierhin, der Server liest mit
+ENTSCHEIDUNGEN_DATEI = "entscheidungen.ndjson"
+# Zwischenstände des Workers (messung.Fortschritt, eine JSON-Zeile je Stand) für /jobs/<job_id>/events
+FORTSCHRITT_DATEI = "fortschritt.ndjson"
+
+# Uploads werden in Blöcken auf die Platte geschrieben; größere Dateien/Anfragen → HTTP 413
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+# Je Auftrag eigene Verzeichnisse uploads/<job_id>/ und results/<job_id>/; Ergebnisse werden nach JOB_TTL_SECONDS gelöscht
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", "3600"))
+AUFRAEUMEN_INTERVALL = 60
+# /jobs/<job_id>/events: mit POST /jobs vergebene Nummern gelten SSE_WARTEN_SECONDS lang (so lange wartet der
+# Stream auf den zugehörigen Upload), Kommentarzeile nach SSE_PING_SECONDS ohne neuen Stand, beendete Aufträge
+# noch SSE_NACHLAUF_SECONDS abrufbar
+SSE_WARTEN_SECONDS = 300
+SSE_PING_SECONDS = 15
+SSE_NACHLAUF_SECONDS = 60
+# Parallel laufende Mietabgleiche (eigene Prozesse, damit die Event-Loop frei bleibt)
+MAX_PARALLEL_JOBS = int(os.environ.get("MAX_PARALLEL_JOBS", "2"))
+
+# Laufzeitmessung je Phase (in der /process-Antwort und unter /metrics); METRIKEN=0 schaltet sie ab
+METRIKEN = os.environ.get("METRIKEN", "1") != "0"
+# VORLADEN=1: Pool-Prozesse laden und wärmen pandas/openpyxl beim eigenen Start (vor ihrem ersten Auftrag)
+VORLADEN = os.environ.get("VORLADEN") == "1"
+metriken = MetrikRegister()
+# laufende und gerade beendete Aufträge: job_id → (Fortschrittsdatei, Future mit der /process-Antwort)
+_auftraege = {}
+# mit POST /jobs vergebene, noch nicht hochgeladene Aufträge: job_id → Ablaufzeit (time.monotonic)
+_angemeldet = {}
+# Aufträge, deren Verzeichnisse gerade benutzt werden (auch NDJSON-Streams) – das Aufräumen lässt sie stehen
+_in_arbeit = set()
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+_ENDUNG = re.compile(r"\.[a-z0-9]{1,8}")
+
+
+class UploadZuGross(Exception):
+    pass
+
+
+def _abgleich_im_prozess(excel_path, konto_path, ergebnis_path, mit_messung, fortschritt_path):
+    # läuft im Worker-Prozess; Rückgabe (Fehlertext oder None, Messung) – die Messung wird im Hauptprozess erfasst.
+    # Zwischenstände gehen zeilenweise in fortschritt_path.
+    messung = Messung() if mit_messung else None
+    with open(fortschritt_path, "a", encoding="utf-8") as f:
+        def melde(stand):
+            f.write(_ndjson_zeile(stand))
+            f.flush()
+
+        try:
+            # Mietabgleich-Funktion (pandas, openpyxl) erst im Worker laden, nicht im Serverprozess
+            fuehre_mietabgleich_durch = lade_abgleich()
+            fuehre_mietabgleich_durch(excel_path, konto_path, ergebnis_path, messung=messung,
+                                      fortschritt=Fortschritt(melde))
+            fehler = None
+        except Exception as e:
+            fehler = str(e)
+    if messung is not None:
+        messung.ende()
+    return fehler, messung
+
+
+def _ndjson_zeile(daten):
+    return json.dumps(daten, ensure_ascii=False) + "\n"
+
+
+def _entscheidungen_im_prozess(excel_path, konto_path, ziel_path, mit_messung):
+    # läuft im Worker-Prozess: Zuordnungen sofort (je Zeile) als NDJSON in ziel_path schreiben;
+    # letzte Zeile {"typ": "ende", ...} oder {"typ": "fehler", ...}. Rückgabe wie _abgleich_im_prozess.
+    messung = Messung() if mit_messung else None
+    anzahl = 0
+    fehler = None
+    with open(ziel_path, "w", encoding="utf-8") as f:
+        try:
+            mietabgleich_entscheidungen = lade_abgleich("mietabgleich_entscheidungen")
+            for entscheidung in mietabgleich_entscheidungen(excel_path, konto_path, messung=messung):
+                f.write(_ndjson_zeile({"typ": "zuordnung", **entscheidung}))
+                f.flush()
+                anzahl += 1
+            ende = {"typ": "ende", "zuordnungen": anzahl}
+            if messung is not None:
+                messung.ende()
+                ende["metriken"] = messung.to_dict()
+            f.write(_ndjson_zeile(ende))
+        except Exception as e:
+            fehler = str(e)
+            f.write(_ndjson_zeile({"typ": "fehler", "message": fehler}))
+    if messung is not None:
+        messung.ende()
+    return fehler, messung
+
+
+def _erfasse_metriken(future):
+    # Callback am Worker-Future: Messung auch erfassen, wenn der Client den Stream vorher abbricht
+    if future.cancelled() or future.exception() is not None:
+        return
+    fehler, messung = future.result()
+    if messung is not None:
+        metriken.erfasse(messung, "error" if fehler else "ok")
+
+
+async def _folge_datei(pfad, future, ping=None):
+    # vom Worker geschriebene Datei mitlesen und vollständige Zeilen weitergeben, bis `future` erledigt ist;
+    # mit ping (Sekunden) zwischendurch None, wenn so lange nichts Neues kam
+    with open(pfad, "rb") as f:
+        rest = b""
+        zuletzt = time.monotonic()
+        while True:
+            fertig = future.done()
+            block = f.read(UPLOAD_CHUNK_BYTES)
+            if block:
+                zeilen, trenner, rest = (rest + block).rpartition(b"\n")
+                if trenner:
+                    yield zeilen + trenner
+                zuletzt = time.monotonic()
+            elif fertig:
+                break
+            else:
+                if ping is not None and time.monotonic() - zuletzt >= ping:
+                    zuletzt = time.monotonic()
+                    yield None
+                await asyncio.sleep(0.05)
+
+
+async def _lies_mit(pfad, future, executor, job_id, verzeichnisse):
+    # NDJSON-Datei des Workers mitlesen, bis der Auftrag beendet ist
+    try:
+        async for zeilen in _folge_datei(pfad, future):
+            yield zeilen
+        fehler = future.exception()
+        if fehler is not None:
+            if isinstance(fehler, BrokenProcessPool):
+                _ersetze_pool(executor)
+            yield _ndjson_zeile({"typ": "fehler", "message": str(fehler)}).encode("utf-8")
+    finally:
+        for verzeichnis in verzeichnisse:
+            shutil.rmtree(verzeichnis, ignore_errors=True)
+        _in_arbeit.discard(job_id)
+
+
+def _sse(ereignis, daten):
+    return f"event: {ereignis}\ndata: {json.dumps(daten, ensure_ascii=False)}\n\n"
+
+
+def _angemeldet_bis(job_id):
+    return _angemeldet.get(job_id, 0)
+
+
+async def _fortschritt_ereignisse(job_id):
+    # Server-Sent Events: "fortschritt" je Zwischenstand, zum Schluss "ende" mit der /process-Antwort
+    ping = time.monotonic() + SSE_PING_SECONDS
+    while job_id not in _auftraege:
+        if _angemeldet_bis(job_id) < time.monotonic():
+            yield _sse("ende", {"status": "error", "message": "Auftrag nicht gefunden"})
+            return
+        if time.monotonic() > ping:
+            ping = time.monotonic() + SSE_PING_SECONDS
+            yield ": ping\n\n"
+        await asyncio.sleep(0.1)
+    pfad, fertig = _auftraege[job_id]
+    yield _sse("fortschritt", {"status": "running"})
+    # die Datei legt /process nach dem Registrieren an
+    while not os.path.exists(pfad) and not fertig.done():
+        await asyncio.sleep(0.05)
+    try:
+        async for zeilen in _folge_datei(pfad, fertig, ping=SSE_PING_SECONDS):
+            if zeilen is None:
+                yield ": ping\n\n"
+                continue
+            for zeile in zeilen.splitlines():
+                yield _sse("fortschritt", {"status": "running", **json.loads(zeile)})
+    except FileNotFoundError:
+        # Auftrag schon beendet und aufgeräumt
+        pass
+    yield _sse("ende", await fertig)
+
+
+def _speichere_upload(quelle, ziel, max_bytes):
+    # blockweise kopieren statt die ganze Datei in den Speicher zu lesen
+    geschrieben = 0
+    with open(ziel, "wb") as f:
+        while True:
+            block = quelle.read(UPLOAD_CHUNK_BYTES)
+            if not block:
+                break
+            geschrieben += len(block)
+            if geschrieben > max_bytes:
+                raise UploadZuGross()
+            f.write(block)
+    return geschrieben
+
+
+def _dateiname(upload, basis):
+    # Originalname des Clients wird nicht verwendet, nur die Endung (für die Formaterkennung)
+    endung = os.path.splitext(upload.filename or "")[1].lower()
+    return basis + (endung if _ENDUNG.fullmatch(endung) else "")
+
+
+def _raeume_auf(aktiv=(), ttl=JOB_TTL_SECONDS):
+    # abgelaufene Auftragsverzeichnisse löschen (nur <job_id>-Ordner, sonstige Dateien bleiben unberührt).
+    # Schreiben in Unterordner ändert deren mtime nicht – laufende, angemeldete und gerade beendete Aufträge
+    # (aktiv) bleiben daher unabhängig vom Alter stehen; Ergebnisordner altern ab dem Ende des Laufs
+    grenze = time.time() - ttl
+    for basis in (UPLOAD_FOLDER, RESULTS_FOLDER):
+        with os.scandir(basis) as eintraege:
+            for e in eintraege:
+                if (e.is_dir(follow_symlinks=False) and _JOB_ID.fullmatch(e.name) and e.name not in aktiv
+                        and e.stat().st_mtime < grenze):
+                    shutil.rmtree(e.path, ignore_errors=True)
+
+
+async def _aufraeumen_periodisch():
+    while True:
+        # Momentaufnahme in der Event-Loop; der Thread liest die Dicts nicht selbst
+        aktiv = _in_arbeit | _auftraege.keys() | _angemeldet.keys()
+        await run_in_threadpool(_raeume_auf, aktiv)
+        await asyncio.sleep(AUFRAEUMEN_INTERVALL)
+
+
+def _neuer_pool():
+    # spawn statt fork: der Server hat bereits Threads, wenn der Pool seine Prozesse startet.
+    # VORLADEN: jeder Pool-Prozess lädt und wärmt den Stack beim eigenen Start (initializer) – mit spawn ist das
+    # ein Aufwärmen je Prozess, keine geteilten Speicherseiten
+    return ProcessPoolExecutor(max_workers=MAX_PARALLEL_JOBS, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=vorladen if VORLADEN else None)
+
+
+def _ersetze_pool(executor):
+    # Worker abgestürzt (z. B. Speicher erschöpft) → Pool für folgende Aufträge ersetzen
+    if app.state.executor is executor:
+        app.state.executor = _neuer_pool()
+        executor.shutdown(wait=False)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.executor = _neuer_pool()
+    aufraeumen = asyncio.create_task(_aufraeumen_periodisch())
+    try:
+        yield
+    finally:
+        aufraeumen.cancel()
+        app.state.executor.shutdown(wait=False, cancel_futures=True)
+
 
 # --- App initialisieren ---
-app = FastAPI(title="Mieten-Abgleich")
+app = FastAPI(title="Mieten-Abgleich", lifespan=lifespan)
 
 # Ordner erstellen, falls nicht vorhanden
-os.makedirs("uploads", exist_ok=True)
-os.makedirs("results", exist_ok=True)
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(RESULTS_FOLDER, exist_ok=True)
+
+# Statische Dateien bereitstellen (optional für HTML/CSS) – nur wenn der Ordner existiert,
+# sonst bricht StaticFiles den Start ab
+if os.path.isdir("static"):
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+
 
-# Statische Dateien bereitstellen (optional für HTML/CSS)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@app.middleware("http")
+async def begrenze_upload(request: Request, call_next):
+    # zu große Anfragen ablehnen, bevor der Body gelesen wird (zwei Dateien je Anfrage)
+    if request.method == "POST" and request.url.path == "/process":
+        laenge = request.headers.get("content-length")
+        if laenge and laenge.isdigit() and int(laenge) > 2 * MAX_UPLOAD_BYTES:
+            return JSONResponse({"status": "error", "message": "Upload zu groß"}, status_code=413)
+    return await call_next(request)
+
+# Startzeit des Moduls (ohne Python-Interpreter und Worker), in /metrics als mietabgleich_start_seconds
+metriken.setze("start_seconds", time.perf_counter() - _START)
 
 
 # --- HTML-Startseite ---
@@ -38,21 +316,65 @@ async def index():
             <label class="form-label">CSV Kontoauszug</label>
             <input type="file" name="csv" class="form-control" required>
         </div>
-        <button type="submit" class="btn btn-primary">Starten</button>
+        <button type="submit" class="btn btn-primary" id="submitBtn">Starten</button>
     </form>
     <div id="result" class="mt-4"></div>
 </div>
 
 <script>
 const form = document.getElementById('uploadForm');
+const submitBtn = document.getElementById('submitBtn');
+const phaseText = {
+    cache: "Ergebnis-Cache prüfen", mieterliste: "Mieterliste lesen", kontoauszug: "Kontoauszüge lesen",
+    suchtreffer: "Suchtreffer speichern", zuordnung: "Zahlungen zuordnen", zellen_schreiben: "Zellen schreiben",
+    speichern: "Ergebnis speichern",
+};
+const zahl = (n) => Number(n).toLocaleString('de-DE');
+
+function zeigeFortschritt(resultDiv, f) {
+    let text = "Mietabgleich läuft...";
+    if (f.phase) {
+        text = phaseText[f.phase] || f.phase;
+        if (f.gesamt) text += ` (${zahl(f.verarbeitet)} von ${zahl(f.gesamt)})`;
+        const proSekunde = f.sekunden > 0 ? Math.round(f.buchungen_gelesen / f.sekunden) : 0;
+        text += `<br><small class="text-muted">${zahl(f.buchungen_gelesen)} Buchungen gelesen (${zahl(proSekunde)}/s), `
+              + `${zahl(f.mieter_zugeordnet)} Mieter mit Zahlungen</small>`;
+    }
+    resultDiv.innerHTML = text;
+}
+
 form.addEventListener('submit', async (e) => {
     e.preventDefault();
     const formData = new FormData(form);
     const resultDiv = document.getElementById('result');
     resultDiv.innerHTML = "Mietabgleich läuft...";
+    submitBtn.disabled = true;
 
-    const response = await fetch("/process", { method: "POST", body: formData });
-    const data = await response.json();
+    // Auftragsnummer vorab anmelden, damit die Zwischenstände schon während des Uploads abonniert werden können
+    let quelle = null;
+    try {
+        const auftrag = await (await fetch("/jobs", { method: "POST" })).json();
+        formData.append("job_id", auftrag.job_id);
+        if (window.EventSource) quelle = new EventSource(auftrag.events_url);
+    } catch (err) {
+        // ohne Anmeldung läuft der Abgleich wie bisher, nur ohne Zwischenstände
+    }
+    if (quelle) {
+        quelle.addEventListener("fortschritt", (ev) => zeigeFortschritt(resultDiv, JSON.parse(ev.data)));
+        quelle.addEventListener("ende", () => quelle.close());
+        quelle.onerror = () => quelle.close();
+    }
+
+    let data;
+    try {
+        const response = await fetch("/process", { method: "POST", body: formData });
+        data = await response.json();
+    } catch (err) {
+        data = {status: "error", message: err};
+    } finally {
+        if (quelle) quelle.close();
+        submitBtn.disabled = false;
+    }
 
     if (data.status === "ok") {
         resultDiv.innerHTML = `<div class="alert alert-success">Mietabgleich erfolgreich! <a href="${data.download}" class="alert-link" download>Hier herunterladen</a></div>`;
@@ -66,43 +388,153 @@ form.addEventListener('submit', async (e) => {
 """
 
 
+
 # --- Mietabgleich starten ---
 @app.post("/process")
-async def process_files(excel: UploadFile = File(...), csv: UploadFile = File(...)):
+async def process_files(excel: UploadFile = File(...), csv: UploadFile = File(...), format: str = "json",
+                        job_id: str = Form(None)):
+    # format=ndjson: Probelauf ohne Ergebnisdatei, Zuordnungen werden gestreamt, sobald sie feststehen.
+    # job_id (optional): vorab mit POST /jobs angemeldete Nummer, um /jobs/<job_id>/events schon während des
+    # Uploads zu öffnen; nur einmal verwendbar
+    if job_id is None:
+        job_id = uuid.uuid4().hex
+    elif (_angemeldet.pop(job_id, 0) < time.monotonic() or job_id in _auftraege
+          or os.path.exists(os.path.join(UPLOAD_FOLDER, job_id))
+          or os.path.exists(os.path.join(RESULTS_FOLDER, job_id))):
+        return JSONResponse({"status": "error", "message": "Unbekannte, abgelaufene oder bereits verwendete job_id"},
+                            status_code=400)
+    if format == "ndjson":
+        return await _verarbeite(job_id, excel, csv, format, None)
+
+    loop = asyncio.get_running_loop()
+    fertig = loop.create_future()
+    fortschritt_path = os.path.join(UPLOAD_FOLDER, job_id, FORTSCHRITT_DATEI)
+    _auftraege[job_id] = (fortschritt_path, fertig)
+    antwort = None
+    try:
+        antwort = await _verarbeite(job_id, excel, csv, format, fortschritt_path)
+        return antwort
+    finally:
+        fertig.set_result(json.loads(antwort.body) if antwort is not None
+                          else {"status": "error", "message": "Auftrag abgebrochen"})
+        loop.call_later(SSE_NACHLAUF_SECONDS, _auftraege.pop, job_id, None)
+
+
+async def _verarbeite(job_id, excel, csv, format, fortschritt_path):
+    upload_dir = os.path.join(UPLOAD_FOLDER, job_id)
+    result_dir = os.path.join(RESULTS_FOLDER, job_id)
+    # gelöscht werden nur Verzeichnisse, die diese Anfrage selbst angelegt hat
+    upload_angelegt = result_angelegt = False
+    aufraeumen = True
+    _in_arbeit.add(job_id)
     try:
-        # Dateien speichern
-        excel_path = f"uploads/{excel.filename}"
-        csv_path = f"uploads/{csv.filename}"
-        with open(excel_path, "wb") as f:
-            f.write(excel.file.read())
-        with open(csv_path, "wb") as f:
-            f.write(csv.file.read())
-
-        # Mietabgleich ausführen
-        output_file = f"results/mieten_abgleich.xlsx"
-        fuehre_mietabgleich_durch(excel_path, csv_path, output_file)
+        # Dateien blockweise in das Auftragsverzeichnis speichern
+        os.makedirs(upload_dir)
+        upload_angelegt = True
+        if fortschritt_path is not None:
+            open(fortschritt_path, "wb").close()
+        excel_path = os.path.join(upload_dir, _dateiname(excel, "mieter"))
+        csv_path = os.path.join(upload_dir, _dateiname(csv, "konto"))
+        try:
+            await run_in_threadpool(_speichere_upload, excel.file, excel_path, MAX_UPLOAD_BYTES)
+            await run_in_threadpool(_speichere_upload, csv.file, csv_path, MAX_UPLOAD_BYTES)
+        except UploadZuGross:
+            return JSONResponse({"status": "error", "message": f"Datei größer als {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"},
+                                status_code=413)
+
+        os.makedirs(result_dir)
+        result_angelegt = True
+        if format == "ndjson":
+            ziel = os.path.join(result_dir, ENTSCHEIDUNGEN_DATEI)
+            open(ziel, "wb").close()
+            executor = app.state.executor
+            future = asyncio.get_running_loop().run_in_executor(
+                executor, _entscheidungen_im_prozess, excel_path, csv_path, ziel, METRIKEN)
+            future.add_done_callback(_erfasse_metriken)
+            # Verzeichnisse räumt der Stream nach dem Senden auf
+            aufraeumen = False
+            return StreamingResponse(_lies_mit(ziel, future, executor, job_id, (upload_dir, result_dir)),
+                                     media_type="application/x-ndjson")
+
+        # Mietabgleich in einem Worker-Prozess ausführen
+        output_file = os.path.join(result_dir, ERGEBNIS_DATEI)
+        executor = app.state.executor
+        try:
+            fehler, messung = await asyncio.get_running_loop().run_in_executor(
+                executor, _abgleich_im_prozess, excel_path, csv_path, output_file, METRIKEN, fortschritt_path)
+        except BrokenProcessPool:
+            _ersetze_pool(executor)
+            raise
+        if messung is not None:
+            metriken.erfasse(messung, "error" if fehler else "ok")
+        if fehler:
+            shutil.rmtree(result_dir, ignore_errors=True)
+            return JSONResponse({"status": "error", "message": fehler})
+        # Aufbewahrungsfrist (JOB_TTL_SECONDS) des Ergebnisses ab dem Ende des Laufs
+        os.utime(result_dir)
 
         # Sauberes JSON zurückgeben
         logs = []
         logs.append("Mietabgleich erfolgreich")
-        return JSONResponse({
+        antwort = {
             "status": "ok",
             "message": "Mietabgleich abgeschlossen",
-            "download": "/results/mieten_abgleich.xlsx",
+            "job_id": job_id,
+            "download": f"/results/{job_id}/{ERGEBNIS_DATEI}",
             "logs": logs
-        })
+        }
+        if messung is not None:
+            antwort["metriken"] = messung.to_dict()
+        return JSONResponse(antwort)
     except Exception as e:
+        if result_angelegt:
+            shutil.rmtree(result_dir, ignore_errors=True)
         return JSONResponse({"status": "error", "message": str(e)})
+    finally:
+        # Eingaben werden nach dem Lauf nicht mehr gebraucht
+        if aufraeumen:
+            if upload_angelegt:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+            _in_arbeit.discard(job_id)
+
+
+# --- Zwischenstände eines Auftrags (Server-Sent Events) ---
+@app.post("/jobs")
+async def job_anmelden():
+    # Auftragsnummer vor dem Upload vergeben: der Client öffnet damit /jobs/<job_id>/events und schickt sie
+    # als Formularfeld job_id an /process
+    jetzt = time.monotonic()
+    for abgelaufen in [j for j, bis in _angemeldet.items() if bis < jetzt]:
+        del _angemeldet[abgelaufen]
+    job_id = uuid.uuid4().hex
+    _angemeldet[job_id] = jetzt + SSE_WARTEN_SECONDS
+    return {"job_id": job_id, "events_url": f"/jobs/{job_id}/events"}
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    # nur angemeldete oder laufende/gerade beendete Aufträge, sonst sofort 404
+    if job_id not in _auftraege and _angemeldet_bis(job_id) < time.monotonic():
+        return JSONResponse({"status": "error", "message": "Auftrag nicht gefunden"}, status_code=404)
+    return StreamingResponse(_fortschritt_ereignisse(job_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --- Prometheus-Metriken ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metriken.prometheus_text(), media_type="text/plain; version=0.0.4")
 
 
 # --- Download-Endpunkt ---
-@app.get("/results/{filename}")
-def download_file(filename: str):
-    file_path = f"results/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(
-            file_path,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            filename=filename
-        )
+@app.get("/results/{job_id}/{filename}")
+def download_file(job_id: str, filename: str):
+    if _JOB_ID.fullmatch(job_id) and filename == ERGEBNIS_DATEI:
+        file_path = os.path.join(RESULTS_FOLDER, job_id, filename)
+        if os.path.exists(file_path):
+            return FileResponse(
+                file_path,
+                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                filename=filename
+            )
     return JSONResponse({"status": "error", "message": "Datei nicht gefunden"})
@@ -0,0 +1,223 @@
+import threading
+import time
+
+# Laufzeitmessung des Mietabgleichs: Dauer je Phase, Zeilenzahlen und Cache-Treffer eines Laufs
+# (Messung) sowie Histogramme über alle Läufe im Prometheus-Textformat (MetrikRegister).
+# Ohne Messung wird OHNE_MESSUNG verwendet – dessen Methoden tun nichts, die Kosten bleiben
+# bei einer Handvoll Funktionsaufrufen je Lauf.
+
+
+class Messung:
+    def __init__(self):
+        self.phasen = {}   # Phase → Sekunden
+        self.zaehler = {}  # z. B. buchungen_gelesen, mieter, zellen
+        self.gesamt = None
+        self._phase = None
+        self._start = None
+        self._lauf_start = None
+
+    def phase(self, name):
+        # beendet die laufende Phase und startet `name`
+        jetzt = time.perf_counter()
+        if self._lauf_start is None:
+            self._lauf_start = jetzt
+        self._schliesse(jetzt)
+        self._phase, self._start = name, jetzt
+
+    def zaehle(self, name, anzahl=1):
+        self.zaehler[name] = self.zaehler.get(name, 0) + int(anzahl)
+
+    def ende(self):
+        # schließt die laufende Phase; mehrfacher Aufruf ist unschädlich
+        if self._phase is None and self.gesamt is not None:
+            return
+        jetzt = time.perf_counter()
+        self._schliesse(jetzt)
+        self._phase = None
+        if self._lauf_start is not None:
+            self.gesamt = jetzt - self._lauf_start
+
+    def _schliesse(self, jetzt):
+        if self._phase is not None:
+            self.phasen[self._phase] = self.phasen.get(self._phase, 0.0) + jetzt - self._start
+
+    def to_dict(self) -> dict:
+        return {
+            "gesamt_s": round(self.gesamt, 4) if self.gesamt is not None else None,
+            "phasen_s": {name: round(dauer, 4) for name, dauer in self.phasen.items()},
+            "zaehler": dict(self.zaehler),
+        }
+
+
+class _OhneMessung:
+    def phase(self, name):
+        pass
+
+    def zaehle(self, name, anzahl=1):
+        pass
+
+    def ende(self):
+        pass
+
+
+OHNE_MESSUNG = _OhneMessung()
+
+
+class Fortschritt:
+    # Zwischenstand eines laufenden Abgleichs für Live-Anzeigen (z. B. Server-Sent Events): Phase, Fortschritt
+    # innerhalb der Phase (verarbeitet von gesamt, gesamt None = unbekannt), gelesene/relevante/zugeordnete
+    # Buchungen und Mieter mit Zahlungen. empfaenger(stand) wird bei jedem Phasenwechsel aufgerufen, sonst
+    # höchstens alle `intervall` Sekunden.
+    def __init__(self, empfaenger, intervall=0.25):
+        self.empfaenger = empfaenger
+        self.intervall = intervall
+        self.stand = {
+            "phase": None,
+            "verarbeitet": 0,
+            "gesamt": None,
+            "buchungen_gelesen": 0,
+            "buchungen_relevant": None,
+            "buchungen_zugeordnet": 0,
+            "mieter_zugeordnet": 0,
+            "sekunden": 0.0,
+        }
+        self._start = time.perf_counter()
+        self._gemeldet = self._start
+
+    def phase(self, name, gesamt=None):
+        self.stand.update(phase=name, verarbeitet=0, gesamt=gesamt)
+        self._sende()
+
+    def melde(self, **werte):
+        self.stand.update(werte)
+        if time.perf_counter() - self._gemeldet >= self.intervall:
+            self._sende()
+
+    def zeilen_gelesen(self, anzahl):
+        gelesen = self.stand["buchungen_gelesen"] + int(anzahl)
+        self.melde(buchungen_gelesen=gelesen, verarbeitet=gelesen)
+
+    def _sende(self):
+        self._gemeldet = time.perf_counter()
+        self.stand["sekunden"] = round(self._gemeldet - self._start, 3)
+        self.empfaenger(dict(self.stand))
+
+
+class _OhneFortschritt:
+    def phase(self, name, gesamt=None):
+        pass
+
+    def melde(self, **werte):
+        pass
+
+    def zeilen_gelesen(self, anzahl):
+        pass
+
+
+OHNE_FORTSCHRITT = _OhneFortschritt()
+
+
+class _MitFortschritt:
+    # Messung, deren Phasenwechsel zusätzlich als Fortschritt gemeldet werden
+    def __init__(self, messung, fortschritt):
+        self.messung = messung
+        self.fortschritt = fortschritt
+
+    def phase(self, name):
+        self.messung.phase(name)
+        self.fortschritt.phase(name)
+
+    def zaehle(self, name, anzahl=1):
+        self.messung.zaehle(name, anzahl)
+
+    def ende(self):
+        self.messung.ende()
+
+
+def mit_fortschritt(messung, fortschritt):
+    return messung if fortschritt is OHNE_FORTSCHRITT else _MitFortschritt(messung, fortschritt)
+
+# Histogramm-Grenzen in Sekunden
+STANDARD_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _Histogramm:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.anzahl_je_bucket = [0] * len(buckets)
+        self.summe = 0.0
+        self.anzahl = 0
+
+    def beobachte(self, wert):
+        for i, grenze in enumerate(self.buckets):
+            if wert <= grenze:
+                self.anzahl_je_bucket[i] += 1
+        self.summe += wert
+        self.anzahl += 1
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class MetrikRegister:
+    # Sammelt abgeschlossene Messungen mehrerer Läufe (thread-sicher) für einen /metrics-Endpunkt
+    def __init__(self, praefix="mietabgleich", buckets=STANDARD_BUCKETS):
+        self.praefix = praefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._laeufe = {}   # Status → Anzahl
+        self._gesamt = _Histogramm(self.buckets)
+        self._phasen = {}   # Phase → _Histogramm
+        self._zaehler = {}  # Zählername → Summe
+        self._werte = {}    # Momentanwerte (gauge), z. B. Startzeit des Servers
+
+    def erfasse(self, messung, status="ok"):
+        with self._lock:
+            self._laeufe[status] = self._laeufe.get(status, 0) + 1
+            if messung.gesamt is not None:
+                self._gesamt.beobachte(messung.gesamt)
+            for phase, dauer in messung.phasen.items():
+                self._phasen.setdefault(phase, _Histogramm(self.buckets)).beobachte(dauer)
+            for name, anzahl in messung.zaehler.items():
+                self._zaehler[name] = self._zaehler.get(name, 0) + anzahl
+
+    def setze(self, name, wert):
+        with self._lock:
+            self._werte[name] = float(wert)
+
+    def _histogramm_zeilen(self, name, hist, **labels):
+        zeilen = []
+        for grenze, anzahl in zip(hist.buckets, hist.anzahl_je_bucket):
+            zeilen.append(f"{name}_bucket{_labels(**labels, le=grenze)} {anzahl}")
+        zeilen.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.anzahl}")
+        zeilen.append(f"{name}_sum{_labels(**labels)} {hist.summe}")
+        zeilen.append(f"{name}_count{_labels(**labels)} {hist.anzahl}")
+        return zeilen
+
+    def prometheus_text(self) -> str:
+        p = self.praefix
+        with self._lock:
+            zeilen = [
+                f"# HELP {p}_runs_total Abgeschlossene Mietabgleiche nach Status",
+                f"# TYPE {p}_runs_total counter",
+            ]
+            zeilen += [f"{p}_runs_total{_labels(status=s)} {n}" for s, n in sorted(self._laeufe.items())]
+            zeilen += [
+                f"# HELP {p}_run_seconds Gesamtdauer je Mietabgleich",
+                f"# TYPE {p}_run_seconds histogram",
+            ]
+            zeilen += self._histogramm_zeilen(f"{p}_run_seconds", self._gesamt)
+            zeilen += [
+                f"# HELP {p}_phase_seconds Dauer je Phase des Mietabgleichs",
+                f"# TYPE {p}_phase_seconds histogram",
+            ]
+            for phase, hist in sorted(self._phasen.items()):
+                zeilen += self._histogramm_zeilen(f"{p}_phase_seconds", hist, phase=phase)
+            for name, summe in sorted(self._zaehler.items()):
+                zeilen += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {summe}"]
+            for name, wert in sorted(self._werte.items()):
+                zeilen += [f"# TYPE {p}_{name} gauge", f"{p}_{name} {wert}"]
+        return "\n".join(zeilen) + "\n"
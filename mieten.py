@@ -1,11 +1,39 @@
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
-from openpyxl.comments import Comment
-from openpyxl.cell.cell import MergedCell
+import hashlib
 import os
 import re
-from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
-from datetime import datetime
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from buchungsjournal import JOURNAL_BLATT, buchungs_hash, buchungs_schluessel, journal_schluessel, lade_journal, schreibe_journal
+from klassifikation import klassifiziere_spalte
+from kontoauszug import (
+    KONTO_BETRAG,
+    KONTO_DATUM,
+    KONTO_KATEGORIE,
+    KONTO_OBJEKT,
+    KONTO_PAYEE,
+    KONTO_VWZ,
+    STANDARD_CHUNK_ZEILEN,
+    lese_kontoauszug,
+    waehle_engine,
+)
+from suchtreffer import SUCHTREFFER_BLATT, schreibe_suchtreffer, schreibe_suchtreffer_datei, suchtreffer_blatt
+from messung import OHNE_FORTSCHRITT, OHNE_MESSUNG, mit_fortschritt
+from normalisierung import normalisiere, normalisiere_spalte
+from typisierung import parse_betrag, parse_datum
+from xlsx_patch import PatchNichtMoeglich, speichere_gepatcht
+from zellplanung import ZellPlan, norm_ddmmyyyy
+from zuordnung import (
+    UNSCHARF_BLATT,
+    UNSCHARF_SCHWELLE,
+    baue_payee_index,
+    baue_teilstring_index,
+    ordne_unscharf_zu,
+    schreibe_unscharf_bericht,
+)
 
 MONATS_ZUORDNUNG = {
     # Hinweis: Wegen neuer Spalte "Objekt" zwischen B und C sind alle Zielspalten +1 verschoben
@@ -38,222 +66,103 @@ MONATS_NAMENS_MAPPING = {
     "Dezember": "Dez", "Dez": "Dez",
 }
 
+# Monatswörter im Verwendungszweck/Kategorie – einmal beim Import kompiliert
+_MONATS_SCHLUESSEL = {k.lower(): v for k, v in MONATS_NAMENS_MAPPING.items()}
+_MONATS_MUSTER = re.compile(r"\b(" + "|".join(re.escape(k) for k in MONATS_NAMENS_MAPPING.keys()) + r")\b", flags=re.IGNORECASE)
+_MONATS_INDEX = {name: i for i, name in enumerate(MONATS_ZUORDNUNG)}
+
 BLATTNAME = "mieter"
 MIETER_SPALTE = "A"
 
-# Kontoauszug (XLSX) erwartete Spalten
-KONTO_DATUM = "Wertstellung"
-KONTO_PAYEE = "Empfänger/Auftraggeber"
-KONTO_VWZ = "Verwendungszweck"
-KONTO_KATEGORIE = "Kategorie"
-KONTO_OBJEKT = "Kontoname (Objekt)"
-KONTO_BETRAG = "Betrag"
+# Parallelbetrieb (parallel=True): jeder gelesene Block wird in zusammenhängende Zeilenbereiche von mindestens
+# MIN_TEIL_ZEILEN geteilt und in Worker-Prozessen aufbereitet; währenddessen liest der Hauptprozess bis zu
+# VORLAUF_BLOECKE weitere Blöcke.
+MIN_TEIL_ZEILEN = 5_000
+VORLAUF_BLOECKE = 2
 
 
-def fuehre_mietabgleich_durch(excel_pfad, konto_xlsx_pfad):
+class AbgleichAbgebrochen(Exception):
+    pass
 
-    # Excel (Mieterliste) einlesen
-    workbook = load_workbook(excel_pfad)
-    if BLATTNAME in workbook.sheetnames:
-        try:
-            worksheet = workbook[BLATTNAME]
-        except Exception:
-            return None
-        sheet_arg = BLATTNAME
-    else:
-        # Fallback: erstes Blatt
-        first_sheet = workbook.sheetnames[0]
-        worksheet = workbook[first_sheet]
-        sheet_arg = first_sheet
 
-    # Mieterliste laden
-    df_mieter = pd.read_excel(excel_pfad, sheet_name=sheet_arg, dtype=str)
-    df_mieter = df_mieter.fillna("")
-    mieter_col_name = df_mieter.columns[0]  # Spalte A: Eigentümer/Mieter
-    mieter_b_col_name = df_mieter.columns[1] if len(df_mieter.columns) > 1 else None  # Spalte B: Mieter
-    objekt_col_name = df_mieter.columns[2] if len(df_mieter.columns) > 2 else None     # Spalte C: Objekt
+def _pruefe_abbruch(abbruch):
+    # abbruch: z. B. threading.Event; gesetzt → Lauf an der nächsten Prüfstelle beenden
+    if abbruch is not None and abbruch.is_set():
+        raise AbgleichAbgebrochen("Mietabgleich abgebrochen")
 
-    # Erzeuge ein Index-Mapping von Namen (Spalte A) -> Zeilennummer im Zielblatt,
-    # damit Einträge immer in die korrekte Zeile geschrieben werden – unabhängig von Einfügungen.
+
+def _lade_mieterliste(worksheet):
+    # Ein einziger Durchlauf über das Blatt (statt pd.read_excel + zellweisem Auslesen):
+    # - Tabelle der Spalten A/B/C (Zeile 1 = Überschriften, Werte als Text wie bei dtype=str)
+    # - Index normalisierter Name (Spalte A) -> Zeilennummer im Zielblatt, damit Einträge immer
+    #   in die korrekte Zeile geschrieben werden – unabhängig von Einfügungen.
+    header = None
+    rows = []
     mieter_row_map = {}
-    try:
-        for r in range(1, worksheet.max_row + 1):
-            cell_val = worksheet[f"{MIETER_SPALTE}{r}"].value
-            if cell_val is None:
-                continue
-            key = str(cell_val)
+    for r, values in enumerate(worksheet.iter_rows(min_col=1, max_col=3, values_only=True), start=1):
+        cell_val = values[0]
+        if cell_val is not None:
             # gleiche Normalisierung wie beim Matching
-            key = re.sub(r"[^a-z0-9\s]", " ", key.lower())
-            key = key.replace("ä","ae").replace("ö","oe").replace("ü","ue").replace("ß","ss")
-            key = re.sub(r"\s+", " ", key).strip()
+            key = normalisiere(cell_val)
             if key and key not in mieter_row_map:
                 mieter_row_map[key] = r
-    except Exception:
-        pass
+        if header is None:
+            header = []
+            for i, v in enumerate(values):
+                name = str(v) if v is not None else f"Unnamed: {i}"
+                # doppelte Überschriften wie pandas durchnummerieren
+                header.append(name if name not in header else f"{name}.{i}")
+            continue
+        rows.append(["" if v is None else str(v) for v in values])
 
-    # Kontoauszug (XLSX) einlesen
-    try:
-        df_konto = pd.read_excel(konto_xlsx_pfad, dtype=str)
-    except Exception:
-        return None
+    df_mieter = pd.DataFrame(rows, columns=header or ["Unnamed: 0"], dtype=object)
+    return df_mieter, mieter_row_map
 
-    df_konto = df_konto.fillna("")
-
-    # Fallback für den Fall, dass keine Header vorhanden sind (A-F)
-    if not all(col in df_konto.columns for col in [KONTO_DATUM, KONTO_PAYEE, KONTO_VWZ, KONTO_KATEGORIE, KONTO_OBJEKT, KONTO_BETRAG]):
-        if len(df_konto.columns) >= 6:
-            cols = list(df_konto.columns[:6])
-            mapping = {
-                cols[0]: KONTO_DATUM,
-                cols[1]: KONTO_PAYEE,
-                cols[2]: KONTO_VWZ,
-                cols[3]: KONTO_KATEGORIE,
-                cols[4]: KONTO_OBJEKT,
-                cols[5]: KONTO_BETRAG,
-            }
-            df_konto = df_konto.rename(columns=mapping)
-
-    # Typ-Konvertierungen (robust für EU-Formate wie 640,80 und Tausenderpunkte)
-    df_konto["__betrag_raw"] = df_konto[KONTO_BETRAG].astype(str)
-
-    def _parse_amount_raw(raw: str):
-        s = (str(raw) or "").strip()
-        if not s:
-            return pd.NA
-        s = s.replace("€", "").replace("\xa0", "").replace(" ", "")
-        # Wenn Komma vorhanden → als Dezimaltrenner behandeln, Punkte als Tausender entfernen
-        if "," in s:
-            s2 = s.replace(".", "").replace(",", ".")
-            try:
-                return float(s2)
-            except Exception:
-                pass
-        # Sonst direkten Float-Versuch (z. B. 640.80)
-        try:
-            return float(s)
-        except Exception:
-            # Letzter Fallback: Muster <ganzzahl><,|.><1-2 Dezimalstellen>
-            m = re.search(r"(\d+)[,\.](\d{1,2})$", s)
-            if m:
-                try:
-                    return float(m.group(1) + "." + m.group(2))
-                except Exception:
-                    pass
-        return pd.NA
-
-    df_konto[KONTO_BETRAG] = df_konto["__betrag_raw"].apply(_parse_amount_raw)
-
-    # Datumsformat sauber parsen und Rohwert behalten
-    s = df_konto[KONTO_DATUM]
-    if is_datetime64_any_dtype(s):
-        df_konto["__raw_date"] = s.dt.strftime("%d.%m.%Y")
-    elif is_numeric_dtype(s):
-        dt = pd.to_datetime(s, unit="d", origin="1899-12-30", errors="coerce")
-        df_konto["__raw_date"] = dt.dt.strftime("%d.%m.%Y")
-        df_konto[KONTO_DATUM] = dt
-    else:
-        s2 = (
-            s.astype(str)
-             .str.strip()
-             .str.replace(r"\s+", "", regex=True)
-             .str.replace("/", ".", regex=False)
-        )
-        df_konto["__raw_date"] = s2
-        df_konto[KONTO_DATUM] = pd.to_datetime(s2, format="%d.%m.%Y", errors="coerce")
 
-    # Zahlungsgrund klassifizieren (Miete > Nebenkosten > Nachzahlung > Rate > Honorar)
-    def klassifiziere(text: str) -> str:
-        t = (text or "").lower()
-        # Robustere Erkennung inkl. Synonyme/Abkürzungen; Reihenfolge = Priorität
-        patterns = [
-            ("Miete", [
-                r"\bmiet\w*\b",  # deckt miete, mieten, mietzahlung, mietzins, mieter, etc. ab
-                r"\bkm\b", r"\bkaltmiete\b",
-                r"\bstellplatz\b", r"\bgarage\b"
-            ]),
-            ("Nebenkosten", [
-                r"\bnebenkosten\b", r"\bnk\b", r"\bbetriebskosten\b", r"\bbk\b",
-                r"\bhausgeld\b", r"\bheizkosten\b"
-            ]),
-            ("Nachzahlung", [
-                r"\bnach\-?zahlung\b", r"\bnachz\b"
-            ]),
-            ("Rate", [
-                r"\brate(nzahlung)?\b"
-            ]),
-            ("Honorar", [
-                r"\bhonorar\b"
-            ]),
-        ]
-        for label, pats in patterns:
-            for p in pats:
-                if re.search(p, t, re.IGNORECASE):
-                    return label
-        return "Sonstiges"
+def _bereite_konto_vor(df_konto):
+    # Typisierung (robust für EU-Formate wie 640,80 und Tausenderpunkte): Betrag als float,
+    # Datum als datetime plus DD.MM.YYYY-Text – spätere Schritte lesen nur noch diese Spalten
+    df_konto[KONTO_BETRAG] = parse_betrag(df_konto[KONTO_BETRAG])
+    df_konto[KONTO_DATUM], df_konto["__datum_text"], datum_direkt, iso_monat = parse_datum(df_konto[KONTO_DATUM])
 
+    # Zahlungsgrund klassifizieren (Miete > Nebenkosten > Nachzahlung > Rate > Honorar)
+    # und Trefferwort (erstes passendes Suchwort) für spätere Auswertung – ein Durchlauf je Spalte
     df_konto["__text_summe"] = (
         df_konto[KONTO_VWZ].astype(str) + " " +
         df_konto[KONTO_KATEGORIE].astype(str) + " " +
         df_konto[KONTO_OBJEKT].astype(str)
     )
-    df_konto["__klass"] = df_konto["__text_summe"].apply(klassifiziere)
-
-    # Trefferwort (erstes passendes Suchwort) für spätere Auswertung
-    def finde_suchwort(text: str) -> str:
-        t = (text or "").lower()
-        patterns = [
-            ("Miete", [
-                r"\bmiet\w*\b", r"\bkm\b", r"\bkaltmiete\b",
-                r"\bstellplatz\b", r"\bgarage\b"
-            ]),
-            ("Nebenkosten", [
-                r"\bnebenkosten\b", r"\bnk\b", r"\bbetriebskosten\b", r"\bbk\b"
-            ]),
-            ("Nachzahlung", [
-                r"\bnach\-?zahlung\b", r"\bnachz\b"
-            ]),
-            ("Rate", [
-                r"\brate(nzahlung)?\b"
-            ]),
-            ("Honorar", [
-                r"\bhonorar\b"
-            ]),
-        ]
-        for _, pats in patterns:
-            for p in pats:
-                m = re.search(p, t, re.IGNORECASE)
-                if m:
-                    return m.group(0)
-        return ""
-
-    df_konto["__hit"] = df_konto["__text_summe"].apply(finde_suchwort)
+    df_konto[["__klass", "__hit"]] = klassifiziere_spalte(df_konto["__text_summe"])
 
     # Monatsangabe im Verwendungszweck/Kategorie ermitteln (hat Vorrang vor Wertstellung)
-    month_key_map = {k.lower(): v for k, v in MONATS_NAMENS_MAPPING.items()}
-    month_pattern = re.compile(r"\b(" + "|".join(re.escape(k) for k in MONATS_NAMENS_MAPPING.keys()) + r")\b", flags=re.IGNORECASE)
     def finde_monats_override(vwz_text: str) -> str | None:
         if not vwz_text:
             return None
-        m = month_pattern.search(vwz_text)
+        m = _MONATS_MUSTER.search(vwz_text)
         if not m:
             return None
-        return month_key_map.get(m.group(1).lower())
+        return _MONATS_SCHLUESSEL.get(m.group(1).lower())
 
     df_konto["__month_override"] = (
         (df_konto[KONTO_VWZ].astype(str) + " " + df_konto[KONTO_KATEGORIE].astype(str))
         .apply(finde_monats_override)
     )
 
+    # Zielmonat (1–12): direkt lesbares Datum > Monatswort > Monat aus ISO-ähnlichem Rohwert.
+    # Das Monatswort zählt dabei wie bisher mit seinem Index in MONATS_ZUORDNUNG.
+    df_konto["__monat"] = (
+        df_konto[KONTO_DATUM].dt.month.where(datum_direkt)
+        .fillna(df_konto["__month_override"].map(_MONATS_INDEX))
+        .fillna(iso_monat)
+    )
+
+    # Textspalten je einmal normalisieren
+    df_konto["__norm_payee"] = normalisiere_spalte(df_konto[KONTO_PAYEE])
+    df_konto["__norm_vwz"] = normalisiere_spalte(df_konto[KONTO_VWZ])
+
     # Sonderfall: Wenn Zahlender eine Behörde ist (Jobcenter/Agentur/Stadt Wuppertal),
     # soll im Blatt "suchtreffer" in der Spalte "Suchwort" der komplette Verwendungszweck stehen.
-    def _normalize_simple(val: str) -> str:
-        t = (str(val) or "").lower()
-        t = t.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss")
-        t = re.sub(r"[^a-z0-9\s]", " ", t)
-        t = re.sub(r"\s+", " ", t).strip()
-        return t
-
-    payee_norm = df_konto[KONTO_PAYEE].astype(str).apply(_normalize_simple)
+    payee_norm = df_konto["__norm_payee"]
     gov_mask = (
         payee_norm.str.contains(r"\bjobcenter\b", regex=True)
         | payee_norm.str.contains(r"\bbundesagentur\b", regex=True)
@@ -266,218 +175,479 @@ def fuehre_mietabgleich_durch(excel_pfad, konto_xlsx_pfad):
     mask_has_hit = df_konto["__hit"].astype(str) != ""
     df_konto.loc[(mask_has_hit | gov_mask), "__hit_final"] = df_konto[KONTO_VWZ].astype(str)
 
-    # Neues Blatt mit Suchtreffern erstellen: A Datum, B Name, C Suchwort, D Betrag
-    sheet_such = "suchtreffer"
-    if sheet_such in workbook.sheetnames:
-        del workbook[sheet_such]
-    ws_such = workbook.create_sheet(sheet_such)
-    ws_such.append(["Datum", "Name", "Suchwort", "Betrag", "Zielmonat"])
+    # Für Behörden-Fall: Suchwort (Verwendungszweck) normalisiert – aus den schon normalisierten Spalten
+    df_konto["__norm_hit"] = normalisiere_spalte(df_konto["__klass"])
+    df_konto.loc[(mask_has_hit | gov_mask), "__norm_hit"] = df_konto["__norm_vwz"]
+
+    return df_konto
 
+
+def _relevante_buchungen(df_konto):
     relevante_labels = {"Miete", "Nebenkosten", "Nachzahlung", "Rate", "Honorar"}
     # Alle Einzelbuchungen ohne Aggregation; zusätzlich aufnehmen, wenn ein Monatswort im VWZ erkannt wurde
-    df_such = df_konto[(df_konto["__klass"].isin(relevante_labels)) | (df_konto["__month_override"].notna())].copy()
-    try:
-        df_such = df_such.sort_values([KONTO_PAYEE, KONTO_DATUM, KONTO_BETRAG], kind="mergesort")
-    except Exception:
-        pass
+    return df_konto[(df_konto["__klass"].isin(relevante_labels)) | (df_konto["__month_override"].notna())].copy()
 
-    for _, r in df_such.iterrows():
-        hit = r["__hit_final"]
-        ziel_monat = r.get("__month_override", "")
-        ws_such.append(["", r[KONTO_PAYEE], str(hit), r[KONTO_BETRAG], ziel_monat if ziel_monat else ""])
-        row_idx = ws_such.max_row
-        # Datum korrekt schreiben (immer als echtes Datum DD.MM.YYYY; bei Fehler leer lassen)
-        date_cell = ws_such.cell(row=row_idx, column=1)
-        raw_val = r.get("__raw_date", "")
-        dval = r[KONTO_DATUM]
-        try:
-            if pd.notna(dval):
-                py_dt = dval.to_pydatetime() if hasattr(dval, "to_pydatetime") else dval
-                date_cell.value = py_dt.date()
-                date_cell.number_format = "DD.MM.YYYY"
-            else:
-                rv = (str(raw_val) or "").strip()
-                # ISO-ähnlich: 2025-06-02...
-                m_iso = re.search(r"(\d{4})[-/\.](\d{2})[-/\.](\d{2})", rv)
-                if m_iso:
-                    parsed = datetime(int(m_iso.group(1)), int(m_iso.group(2)), int(m_iso.group(3)))
-                    date_cell.value = parsed.date()
-                    date_cell.number_format = "DD.MM.YYYY"
-                else:
-                    rv2 = rv.replace("/", ".")
-                    parsed = datetime.strptime(rv2, "%d.%m.%Y")
-                    date_cell.value = parsed.date()
-                    date_cell.number_format = "DD.MM.YYYY"
-        except Exception:
-            date_cell.value = None
-            date_cell.number_format = "DD.MM.YYYY"
-        # Betrag formatieren
-        try:
-            ws_such.cell(row=row_idx, column=4).number_format = "#,##0.00"
-        except Exception:
-            pass
-
-    def _normalize_text(val: str) -> str:
-        t = (str(val) or "").lower()
-        t = t.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss")
-        t = re.sub(r"[^a-z0-9\s]", " ", t)
-        t = re.sub(r"\s+", " ", t).strip()
-        return t
-
-    df_konto["__norm_payee"] = df_konto[KONTO_PAYEE].astype(str).apply(_normalize_text)
-    df_konto["__norm_kombi"] = (
-        df_konto[KONTO_PAYEE].astype(str) + " " +
-        df_konto[KONTO_VWZ].astype(str) + " " +
-        df_konto[KONTO_OBJEKT].astype(str)
-    ).apply(_normalize_text)
-    df_konto["__norm_vwz"] = df_konto[KONTO_VWZ].astype(str).apply(_normalize_text)
-    df_konto["__norm_objekt"] = df_konto[KONTO_OBJEKT].astype(str).apply(_normalize_text)
-    # Für Behörden-Fall: Suchwort (Verwendungszweck) normalisiert
-    try:
-        df_such["__norm_hit"] = df_such["__hit_final"].astype(str).apply(_normalize_text)
-    except Exception:
-        pass
 
-    # Eintragen aus Blatt "suchtreffer" in Monats-Spalten (E–AB) je Mieter (Spalte A)
-    months_order = list(MONATS_ZUORDNUNG.keys())
+class KontoauszugNichtLesbar(Exception):
+    pass
+
+
+def _bereite_teil_vor(df_teil, mit_schluessel=False):
+    # läuft im Worker: Aufbereitung je Zeile und Filter; zurück geht nur der (kleine) relevante Teil,
+    # mit_schluessel (inkrementell) zusätzlich der Buchungs-Hash jeder Zeile für das Journal
+    df_teil = _bereite_konto_vor(df_teil)
+    return _relevante_buchungen(df_teil), (buchungs_hash(df_teil) if mit_schluessel else None)
+
+
+def _zeilen_teile(df, anzahl):
+    # zusammenhängende Zeilenbereiche in Originalreihenfolge → Zusammenführen ist deterministisch
+    groesse = max(MIN_TEIL_ZEILEN, -(-len(df) // max(1, anzahl)))
+    return [df.iloc[i:i + groesse] for i in range(0, len(df), groesse)] or [df]
 
-    # Helfer
-    def _get_writable_cell(ws, coord):
-        c = ws[coord]
-        if isinstance(c, MergedCell):
-            for r in ws.merged_cells.ranges:
-                if coord in r:
-                    return ws.cell(row=r.min_row, column=r.min_col)
-        return c
-
-    def _write_date(cell, dt_val, raw_val) -> str:
-        # Schreibe IMMER als echtes Datum (DD.MM.YYYY); bei Fehler leer
-        if pd.notna(dt_val):
+
+def _sammle_teile(futures):
+    ergebnisse = [f.result() for f in futures]
+    gefuellt = [r for r, _ in ergebnisse if len(r)]
+    if len(gefuellt) > 1:
+        relevant = pd.concat(gefuellt)
+    else:
+        relevant = gefuellt[0] if gefuellt else ergebnisse[0][0]
+    hashes = [h for _, h in ergebnisse if h is not None]
+    return relevant, ((pd.concat(hashes) if len(hashes) > 1 else hashes[0]) if hashes else None)
+
+
+def _lies_kontoauszug(konto_pfad, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen, abbruch=None,
+                      pool=None, teile_je_block=1, fortschritt=OHNE_FORTSCHRITT):
+    # Einen Kontoauszug (XLSX, CSV oder CAMT.053) blockweise einlesen und je Block aufbereiten; behalten werden
+    # nur die relevanten Buchungen → Speicherbedarf durch die Blockgröße begrenzt, nicht durch die Datei.
+    # pool: ProcessPoolExecutor für die Aufbereitung (Blöcke in teile_je_block Zeilenbereiche geteilt);
+    # Journal- und Dedup-Schlüssel entstehen fortlaufend im aufrufenden Prozess. Der Journal-Schlüssel
+    # setzt die typisierten Spalten voraus – bekannte Buchungen entfallen daher erst nach der Aufbereitung.
+    # Rückgabe: (relevante Buchungen, Journal-Schlüssel der übrigen Zeilen, Anzahl gelesener Zeilen)
+    bloecke = lese_kontoauszug(konto_pfad, engine=konto_engine, chunk_zeilen=chunk_zeilen)
+    sonstige_buchungen = []
+    vorkommen = {}
+    dedup_vorkommen = {}
+    teile = []
+    offen = deque()  # Futures eines Blocks in Lesereihenfolge
+    gelesen = 0
+
+    def uebernehme(relevant, hashes):
+        if inkrementell:
+            schluessel = buchungs_schluessel(hashes, vorkommen)
+            neu = schluessel[~schluessel.isin(bekannte_buchungen)]
+            relevant = relevant[relevant.index.isin(neu.index)].copy()
+            relevant["__schluessel"] = neu.loc[relevant.index]
+            # nicht relevante Zeilen nur mit Schlüssel ins Journal, damit sie beim nächsten Lauf entfallen
+            sonstige_buchungen.extend(neu[~neu.index.isin(relevant.index)])
+        relevant["__dedup"] = _dedup_schluessel(relevant, dedup_vorkommen)
+        if len(relevant) or not teile:
+            teile.append(relevant)
+
+    try:
+        while True:
             try:
-                py_dt = dt_val.to_pydatetime() if hasattr(dt_val, "to_pydatetime") else dt_val
-                cell.value = py_dt.date()
-                cell.number_format = "DD.MM.YYYY"
-                return py_dt.strftime("%d.%m.%Y")
-            except Exception:
-                pass
-        rv = (str(raw_val) or "").strip()
-        # ISO-ähnlich: 2025-06-02...
-        m_iso = re.search(r"(\d{4})[-/\.](\d{2})[-/\.](\d{2})", rv)
-        try:
-            if m_iso:
-                parsed = datetime(int(m_iso.group(1)), int(m_iso.group(2)), int(m_iso.group(3)))
+                df_konto = next(bloecke)
+            except StopIteration:
+                break
+            except Exception as e:
+                raise KontoauszugNichtLesbar(str(konto_pfad)) from e
+            _pruefe_abbruch(abbruch)
+            gelesen += len(df_konto)
+            fortschritt.zeilen_gelesen(len(df_konto))
+            if pool is None:
+                uebernehme(*_bereite_teil_vor(df_konto, inkrementell))
             else:
-                parsed = datetime.strptime(rv.replace("/", "."), "%d.%m.%Y")
-            cell.value = parsed.date()
-            cell.number_format = "DD.MM.YYYY"
-            return parsed.strftime("%d.%m.%Y")
-        except Exception:
-            cell.value = None
-            cell.number_format = "DD.MM.YYYY"
-            return ""
-
-    def _parse_amount_cell(val) -> float:
-        if val is None:
-            return 0.0
-        if isinstance(val, (int, float)):
-            return float(val)
-        s = str(val).replace(".", "").replace(",", ".")
+                offen.append([pool.submit(_bereite_teil_vor, teil, inkrementell)
+                              for teil in _zeilen_teile(df_konto, teile_je_block)])
+                while len(offen) > VORLAUF_BLOECKE:
+                    uebernehme(*_sammle_teile(offen.popleft()))
+            del df_konto
+        while offen:
+            _pruefe_abbruch(abbruch)
+            uebernehme(*_sammle_teile(offen.popleft()))
+    finally:
+        for futures in offen:
+            for f in futures:
+                f.cancel()
+    df = pd.concat(teile) if len(teile) > 1 else teile[0]
+    return df, sonstige_buchungen, gelesen
+
+
+def _lies_kontoauszug_gecacht(konto_cache, konto_pfad, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen,
+                              abbruch=None, fortschritt=OHNE_FORTSCHRITT, **optionen):
+    # wie _lies_kontoauszug, mit konto_cache (KontoCache) als Ablage der Aufbereitung: gespeichert wird der
+    # vollständige Auszug (mit Journal-Schlüsseln); Journal-Filter und Dedup-Schlüssel werden je Lauf angewandt
+    if konto_cache is None:
+        return _lies_kontoauszug(konto_pfad, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen, abbruch,
+                                 fortschritt=fortschritt, **optionen)
+    schluessel = _konto_cache_schluessel(konto_cache, konto_pfad, konto_engine)
+    eintrag = konto_cache.hole(schluessel)
+    if eintrag is None:
+        eintrag = _lies_kontoauszug(konto_pfad, konto_engine, chunk_zeilen, True, set(), abbruch,
+                                    fortschritt=fortschritt, **optionen)
+        konto_cache.lege_ab(schluessel, *eintrag)
+    else:
+        fortschritt.zeilen_gelesen(eintrag[2])
+    return _wende_journal_an(eintrag, inkrementell, bekannte_buchungen)
+
+
+def _konto_cache_schluessel(konto_cache, konto_pfad, konto_engine):
+    return konto_cache.schluessel(konto_pfad, engine=waehle_engine(konto_engine, konto_pfad))
+
+
+def _wende_journal_an(eintrag, inkrementell, bekannte_buchungen):
+    # Cache-Eintrag (vollständiger Auszug mit Journal-Schlüsseln) auf diesen Lauf zuschneiden
+    relevant, sonstige_buchungen, gelesen = eintrag
+    if not inkrementell:
+        return relevant, [], gelesen
+    if bekannte_buchungen:
+        relevant = relevant[~relevant["__schluessel"].isin(bekannte_buchungen)].copy()
+        sonstige_buchungen = [s for s in sonstige_buchungen if s not in bekannte_buchungen]
+        # Nummerierung gleicher Buchungen wie beim Lesen ohne die bekannten Zeilen
+        relevant["__dedup"] = _dedup_schluessel(relevant, {})
+    return relevant, sonstige_buchungen, gelesen
+
+
+def _dedup_schluessel(df, vorkommen):
+    # Formatunabhängiger Schlüssel (Datum, Betrag, Zahlender, Verwendungszweck) je Buchung, durchnummeriert
+    # je Auszug: gleiche Buchungen innerhalb eines Auszugs bleiben getrennt, dieselbe Buchung in
+    # mehreren (überlappenden) Auszügen fällt zusammen.
+    if df.empty:
+        return pd.Series(dtype=object, index=df.index)
+    betrag = df[KONTO_BETRAG].round(2).astype(str)
+    basis = df["__datum_text"].astype(str) + "|" + betrag + "|" + df["__norm_payee"] + "|" + df["__norm_vwz"]
+    nr = basis.groupby(basis, sort=False).cumcount() + 1 + basis.map(lambda x: vorkommen.get(x, 0))
+    for wert, anzahl in basis.value_counts(sort=False).items():
+        vorkommen[wert] = vorkommen.get(wert, 0) + int(anzahl)
+    return basis + "#" + nr.astype(str)
+
+
+def _lies_kontoauszuege_parallel(konto_pfade, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen,
+                                 max_prozesse=None, abbruch=None, konto_cache=None, fortschritt=OHNE_FORTSCHRITT):
+    # Jeder Auszug wird in einem eigenen Prozess gelesen, klassifiziert und gefiltert;
+    # Ergebnisse kommen in der Reihenfolge der Dateien zurück.
+    anzahl = max(1, min(len(konto_pfade), max_prozesse or os.cpu_count() or 1))
+    if anzahl == 1:
+        return [
+            _lies_kontoauszug_gecacht(konto_cache, p, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen,
+                                      abbruch, fortschritt=fortschritt)
+            for p in konto_pfade
+        ]
+    with ProcessPoolExecutor(max_workers=anzahl) as pool:
+        # Cache-Zugriffe im aufrufenden Prozess: Treffer brauchen keinen Worker, und die Zähler des Caches
+        # (Treffer/Fehlschläge) landen hier statt in einer Kopie im Worker
+        auftraege = []  # (Cache-Schlüssel oder None, Treffer oder None, Future oder None)
+        for p in konto_pfade:
+            if konto_cache is None:
+                auftraege.append((None, None, pool.submit(
+                    _lies_kontoauszug, p, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen)))
+                continue
+            schluessel = _konto_cache_schluessel(konto_cache, p, konto_engine)
+            eintrag = konto_cache.hole(schluessel)
+            future = None if eintrag is not None else pool.submit(
+                _lies_kontoauszug, p, konto_engine, chunk_zeilen, True, set())
+            auftraege.append((schluessel, eintrag, future))
+        futures = [future for _, _, future in auftraege if future is not None]
+        ergebnisse = []
+        for schluessel, eintrag, future in auftraege:
+            if abbruch is not None and abbruch.is_set():
+                for f in futures:
+                    f.cancel()
+                _pruefe_abbruch(abbruch)
+            if future is not None:
+                eintrag = future.result()
+                if schluessel is not None:
+                    konto_cache.lege_ab(schluessel, *eintrag)
+            if schluessel is not None:
+                eintrag = _wende_journal_an(eintrag, inkrementell, bekannte_buchungen)
+            ergebnisse.append(eintrag)
+            fortschritt.zeilen_gelesen(eintrag[2])
+    return ergebnisse
+
+
+def _speichere_schnell(excel_pfad, result_path, workbook, worksheet, plan, vorhandene_blaetter, inkrementell,
+                       suchtreffer_pfad, unscharf, messung) -> bool:
+    # neu geschriebene Blätter (False) bzw. nur fortgeschriebene (True, inkrementell und schon vorhanden)
+    blaetter = {}
+    for titel, geschrieben in ((SUCHTREFFER_BLATT, not suchtreffer_pfad), (JOURNAL_BLATT, inkrementell),
+                               (UNSCHARF_BLATT, unscharf)):
+        if geschrieben and titel in workbook.sheetnames:
+            blaetter[titel] = inkrementell and titel in vorhandene_blaetter
+    try:
+        speichere_gepatcht(excel_pfad, result_path, workbook, worksheet, plan.geschrieben,
+                           plan.kommentare_geaendert, blaetter)
+    except (PatchNichtMoeglich, zipfile.BadZipFile, KeyError, ValueError):
+        messung.zaehle("speichern_fallback")
+        return False
+    messung.zaehle("speichern_gepatcht")
+    return True
+
+
+def fuehre_mietabgleich_durch(excel_pfad, konto_pfad, ergebnis_pfad=None, konto_engine="auto", chunk_zeilen=STANDARD_CHUNK_ZEILEN,
+                              abbruch=None, cache=None, inkrementell=False, max_prozesse=None, suchtreffer_pfad=None,
+                              messung=None, parallel=False, unscharf=False, unscharf_schwelle=UNSCHARF_SCHWELLE,
+                              historie=None, konto_cache=None, schnell_speichern=False, fortschritt=None,
+                              historie_mappe=None):
+    # konto_pfad: ein Kontoauszug oder eine Liste von Kontoauszügen (werden gemeinsam in einem
+    # Lade-/Speicherzyklus der Mieter-Arbeitsmappe verarbeitet)
+    # parallel: Aufbereitung großer Auszüge zeilenweise auf max_prozesse Prozesse verteilen
+    # (Ergebnis identisch zum seriellen Lauf; Zuordnung und Schreiben bleiben im aufrufenden Prozess)
+    # unscharf: Zahlende ohne exakten Treffer über Namensähnlichkeit (≥ unscharf_schwelle) zuordnen,
+    # Bericht im Blatt "unscharfe_treffer"
+    # historie: historie.Historie – relevante Buchungen und Zuordnungen des Laufs zusätzlich in SQLite speichern;
+    # historie_mappe: Schlüssel der Mieterliste im Verlauf (Standard: _mieterlisten_schluessel)
+    # konto_cache: konto_cache.KontoCache – aufbereitete Kontoauszüge wiederverwenden (auch mit anderer Mieterliste)
+    # suchtreffer_pfad: Trefferliste nicht als Blatt, sondern als eigene Datei schreiben
+    # schnell_speichern: Ergebnis als Kopie der Original-XLSX, in der nur geänderte Teile neu geschrieben werden
+    # (xlsx_patch; bei nicht unterstützter Struktur wie bisher workbook.save)
+    # messung: messung.Messung – erfasst Dauer je Phase und Zeilenzahlen (ohne: keine Messung)
+    # fortschritt: messung.Fortschritt – meldet Phase, gelesene Zeilen und zugeordnete Mieter während des Laufs
+    ablauf = _mietabgleich(
+        excel_pfad, konto_pfad, ergebnis_pfad, konto_engine, chunk_zeilen, abbruch, cache, inkrementell, max_prozesse,
+        suchtreffer_pfad, messung, parallel, unscharf, unscharf_schwelle, historie, konto_cache, schnell_speichern,
+        fortschritt, historie_mappe=historie_mappe,
+    )
+    # ohne nur_entscheidungen liefert der Ablauf keine Zwischenergebnisse, nur den Rückgabewert
+    try:
+        while True:
+            next(ablauf)
+    except StopIteration as ende:
+        return ende.value
+
+
+def mietabgleich_entscheidungen(excel_pfad, konto_pfad, konto_engine="auto", chunk_zeilen=STANDARD_CHUNK_ZEILEN,
+                                abbruch=None, inkrementell=False, max_prozesse=None, messung=None, parallel=False,
+                                unscharf=False, unscharf_schwelle=UNSCHARF_SCHWELLE, konto_cache=None, fortschritt=None):
+    # Probelauf ohne Arbeitsmappe: liefert je zugeordneter Buchung eine Entscheidung (dict, JSON-fähig), sobald
+    # sie feststeht – Mieterzeile, Monat, Zielzelle, Betrag, Datum, Suchwort, Art (exakt/behoerde/unscharf) und
+    # Status (gebucht/duplikat). Suchtreffer, Zellen, Journal und Historie werden nicht geschrieben, nichts
+    # gespeichert. Parameter wie fuehre_mietabgleich_durch; inkrementell: im Journal der Mieterliste schon
+    # verbuchte Buchungen überspringen.
+    # Nicht lesbare Mieterliste/Kontoauszüge → keine Entscheidungen.
+    yield from _mietabgleich(
+        excel_pfad, konto_pfad, None, konto_engine, chunk_zeilen, abbruch, None, inkrementell, max_prozesse,
+        None, messung, parallel, unscharf, unscharf_schwelle, None, konto_cache, False, fortschritt,
+        nur_entscheidungen=True,
+    )
+
+
+def _entscheidung(t, excel_row, mieter, monat, zelle, suchwort, art, gebucht) -> dict:
+    datum = t[KONTO_DATUM]
+    return {
+        "mieterzeile": int(excel_row),
+        "mieter": str(mieter),
+        "monat": monat,
+        "zelle": zelle,
+        "betrag": round(float(t[KONTO_BETRAG]), 2),
+        "datum": None if pd.isna(datum) else datum.date().isoformat(),
+        "zahlender": str(t[KONTO_PAYEE]),
+        "suchwort": str(suchwort),
+        "art": art,
+        "status": "gebucht" if gebucht else "duplikat",
+        "buchung": str(t["__dedup"]),
+    }
+
+
+def _mieterlisten_schluessel(mieter_norm) -> str:
+    # Fingerabdruck der Mieterliste aus den normalisierten Namen (Spalte A): bleibt bei monatlichen Läufen
+    # derselben Liste gleich (der Dateipfad nicht – Uploads werden je Anfrage neu benannt, und die
+    # Ergebniszellen ändern den Inhalt), unterscheidet Listen verschiedener Eigentümer
+    h = hashlib.sha256("\n".join(sorted(set(mieter_norm))).encode())
+    return f"mieter:{h.hexdigest()[:16]}"
+
+
+def _mietabgleich(excel_pfad, konto_pfad, ergebnis_pfad, konto_engine, chunk_zeilen, abbruch, cache, inkrementell,
+                  max_prozesse, suchtreffer_pfad, messung, parallel, unscharf, unscharf_schwelle, historie, konto_cache,
+                  schnell_speichern, fortschritt=None, nur_entscheidungen=False, historie_mappe=None):
+    # Ablauf von fuehre_mietabgleich_durch als Generator; mit nur_entscheidungen werden die Zuordnungen
+    # geliefert und alle Schreibschritte übersprungen
+    messung = OHNE_MESSUNG if messung is None else messung
+    fortschritt = OHNE_FORTSCHRITT if fortschritt is None else fortschritt
+    # Phasenwechsel zusätzlich als Fortschritt melden
+    messung = mit_fortschritt(messung, fortschritt)
+    result_path = ergebnis_pfad or os.path.join("results", "mieten_abgleich.xlsx")
+
+    # Gleiches Dateipaar schon einmal abgeglichen (ErgebnisCache)? → Ergebnis sofort zurückgeben
+    # (nicht mit separater Trefferliste – der Cache hält nur die Ergebnisdatei; nicht mit Verlauf – ein
+    # Treffer liefert keine Buchungen und Zuordnungen, der Lauf fehlte sonst in der Historie)
+    if cache is not None and (suchtreffer_pfad or historie is not None):
+        cache = None
+    if cache is not None:
+        messung.phase("cache")
+        konto_liste = list(konto_pfad) if isinstance(konto_pfad, (list, tuple)) else [konto_pfad]
+        optionen = {"unscharf": unscharf_schwelle} if unscharf else {}
+        cache_schluessel = cache.schluessel(excel_pfad, *konto_liste, inkrementell=inkrementell, **optionen)
+        if cache.hole(cache_schluessel, result_path):
+            messung.zaehle("cache_treffer")
+            messung.ende()
+            return result_path
+        messung.zaehle("cache_fehlschlaege")
+
+    # Excel (Mieterliste) einlesen
+    messung.phase("mieterliste")
+    workbook = load_workbook(excel_pfad)
+    if BLATTNAME in workbook.sheetnames:
         try:
-            return float(s)
+            worksheet = workbook[BLATTNAME]
         except Exception:
-            return 0.0
+            return None
+    else:
+        # Fallback: erstes Blatt
+        first_sheet = workbook.sheetnames[0]
+        worksheet = workbook[first_sheet]
+    vorhandene_blaetter = set(workbook.sheetnames)
 
-    def _norm_ddmmyyyy(s: str) -> str:
-        s = (s or "").strip()
-        m = re.match(r"^(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?$", s)
-        if not m:
-            return s
-        d = int(m.group(1)); mth = int(m.group(2)); yr = m.group(3)
-        if yr is None:
-            return f"{d:02d}.{mth:02d}"
-        return f"{d:02d}.{mth:02d}.{int(yr):04d}"
-
-    def _parse_pairs(txt: str):
-        pairs = []
-        seen = set()
-        if not txt:
-            return pairs
-        for line in txt.splitlines():
-            m = re.search(r"(\d{1,2}\.\d{1,2}(?:\.\d{2,4})?)\s*(?:\[(.*?)\])?\s*:\s*([+-]?\d+(?:[.,]\d+)?)", line)
-            if not m:
-                continue
-            d = _norm_ddmmyyyy(m.group(1))
-            try:
-                amt = round(float(m.group(3).replace(".", "").replace(",", ".")), 2)
-            except Exception:
-                continue
-            key = (d, amt)
-            if key in seen:
-                continue
-            seen.add(key)
-            pairs.append((d, amt, m.group(1), (m.group(2) or "").strip()))
-        return pairs
+    _pruefe_abbruch(abbruch)
 
-    # Normname in Trefferliste
-    df_such["__norm_payee"] = df_such[KONTO_PAYEE].astype(str).apply(_normalize_text)
+    # Mieterliste (Spalten A–C) und Namens-Index in einem Durchlauf aus dem bereits geladenen Blatt
+    df_mieter, mieter_row_map = _lade_mieterliste(worksheet)
+    mieter_col_name = df_mieter.columns[0]  # Spalte A: Eigentümer/Mieter
+    mieter_b_col_name = df_mieter.columns[1] if len(df_mieter.columns) > 1 else None  # Spalte B: Mieter
+    objekt_col_name = df_mieter.columns[2] if len(df_mieter.columns) > 2 else None     # Spalte C: Objekt
 
+    # Kontoauszüge einlesen und aufbereiten; mehrere Dateien parallel in eigenen Prozessen
+    messung.phase("kontoauszug")
+    konto_pfade = list(konto_pfad) if isinstance(konto_pfad, (list, tuple)) else [konto_pfad]
+    # Inkrementell: bereits im Journal verbuchte Buchungen (Datum, Betrag, Zahlender) nicht erneut zuordnen
+    bekannte_buchungen = lade_journal(workbook) if inkrementell else set()
+    prozesse = max(1, max_prozesse or os.cpu_count() or 1) if parallel else 1
+    pool = ProcessPoolExecutor(max_workers=prozesse) if prozesse > 1 else None
+    try:
+        if pool is not None:
+            # Dateien nacheinander lesen, Zeilenbereiche jedes Blocks im Pool aufbereiten
+            ergebnisse = [
+                _lies_kontoauszug_gecacht(konto_cache, p, konto_engine, chunk_zeilen, inkrementell,
+                                          bekannte_buchungen, abbruch, fortschritt, pool=pool, teile_je_block=prozesse)
+                for p in konto_pfade
+            ]
+        elif len(konto_pfade) == 1:
+            ergebnisse = [_lies_kontoauszug_gecacht(
+                konto_cache, konto_pfade[0], konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen, abbruch,
+                fortschritt,
+            )]
+        else:
+            ergebnisse = _lies_kontoauszuege_parallel(
+                konto_pfade, konto_engine, chunk_zeilen, inkrementell, bekannte_buchungen, max_prozesse, abbruch,
+                konto_cache, fortschritt,
+            )
+    except KontoauszugNichtLesbar:
+        return None
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    teile = [relevant for relevant, _, _ in ergebnisse]
+    sonstige_buchungen = [schluessel for _, sonstige, _ in ergebnisse for schluessel in sonstige]
+    messung.zaehle("buchungen_gelesen", sum(gelesen for _, _, gelesen in ergebnisse))
+
+    _pruefe_abbruch(abbruch)
+
+    df_such = pd.concat(teile, ignore_index=True) if len(teile) > 1 else teile[0]
+    if len(teile) > 1:
+        # Mehrere Auszüge: dieselbe Buchung aus überlappenden Exporten nur einmal verarbeiten
+        doppelt = df_such["__dedup"].duplicated()
+        if inkrementell:
+            sonstige_buchungen.extend(df_such.loc[doppelt, "__schluessel"])
+        df_such = df_such[~doppelt]
+    try:
+        df_such = df_such.sort_values([KONTO_PAYEE, KONTO_DATUM, KONTO_BETRAG], kind="mergesort")
+    except Exception:
+        pass
+
+    messung.zaehle("buchungen_relevant", len(df_such))
+    fortschritt.melde(buchungen_relevant=len(df_such))
+
+    # Blatt mit Suchtreffern: A Datum, B Name, C Suchwort, D Betrag, E Zielmonat
+    # (inkrementell: vorhandenes Blatt behalten und nur neue Treffer anhängen;
+    # mit suchtreffer_pfad stattdessen als eigene, gestreamte Arbeitsmappe)
+    if not nur_entscheidungen:
+        messung.phase("suchtreffer")
+        if suchtreffer_pfad:
+            schreibe_suchtreffer_datei(suchtreffer_pfad, df_such)
+        else:
+            schreibe_suchtreffer(suchtreffer_blatt(workbook, anhaengen=inkrementell), df_such)
+
+    # Eintragen aus Blatt "suchtreffer" in Monats-Spalten (E–AB) je Mieter (Spalte A)
+    messung.phase("zuordnung")
+    months_order = list(MONATS_ZUORDNUNG.keys())
+    # alle Buchungen erst im Speicher je Zielzelle sammeln, danach jede Zelle einmal schreiben
+    plan = ZellPlan(worksheet, [sp for paar in MONATS_ZUORDNUNG.values() for sp in paar])
+
+    # Mieter vorbereiten: Zielzeile, normalisierter Name (Spalte A) und ggf. Mietername (Spalte B)
+    # Behördenfall: Wenn Spalte A "jobcenter"/"agentur"/"stadt wuppertal" enthält,
+    # suche in suchtreffer den Namen aus Spalte B (Mieter) als Substring im Suchwort/Verwendungszweck.
+    GOV_KEYS = ("jobcenter", "agentur", "stadt wuppertal")
+    mieter_jobs = []
+    mieter_namen = {}  # normalisierter Name → Spalte A (für den Bericht der unscharfen Treffer)
     for _, row in df_mieter.iterrows():
         m_name = row[mieter_col_name]
         if not m_name:
             continue
-        excel_row = mieter_row_map.get(_normalize_text(m_name))
+        owner_norm = normalisiere(m_name)
+        excel_row = mieter_row_map.get(owner_norm)
         if not excel_row:
             continue
-
-        # Behördenfall: Wenn Spalte A "jobcenter"/"agentur"/"stadt wuppertal" enthält,
-        # suche in suchtreffer den Namen aus Spalte B (Mieter) als Substring in Name (Spalte B).
-        owner_norm = _normalize_text(m_name)
-        tenant_norm = _normalize_text(row[mieter_b_col_name]) if mieter_b_col_name else ""
-        GOV_KEYS = ("jobcenter", "agentur", "stadt wuppertal")
-        if any(k in owner_norm for k in GOV_KEYS) and tenant_norm:
-            # Suche den Mieternamen (Spalte B aus "mieter") im Suchwort/Verwendungszweck (Spalte C in "suchtreffer")
-            treffer = df_such[df_such.get("__norm_hit", df_such["__norm_payee"]).str.contains(tenant_norm, na=False)]
+        tenant_norm = normalisiere(row[mieter_b_col_name]) if mieter_b_col_name else ""
+        is_gov = any(k in owner_norm for k in GOV_KEYS) and bool(tenant_norm)
+        mieter_jobs.append((excel_row, owner_norm, tenant_norm, is_gov))
+        mieter_namen.setdefault(owner_norm, m_name)
+    messung.zaehle("mieter", len(mieter_jobs))
+    fortschritt.melde(gesamt=len(mieter_jobs))
+
+    # Indizes einmalig aufbauen: Hash-Map für exakte Zahlender-Treffer,
+    # Aho-Corasick über alle Mieternamen im Behördenfall
+    payee_index = baue_payee_index(df_such["__norm_payee"])
+    gov_index = baue_teilstring_index(
+        df_such["__norm_hit"],
+        [tenant_norm for (_, _, tenant_norm, is_gov) in mieter_jobs if is_gov],
+    )
+    leer = np.empty(0, dtype=np.intp)
+
+    # Unscharf: Zahlende ohne exakten Mieter über den Trigramm-Index zuordnen (nur eindeutige Treffer)
+    unscharf_je_mieter = {}  # normalisierter Mietername → Positionen zusätzlicher Buchungen
+    if unscharf:
+        personen = list(dict.fromkeys(owner_norm for (_, owner_norm, _, is_gov) in mieter_jobs if not is_gov))
+        exakt = set(personen)
+        unscharf_treffer = ordne_unscharf_zu(
+            [p for p in payee_index if p not in exakt], personen, unscharf_schwelle
+        )
+        bericht = []
+        for zahlender, (owner_norm, wert, eindeutig) in unscharf_treffer.items():
+            positionen = payee_index[zahlender]
+            if eindeutig:
+                unscharf_je_mieter.setdefault(owner_norm, []).append(positionen)
+                messung.zaehle("buchungen_unscharf", len(positionen))
+            bericht.append((
+                str(df_such[KONTO_PAYEE].iloc[positionen[0]]), mieter_namen[owner_norm], mieter_row_map[owner_norm],
+                round(wert, 3), len(positionen), "zugeordnet" if eindeutig else "mehrdeutig, nicht zugeordnet",
+            ))
+        if not nur_entscheidungen:
+            schreibe_unscharf_bericht(workbook, sorted(bericht, key=lambda z: (z[2], z[0])), anhaengen=inkrementell)
+
+    journal = {}  # Index in df_such -> [(Mieterzeile, Datum, Betrag)]
+    zuordnungen = []  # für die Historie: (Dedup-Schlüssel, Mieterzeile, Mieter, normalisierter Mieter, Art)
+    zugeordnet = 0
+    mieter_mit_zahlung = set()  # Mieterzeilen mit mindestens einer gebuchten Zahlung (Fortschritt)
+
+    for nr, (excel_row, owner_norm, tenant_norm, is_gov) in enumerate(mieter_jobs):
+        _pruefe_abbruch(abbruch)
+        fortschritt.melde(verarbeitet=nr, buchungen_zugeordnet=zugeordnet, mieter_zugeordnet=len(mieter_mit_zahlung))
+        if is_gov:
+            treffer = df_such.iloc[gov_index.get(tenant_norm, leer)]
         else:
-            treffer = df_such[df_such["__norm_payee"] == owner_norm]
+            positionen = payee_index.get(owner_norm, leer)
+            if owner_norm in unscharf_je_mieter:
+                positionen = np.sort(np.concatenate([positionen, *unscharf_je_mieter[owner_norm]]))
+            treffer = df_such.iloc[positionen]
         if treffer.empty:
             continue
 
         for _, t in treffer.iterrows():
-            dval = t[KONTO_DATUM]
-            raw_date = t.get("__raw_date", "")
-            kw = t["__hit"] if t["__hit"] else t["__klass"]
             betrag = t[KONTO_BETRAG]
-            if pd.isna(betrag):
-                continue
-
-            # Monat robust bestimmen (Timestamp | ISO `YYYY-MM-DD...` | `DD.MM.YYYY`)
-            month_idx = None
-            # 0) Vorrang: Monatsangabe aus Verwendungszweck/Kategorie
-            override = t.get("__month_override", None)
-            if isinstance(override, str) and override in months_order:
-                month_idx = months_order.index(override) + 0  # already 0-based via index
-            if pd.notna(dval):
-                try:
-                    month_idx = int(getattr(dval, "month"))
-                except Exception:
-                    month_idx = None
-            if month_idx is None:
-                rv = str(raw_date or "").strip()
-                # ISO-ähnlich: 2025-06-02... → 06
-                m_iso = re.search(r"(\d{4})[-/\.](\d{2})[-/\.](\d{2})", rv)
-                if m_iso:
-                    try:
-                        month_idx = int(m_iso.group(2))
-                    except Exception:
-                        month_idx = None
-                if month_idx is None:
-                    try:
-                        month_idx = datetime.strptime(rv, "%d.%m.%Y").month
-                    except Exception:
-                        month_idx = None
-            if month_idx is None:
+            monat = t["__monat"]
+            if pd.isna(betrag) or pd.isna(monat):
                 continue
-            month_idx = month_idx - 1
+            month_idx = int(monat) - 1
             if month_idx < 0 or month_idx > 11:
                 continue
             ziel = months_order[month_idx]
@@ -485,77 +655,60 @@ def fuehre_mietabgleich_durch(excel_pfad, konto_xlsx_pfad):
             betrag_cell = f"{betrag_sp}{excel_row}"
             datum_cell = f"{datum_sp}{excel_row}"
 
-            date_cell = _get_writable_cell(worksheet, datum_cell)
-            prev_cell_val = date_cell.value
-            existing_amount = _parse_amount_cell(worksheet[betrag_cell].value)
-            existing_pairs = _parse_pairs(date_cell.comment.text if date_cell.comment else "")
-            existing_keys = {(d, a) for (d, a, _, __) in existing_pairs}
-
-            # neuer Schlüssel (Datum+Betrag) – Datum robust formatiert
-            if pd.notna(dval):
-                try:
-                    new_date_str = dval.strftime("%d.%m.%Y")
-                except Exception:
-                    new_date_str = ""
-            else:
-                rv = str(raw_date or "").strip()
-                m_iso = re.search(r"(\d{4})[-/\.](\d{2})[-/\.](\d{2})", rv)
-                if m_iso:
-                    try:
-                        new_date_str = datetime(int(m_iso.group(1)), int(m_iso.group(2)), int(m_iso.group(3))).strftime("%d.%m.%Y")
-                    except Exception:
-                        new_date_str = rv
-                else:
-                    try:
-                        new_date_str = datetime.strptime(rv, "%d.%m.%Y").strftime("%d.%m.%Y")
-                    except Exception:
-                        new_date_str = rv
-            new_key = (_norm_ddmmyyyy(new_date_str), round(float(betrag), 2))
-            # 1) Duplikat prüfen gegen vorhandene Kommentar-Paare
-            if new_key in existing_keys:
-                continue
-            # 2) Duplikat prüfen gegen erste Einzelbuchung ohne Kommentar
-            if (existing_amount > 0.0) and not existing_pairs:
-                prev_str = prev_cell_val.strftime("%d.%m.%Y") if hasattr(prev_cell_val, "strftime") else (str(prev_cell_val) if prev_cell_val else "")
-                prev_key = (_norm_ddmmyyyy(prev_str), round(existing_amount, 2))
-                if prev_key == new_key:
-                    continue
-
-            # Betrag addieren und Datum setzen
-            worksheet[betrag_cell] = existing_amount + float(betrag)
-            try:
-                worksheet[betrag_cell].number_format = "#,##0.00"
-            except Exception:
-                pass
-            written_date_str = _write_date(date_cell, dval, raw_date)
-
-            # Kommentar nur bei „zweitem+“ Eintrag im selben Monat
-            has_previous_in_month = (existing_amount > 0.0) or (len(existing_pairs) > 0)
-            if has_previous_in_month:
-                # Kommentar pflegen: „DD.MM.YYYY [Suchwort]: 123,45 EUR“
-                lines = []
-                if existing_pairs:
-                    for (_, amt, disp, kword) in existing_pairs:
-                        tag = f"{disp}"
-                        if kword:
-                            tag += f" [{kword}]"
-                        lines.append(f"{tag}: {str(f'{amt:.2f}').replace('.', ',')} EUR")
+            # neuer Schlüssel (Datum+Betrag)
+            new_key = (norm_ddmmyyyy(t["__datum_text"]), round(float(betrag), 2))
+            if inkrementell:
+                journal.setdefault(t.name, []).append((excel_row, new_key[0], new_key[1]))
+            # Summe, Duplikatprüfung und Kommentar werden im Schreibplan verrechnet
+            kw = t["__hit"] if t["__hit"] else t["__klass"]
+            gebucht = plan.buche(betrag_cell, datum_cell, new_key, betrag, t[KONTO_DATUM], kw)
+            if gebucht:
+                zugeordnet += 1
+                mieter_mit_zahlung.add(excel_row)
+            if nur_entscheidungen or (gebucht and historie is not None):
+                art = "behoerde" if is_gov else ("exakt" if t["__norm_payee"] == owner_norm else "unscharf")
+                if nur_entscheidungen:
+                    yield _entscheidung(t, excel_row, mieter_namen[owner_norm], ziel, betrag_cell, kw, art, gebucht)
                 else:
-                    # Es gab bereits einen Betrag, aber noch keinen Kommentar → mit bisherigem Datum/Betrag seeden
-                    prev_str = prev_cell_val.strftime("%d.%m.%Y") if hasattr(prev_cell_val, "strftime") else (str(prev_cell_val) if prev_cell_val else "")
-                    if prev_str:
-                        lines.append(f"{prev_str}: {str(f'{existing_amount:.2f}').replace('.', ',')} EUR")
-                tag_new = written_date_str
-                if kw:
-                    tag_new += f" [{kw}]"
-                lines.append(f"{tag_new}: {str(f'{float(betrag):.2f}').replace('.', ',')} EUR")
-                date_cell.comment = Comment("\n".join(lines), "System")
-            else:
-                # Beim ersten Eintrag keinen Kommentar hinterlegen
-                date_cell.comment = None
+                    zuordnungen.append((t["__dedup"], excel_row, mieter_namen[owner_norm], owner_norm, art))
+    messung.zaehle("buchungen_zugeordnet", zugeordnet)
+    fortschritt.melde(verarbeitet=len(mieter_jobs), buchungen_zugeordnet=zugeordnet,
+                      mieter_zugeordnet=len(mieter_mit_zahlung))
+    if nur_entscheidungen:
+        messung.ende()
+        return None
+
+    messung.phase("zellen_schreiben")
+    messung.zaehle("zellen", plan.schreibe())
+
+    # Journal fortschreiben: jede neue relevante Buchung, auch ohne zugeordneten Mieter
+    if inkrementell:
+        messung.phase("journal")
+        eintraege = []
+        for idx, r in df_such.iterrows():
+            zahlender = str(r[KONTO_PAYEE])
+            betrag = None if pd.isna(r[KONTO_BETRAG]) else round(float(r[KONTO_BETRAG]), 2)
+            datum = r["__datum_text"]
+            for excel_row, datum, amt in journal.get(idx, [(None, datum, betrag)]):
+                eintraege.append((journal_schluessel(r["__schluessel"], excel_row), excel_row, datum, amt, zahlender))
+        eintraege.extend((schluessel, None, None, None, None) for schluessel in sonstige_buchungen)
+        schreibe_journal(workbook, eintraege)
+
+    _pruefe_abbruch(abbruch)
+
+    if historie is not None:
+        messung.phase("historie")
+        historie.speichere_lauf(excel_pfad, konto_pfade, df_such, zuordnungen,
+                                historie_mappe or _mieterlisten_schluessel(mieter_namen))
 
     # Speichern in results/ Ordner
-    result_path = os.path.join("results", "mieten_abgleich.xlsx")
-    workbook.save(result_path)
+    messung.phase("speichern")
+    if not (schnell_speichern and _speichere_schnell(
+            excel_pfad, result_path, workbook, worksheet, plan, vorhandene_blaetter, inkrementell,
+            suchtreffer_pfad, unscharf, messung)):
+        workbook.save(result_path)
+    if cache is not None:
+        cache.lege_ab(cache_schluessel, result_path)
+    messung.ende()
 
     return result_path
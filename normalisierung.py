@@ -0,0 +1,34 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Eine Normalisierung für alle Namens-/Textvergleiche (Zahlender, Verwendungszweck, Mieter):
+# Kleinschreibung → Umlaute ausschreiben → alles außer a–z/0–9/Leerraum durch Leerzeichen ersetzen →
+# Leerraum zusammenfassen. Die Reihenfolge ist wichtig: Umlaute vor dem Zeichenfilter ersetzen,
+# sonst wird aus "Müller" "m ller".
+
+_UMLAUTE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_NICHT_ALNUM = re.compile(r"[^a-z0-9\s]")
+_LEERRAUM = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=200_000)
+def _normalisiere(t: str) -> str:
+    t = t.lower().translate(_UMLAUTE)
+    t = _NICHT_ALNUM.sub(" ", t)
+    return _LEERRAUM.sub(" ", t).strip()
+
+
+def normalisiere(val) -> str:
+    return _normalisiere(str(val) or "")
+
+
+def normalisiere_spalte(texte: pd.Series) -> pd.Series:
+    # Spaltenweise: jeder unterschiedliche Wert wird nur einmal normalisiert (Zahlende wiederholen
+    # sich in Bankdaten stark), Ergebnisse bleiben über Blöcke und Aufrufe hinweg im Cache.
+    # Fehlende Werte werden wie str(nan) behandelt.
+    codes, uniques = pd.factorize(texte, sort=False)
+    werte = np.array([normalisiere(u) for u in uniques] + [normalisiere(np.nan)], dtype=object)
+    return pd.Series(werte[codes], index=texte.index, dtype=object)
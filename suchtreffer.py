@@ -0,0 +1,76 @@
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell.cell import Cell, WriteOnlyCell
+
+from kontoauszug import KONTO_BETRAG, KONTO_DATUM, KONTO_PAYEE
+from zellplanung import BETRAG_FORMAT, DATUM_FORMAT
+
+# Blatt "suchtreffer": alle relevanten Buchungen (A Datum, B Name, C Suchwort, D Betrag, E Zielmonat).
+# Die Spalten werden aus dem aufbereiteten DataFrame in einem Schritt gebaut und als fertige Zellen
+# angehängt; Zahlenformate je Spalte über number_format (openpyxl registriert jedes Format nur einmal).
+
+SUCHTREFFER_BLATT = "suchtreffer"
+SUCHTREFFER_KOPF = ["Datum", "Name", "Suchwort", "Betrag", "Zielmonat"]
+# Spalte (1-basiert) → Zahlenformat
+SUCHTREFFER_FORMATE = {1: DATUM_FORMAT, 4: BETRAG_FORMAT}
+
+
+def _datum_spalte(df_such: pd.DataFrame) -> list:
+    # echtes Datum je Zeile (None, wenn kein Datum erkannt wurde)
+    datum = df_such[KONTO_DATUM]
+    return datum.dt.date.astype(object).where(datum.notna(), None).tolist()
+
+
+def suchtreffer_spalten(df_such: pd.DataFrame) -> list:
+    # Spaltenwerte in Blattreihenfolge
+    if "__month_override" in df_such.columns:
+        zielmonat = [m if m else "" for m in df_such["__month_override"].tolist()]
+    else:
+        zielmonat = [""] * len(df_such)
+    return [
+        _datum_spalte(df_such),
+        df_such[KONTO_PAYEE].tolist(),
+        [str(h) for h in df_such["__hit_final"].tolist()],
+        df_such[KONTO_BETRAG].tolist(),
+        zielmonat,
+    ]
+
+
+def suchtreffer_blatt(workbook, anhaengen=False):
+    # vorhandenes Blatt weiterverwenden (inkrementell) oder neu anlegen
+    if anhaengen and SUCHTREFFER_BLATT in workbook.sheetnames:
+        return workbook[SUCHTREFFER_BLATT]
+    if SUCHTREFFER_BLATT in workbook.sheetnames:
+        del workbook[SUCHTREFFER_BLATT]
+    ws = workbook.create_sheet(SUCHTREFFER_BLATT)
+    ws.append(SUCHTREFFER_KOPF)
+    return ws
+
+
+def _zeilen(ws, df_such, zelle):
+    for werte in zip(*suchtreffer_spalten(df_such)):
+        zeile = []
+        for spalte, wert in enumerate(werte, 1):
+            cell = zelle(ws, wert)
+            fmt = SUCHTREFFER_FORMATE.get(spalte)
+            if fmt is not None:
+                cell.number_format = fmt
+            zeile.append(cell)
+        yield zeile
+
+
+def schreibe_suchtreffer(ws, df_such: pd.DataFrame):
+    # Treffer an ein (normales) Arbeitsblatt anhängen
+    for zeile in _zeilen(ws, df_such, lambda ws, wert: Cell(ws, value=wert)):
+        ws.append(zeile)
+
+
+def schreibe_suchtreffer_datei(pfad, df_such: pd.DataFrame):
+    # Trefferliste als eigene Arbeitsmappe im Streaming-Modus (write_only) schreiben
+    workbook = Workbook(write_only=True)
+    ws = workbook.create_sheet(SUCHTREFFER_BLATT)
+    ws.append(SUCHTREFFER_KOPF)
+    for zeile in _zeilen(ws, df_such, WriteOnlyCell):
+        ws.append(zeile)
+    workbook.save(pfad)
+    return pfad
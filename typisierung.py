@@ -0,0 +1,96 @@
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+# Typisierung der Kontoauszugsspalten – einmal je Block, danach wird nichts mehr nachgeparst:
+# - Betrag → float (EU-Formate wie "1.234,56 €", geschütztes Leerzeichen, 640,8)
+# - Datum  → eine datetime-Spalte, dazu Anzeige DD.MM.YYYY und Monatsnummer aus dem Datum
+
+DATUM_TEXT_FORMAT = "%d.%m.%Y"
+
+_GLATTE_ZAHL = r"[+-]?\d+(?:\.\d+)?"
+_NACHKOMMA = re.compile(r"(\d+)[,\.](\d{1,2})$")
+_ISO_DATUM = r"(\d{4})[-/\.](\d{2})[-/\.](\d{2})"
+
+
+def _betrag_einzeln(s: str):
+    # Sonderfälle, die der vektorisierte Weg nicht abdeckt (z. B. "1e3", "12.5-"); s ist bereits bereinigt
+    if not s:
+        return np.nan
+    # Wenn Komma vorhanden → als Dezimaltrenner behandeln, Punkte als Tausender entfernen
+    if "," in s:
+        try:
+            return float(s.replace(".", "").replace(",", "."))
+        except Exception:
+            pass
+    # Sonst direkten Float-Versuch (z. B. 640.80)
+    try:
+        return float(s)
+    except Exception:
+        # Letzter Fallback: Muster <ganzzahl><,|.><1-2 Dezimalstellen>
+        m = _NACHKOMMA.search(s)
+        if m:
+            return float(m.group(1) + "." + m.group(2))
+    return np.nan
+
+
+def parse_betrag(werte: pd.Series) -> pd.Series:
+    # Beträge als float64 (NaN, wenn nicht lesbar)
+    s = werte.astype(str).fillna("nan").str.strip()
+    s = s.str.replace("€", "", regex=False).str.replace("\xa0", "", regex=False).str.replace(" ", "", regex=False)
+    komma = s.str.contains(",", regex=False)
+    # Komma = Dezimaltrenner, Punkte davor = Tausender
+    kandidat = s.where(~komma, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    glatt = kandidat.str.fullmatch(_GLATTE_ZAHL)
+    betrag = pd.Series(np.nan, index=werte.index, dtype="float64")
+    if glatt.any():
+        betrag[glatt] = np.asarray(kandidat[glatt].tolist(), dtype=np.float64)
+    rest = ~glatt
+    if rest.any():
+        betrag[rest] = s[rest].map(_betrag_einzeln).astype("float64")
+    return betrag
+
+
+def _roh_datum(s: pd.Series) -> pd.Series:
+    # Rohwert als Text (Ausgangspunkt für ISO-Erkennung und Anzeige nicht lesbarer Daten)
+    if is_datetime64_any_dtype(s):
+        return s.dt.strftime(DATUM_TEXT_FORMAT)
+    if is_numeric_dtype(s):
+        # Excel-Seriennummer
+        return pd.to_datetime(s, unit="d", origin="1899-12-30", errors="coerce").dt.strftime(DATUM_TEXT_FORMAT)
+    return (
+        s.astype(str)
+         .str.strip()
+         .str.replace(r"\s+", "", regex=True)
+         .str.replace("/", ".", regex=False)
+    )
+
+
+def parse_datum(werte: pd.Series):
+    # Rückgabe: (datum, text, direkt, iso_monat)
+    # - datum: datetime64, NaT wenn nicht lesbar
+    # - text: DD.MM.YYYY bzw. Rohwert, wenn kein Datum erkannt wurde
+    # - direkt: Datum stand direkt in der Spalte (datetime, Excel-Zahl oder DD.MM.YYYY)
+    # - iso_monat: Monat aus einem ISO-ähnlichen Rohwert (auch wenn das Datum selbst ungültig ist)
+    roh = _roh_datum(werte)
+    if is_datetime64_any_dtype(werte):
+        datum = werte
+    elif is_numeric_dtype(werte):
+        datum = pd.to_datetime(werte, unit="d", origin="1899-12-30", errors="coerce")
+    else:
+        datum = pd.to_datetime(roh, format=DATUM_TEXT_FORMAT, errors="coerce")
+    direkt = datum.notna()
+
+    iso = roh.where(~direkt).str.extract(_ISO_DATUM).apply(pd.to_numeric, errors="coerce")
+    iso.columns = ["year", "month", "day"]
+    iso_monat = iso["month"]
+    if iso["year"].notna().any():
+        datum = datum.fillna(pd.to_datetime(iso, errors="coerce"))
+
+    text = datum.dt.strftime(DATUM_TEXT_FORMAT).astype(object)
+    fehlt = datum.isna()
+    if fehlt.any():
+        text[fehlt] = [str(v or "").strip() for v in roh[fehlt].tolist()]
+    return datum, text, direkt, iso_monat
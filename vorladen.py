@@ -0,0 +1,67 @@
+import gc
+import io
+import threading
+import time
+
+# Abgleich-Stack (pandas, numpy, openpyxl) erst bei Bedarf laden: Web-Apps importieren dieses Modul statt
+# mieten, damit Start, Neuladen im Debug-Modus und Seiten wie /login ohne pandas auskommen.
+# vorladen() lädt und wärmt den Stack vorab, bevor der Server Anfragen annimmt. app.py hält Aufträge
+# (JobQueue) im Speicher seines Prozesses, daher nur ein Worker-Prozess mit Threads:
+# VORLADEN=1 gunicorn --preload -w 1 --threads 8 app:app – mit mehreren Workern landen /jobs/<id>,
+# /events, /result und /cancel meist in einem anderen Prozess (404), /metrics zeigt nur einen Worker.
+# main.py startet seine Pool-Prozesse mit spawn und wärmt jeden einzeln auf (nichts wird geteilt).
+
+LADEZEITEN = {}  # Schritt → Sekunden (laden, aufwaermen)
+_lock = threading.Lock()
+_mieten = None
+
+
+def lade_abgleich(funktion="fuehre_mietabgleich_durch"):
+    # mieten beim ersten Aufruf importieren; Rückgabe: die Funktion (z. B. mietabgleich_entscheidungen)
+    global _mieten
+    if _mieten is None:
+        with _lock:
+            if _mieten is None:
+                start = time.perf_counter()
+                import mieten
+                LADEZEITEN["laden"] = time.perf_counter() - start
+                _mieten = mieten
+    return getattr(_mieten, funktion)
+
+
+def _aufwaermen():
+    # einmal durch Aufbereitung und Schreiben laufen: pandas/openpyxl laden viele Teilmodule erst beim
+    # ersten Gebrauch, normalisierung und klassifikation füllen ihre Caches
+    import pandas as pd
+    from openpyxl import Workbook
+    from openpyxl.comments import Comment
+
+    from kontoauszug import KONTO_SPALTEN
+    from mieten import _bereite_konto_vor, _dedup_schluessel, _relevante_buchungen
+
+    beispiel = pd.DataFrame(
+        [["01.02.2025", "Max Mustermann", "Miete Februar", "Mieteinnahmen", "WEG Musterstr. 1", "1.234,56"],
+         ["2025-03-01 00:00:00", "", "Abschlag", "", "", "-12,00"]],
+        columns=KONTO_SPALTEN,
+    )
+    relevant = _relevante_buchungen(_bereite_konto_vor(beispiel))
+    relevant["__dedup"] = _dedup_schluessel(relevant, {})
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"] = 1.5
+    ws["A1"].number_format = "#,##0.00"
+    ws["B1"].comment = Comment("01.02.2025 [miete]: 1,50 EUR", "System")
+    wb.save(io.BytesIO())
+
+
+def vorladen(gc_einfrieren=False) -> dict:
+    # gc_einfrieren: vorhandene Objekte aus der Garbage Collection nehmen, damit Worker nach fork die geteilten
+    # Speicherseiten nicht durch GC-Durchläufe kopieren
+    lade_abgleich()
+    start = time.perf_counter()
+    _aufwaermen()
+    LADEZEITEN["aufwaermen"] = time.perf_counter() - start
+    if gc_einfrieren:
+        gc.collect()
+        gc.freeze()
+    return dict(LADEZEITEN)
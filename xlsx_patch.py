@@ -0,0 +1,501 @@
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape, unescape
+
+from openpyxl.comments.comment_sheet import CommentRecord, CommentSheet
+from openpyxl.compat.strings import safe_string
+from openpyxl.styles.numbers import BUILTIN_FORMATS_REVERSE
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.datetime import to_excel
+from openpyxl.xml.functions import tostring
+
+# Schneller Speicherweg: statt die ganze Arbeitsmappe über openpyxl neu zu serialisieren, wird die
+# Original-XLSX als ZIP kopiert und nur neu erzeugt, was sich geändert hat – die geänderten Zellen im
+# Mieter-Blatt (Text-Patch der Blatt-XML), Kommentare/VML dieses Blatts, neu geschriebene bzw. ergänzte
+# Blätter (suchtreffer, _buchungen, unscharfe_treffer), styles.xml (neue Zahlenformate), workbook.xml und
+# die Beziehungs-/Inhaltstyp-Teile. Alle übrigen Teile werden inhaltlich unverändert übernommen, auch
+# solche, die openpyxl beim Laden verwirft.
+# Bei jeder Struktur, die hier nicht sicher behandelt wird, PatchNichtMoeglich → Aufrufer speichert normal.
+
+_NS_BEZIEHUNG = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_TYP_DOKUMENT = f"{_NS_BEZIEHUNG}/officeDocument"
+_TYP_BLATT = f"{_NS_BEZIEHUNG}/worksheet"
+_TYP_STILE = f"{_NS_BEZIEHUNG}/styles"
+_TYP_KOMMENTARE = f"{_NS_BEZIEHUNG}/comments"
+_TYP_VML = f"{_NS_BEZIEHUNG}/vmlDrawing"
+_TYP_CALCCHAIN = f"{_NS_BEZIEHUNG}/calcChain"
+
+_CT_MAPPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"
+_CT_BLATT = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+_CT_KOMMENTARE = "application/vnd.openxmlformats-officedocument.spreadsheetml.comments+xml"
+_CT_VML = "application/vnd.openxmlformats-officedocument.vmlDrawing"
+
+_KOPF = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_LEERE_BEZIEHUNGEN = (f'{_KOPF}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                      '</Relationships>')
+
+_ENTITAETEN = {"&quot;": '"', "&apos;": "'"}
+_ATTRIBUT = re.compile(r'([\w:.-]+)\s*=\s*"([^"]*)"')
+_BEZIEHUNG = re.compile(r"<Relationship\b[^>]*?(?:/>|>\s*</Relationship>)")
+_BLATT_EINTRAG = re.compile(r"<sheet\b[^>]*?/>")
+_SHEETDATA = re.compile(r"<sheetData\b[^>]*?(?:/>|>(.*?)</sheetData>)", re.S)
+_ZEILE = re.compile(r"<row\b[^>]*/>|<row\b[^>]*>.*?</row>", re.S)
+_ZELLE = re.compile(r"<c\b[^>]*/>|<c\b[^>]*>.*?</c>", re.S)
+_REF = re.compile(r'\sr="([A-Z]{1,3})?(\d+)"')
+_XF = re.compile(r"<xf\b[^>]*/>|<xf\b[^>]*>.*?</xf>", re.S)
+_NUMFMT = re.compile(r"<numFmt\b[^>]*?/>")
+# Elemente, vor denen <legacyDrawing> im Blatt stehen muss (Reihenfolge laut Schema)
+_NACH_LEGACY_DRAWING = ("<legacyDrawingHF", "<drawingHF", "<picture", "<oleObjects", "<controls",
+                        "<webPublishItems", "<tableParts", "<extLst", "</worksheet>")
+# Elemente, vor denen <calcPr> in workbook.xml stehen muss
+_NACH_CALCPR = ("<oleSize", "<customWorkbookViews", "<pivotCaches", "<smartTagPr", "<smartTagTypes",
+                "<webPublishing", "<fileRecoveryPr", "<webPublishObjects", "<extLst", "</workbook>")
+
+
+class PatchNichtMoeglich(Exception):
+    pass
+
+
+def _attribute(tag) -> dict:
+    return {k: unescape(v, _ENTITAETEN) for k, v in _ATTRIBUT.findall(tag)}
+
+
+def _entferne_attr(tag, name):
+    return re.sub(rf'\s{re.escape(name)}\s*=\s*"[^"]*"', "", tag)
+
+
+def _setze_attr(tag, name, wert):
+    tag = _entferne_attr(tag, name)
+    ende = -2 if tag.endswith("/>") else -1
+    return f'{tag[:ende].rstrip()} {name}="{wert}"{tag[ende:]}'
+
+
+def _start_tag(xml):
+    return xml[:xml.index(">") + 1]
+
+
+def _fuege_ein_vor(xml, kandidaten, einschub):
+    # einschub vor dem ersten vorhandenen der kandidaten einfügen
+    for marke in kandidaten:
+        pos = xml.find(marke)
+        if pos >= 0:
+            return xml[:pos] + einschub + xml[pos:]
+    raise PatchNichtMoeglich(f"Einfügestelle für {einschub[:30]} nicht gefunden")
+
+
+def _rels_pfad(teil):
+    verzeichnis, name = posixpath.split(teil)
+    return posixpath.join(verzeichnis, "_rels", f"{name}.rels")
+
+
+def _freier_name(vorhanden, muster):
+    nr = 1
+    while muster.format(nr) in vorhanden:
+        nr += 1
+    return muster.format(nr)
+
+
+class _Beziehungen:
+    # .rels-Teil eines Quellteils; Ziele werden als Teilnamen (ohne führenden "/") aufgelöst
+    def __init__(self, xml, quelle):
+        xml = xml or _LEERE_BEZIEHUNGEN
+        self.xml = re.sub(r"<Relationships\b([^>]*?)/>", r"<Relationships\1></Relationships>", xml)
+        self.basis = posixpath.dirname(quelle)
+        self.geaendert = False
+
+    def eintraege(self):
+        return [_attribute(m.group(0)) for m in _BEZIEHUNG.finditer(self.xml)]
+
+    def ziel(self, eintrag):
+        ziel = eintrag.get("Target", "")
+        if ziel.startswith("/"):
+            return ziel[1:]
+        return posixpath.normpath(posixpath.join(self.basis, ziel))
+
+    def nach_typ(self, typ):
+        return [e for e in self.eintraege() if e.get("Type") == typ and e.get("TargetMode") != "External"]
+
+    def fuege_hinzu(self, typ, teil):
+        ids = {e.get("Id") for e in self.eintraege()}
+        rid = _freier_name(ids, "rIdP{}")
+        ziel = posixpath.relpath(teil, self.basis or ".")
+        self.xml = self.xml.replace(
+            "</Relationships>", f'<Relationship Id="{rid}" Type="{typ}" Target="{escape(ziel)}"/></Relationships>'
+        )
+        self.geaendert = True
+        return rid
+
+    def entferne(self, typ):
+        self.xml = _BEZIEHUNG.sub(lambda m: "" if _attribute(m.group(0)).get("Type") == typ else m.group(0), self.xml)
+        self.geaendert = True
+
+
+class _Inhaltstypen:
+    def __init__(self, xml):
+        self.xml = xml
+
+    def typ(self, teil):
+        for m in re.finditer(r"<Override\b[^>]*?/>", self.xml):
+            attr = _attribute(m.group(0))
+            if attr.get("PartName") == f"/{teil}":
+                return attr.get("ContentType")
+        return None
+
+    def override(self, teil, typ):
+        if self.typ(teil) is None:
+            self.xml = self.xml.replace("</Types>", f'<Override PartName="/{escape(teil)}" ContentType="{typ}"/></Types>')
+
+    def default(self, endung, typ):
+        for m in re.finditer(r"<Default\b[^>]*?/>", self.xml):
+            if _attribute(m.group(0)).get("Extension", "").lower() == endung:
+                return
+        self.xml = self.xml.replace("</Types>", f'<Default Extension="{endung}" ContentType="{typ}"/></Types>')
+
+    def entferne(self, teil):
+        self.xml = re.sub(
+            r"<Override\b[^>]*?/>",
+            lambda m: "" if _attribute(m.group(0)).get("PartName") == f"/{teil}" else m.group(0),
+            self.xml,
+        )
+
+
+class _Stile:
+    # styles.xml: für (Original-Stil, Zahlenformat) bei Bedarf eine Kopie des xf mit dem neuen Format anlegen
+    def __init__(self, xml):
+        self.xml = xml
+        m = re.search(r"<cellXfs\b[^>]*>(.*?)</cellXfs>", xml, re.S)
+        if m is None:
+            raise PatchNichtMoeglich("styles.xml ohne cellXfs")
+        self._xfs = _XF.findall(m.group(1))
+        # nur <numFmts> am Anfang, nicht die numFmt-Elemente der dxfs
+        formate = re.search(r"<numFmts\b[^>]*>(.*?)</numFmts>", xml, re.S)
+        self._anzahl_formate = len(_NUMFMT.findall(formate.group(1))) if formate else 0
+        self._formate = {}  # formatCode → numFmtId
+        for tag in _NUMFMT.findall(formate.group(1) if formate else ""):
+            attr = _attribute(tag)
+            self._formate.setdefault(attr.get("formatCode"), int(attr.get("numFmtId", 0)))
+        # neue Nummern auch nicht mit den Formaten der dxfs überschneiden
+        self._max_format_id = max([163, *(int(_attribute(t).get("numFmtId", 0)) for t in _NUMFMT.findall(xml))])
+        self._neue_xfs = []
+        self._neue_formate = []
+        self._cache = {}
+
+    def _format_id(self, code):
+        if code in BUILTIN_FORMATS_REVERSE:
+            return BUILTIN_FORMATS_REVERSE[code]
+        if code not in self._formate:
+            self._max_format_id = nr = self._max_format_id + 1
+            self._formate[code] = nr
+            self._neue_formate.append(f'<numFmt numFmtId="{nr}" formatCode="{escape(code, {chr(34): "&quot;"})}"/>')
+        return self._formate[code]
+
+    def xf(self, basis, code) -> int:
+        schluessel = (basis, code)
+        if schluessel not in self._cache:
+            vorlage = self._xfs[basis] if basis < len(self._xfs) else self._xfs[0]
+            format_id = self._format_id(code)
+            if int(_attribute(_start_tag(vorlage)).get("numFmtId", 0)) == format_id:
+                self._cache[schluessel] = basis
+            else:
+                kopf = _start_tag(vorlage)
+                neu_kopf = _setze_attr(_setze_attr(kopf, "numFmtId", format_id), "applyNumberFormat", 1)
+                self._neue_xfs.append(neu_kopf + vorlage[len(kopf):])
+                self._cache[schluessel] = len(self._xfs) + len(self._neue_xfs) - 1
+        return self._cache[schluessel]
+
+    @property
+    def geaendert(self):
+        return bool(self._neue_xfs or self._neue_formate)
+
+    def text(self):
+        xml = self.xml
+        if self._neue_formate:
+            anzahl = self._anzahl_formate + len(self._neue_formate)
+            neu = "".join(self._neue_formate)
+            if re.search(r"<numFmts\b", xml):
+                xml = re.sub(r"<numFmts\b[^>]*?/>", "<numFmts></numFmts>", xml, count=1)
+                xml = xml.replace("</numFmts>", neu + "</numFmts>", 1)
+                xml = re.sub(r"<numFmts\b[^>]*>", lambda m: _setze_attr(m.group(0), "count", anzahl), xml, count=1)
+            else:
+                # numFmts ist das erste Kind von styleSheet
+                kopf = re.search(r"<styleSheet\b[^>]*>", xml)
+                xml = xml[:kopf.end()] + f'<numFmts count="{anzahl}">{neu}</numFmts>' + xml[kopf.end():]
+        if self._neue_xfs:
+            xml = xml.replace("</cellXfs>", "".join(self._neue_xfs) + "</cellXfs>", 1)
+            xml = re.sub(r"<cellXfs\b[^>]*>",
+                         lambda m: _setze_attr(m.group(0), "count", len(self._xfs) + len(self._neue_xfs)), xml, count=1)
+        return xml
+
+
+def _zelle(ref, cell, stil, epoch):
+    # <c>-Element für eine openpyxl-Zelle, Werte formatiert wie beim Speichern über openpyxl
+    # (Texte als Inline-String, sharedStrings bleibt unverändert)
+    s = f' s="{stil}"' if stil else ""
+    wert = cell.value
+    typ = cell.data_type
+    if typ == "d":
+        wert = to_excel(wert, epoch)
+        typ = "n"
+    elif typ == "f" and not isinstance(wert, str):
+        raise PatchNichtMoeglich(f"{ref}: Array-/Tabellenformel")
+    text = safe_string(wert) if typ == "n" and wert is not None else wert
+    if text is None or text == "":
+        # leer (auch NaN/∞ wie bei openpyxl): nur Stil behalten
+        return f'<c r="{ref}"{s}/>' if stil else ""
+    if typ == "f":
+        return f'<c r="{ref}"{s}><f>{escape(text[1:])}</f></c>'
+    if typ == "s":
+        return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{escape(str(text))}</t></is></c>'
+    if typ == "b":
+        text = int(bool(wert))
+    return f'<c r="{ref}"{s} t="{typ}"><v>{escape(str(text))}</v></c>'
+
+
+def _zeilen_xml(ws, stile, epoch, ab_zeile=1):
+    teile = []
+    for zeile in ws.iter_rows(min_row=ab_zeile):
+        zellen = "".join(
+            _zelle(cell.coordinate, cell,
+                   stile.xf(0, cell.number_format) if cell.number_format != "General" and cell.value is not None else 0,
+                   epoch)
+            for cell in zeile
+        )
+        if zellen:
+            teile.append(f'<row r="{zeile[0].row}">{zellen}</row>')
+    return "".join(teile)
+
+
+def _neues_blatt(ws, stile, epoch):
+    return (f'{_KOPF}<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<dimension ref="{ws.dimensions}"/><sheetData>{_zeilen_xml(ws, stile, epoch)}</sheetData></worksheet>')
+
+
+def _ergaenze_blatt(xml, ws, stile, epoch):
+    # Zeilen hinter der letzten vorhandenen Zeile aus ws anhängen (Blatt wurde nur fortgeschrieben)
+    m = _SHEETDATA.search(xml)
+    if m is None:
+        raise PatchNichtMoeglich("Blatt ohne sheetData")
+    inhalt = m.group(1) or ""
+    letzte = 0
+    for zeile in _ZEILE.finditer(inhalt):
+        ref = _REF.search(_start_tag(zeile.group(0)))
+        if ref is None:
+            raise PatchNichtMoeglich("Zeile ohne Nummer")
+        letzte = int(ref.group(2))
+    neu = _zeilen_xml(ws, stile, epoch, ab_zeile=letzte + 1)
+    xml = xml[:m.start()] + f"<sheetData>{inhalt}{neu}</sheetData>" + xml[m.end():]
+    return re.sub(r"<dimension\b[^>]*?/>", f'<dimension ref="{ws.dimensions}"/>', xml, count=1)
+
+
+def _patche_zeile(zeile_xml, nr, zellen, stile, epoch):
+    # zellen: Spaltennummer → openpyxl-Zelle; vorhandene <c> ersetzen, fehlende in Spaltenreihenfolge einfügen
+    kopf = _start_tag(zeile_xml)
+    inhalt = "" if kopf.endswith("/>") else zeile_xml[len(kopf):-len("</row>")]
+    if kopf.endswith("/>"):
+        kopf = kopf[:-2].rstrip() + ">"
+    vorhanden = {}
+    for m in _ZELLE.finditer(inhalt):
+        ref = _REF.search(_start_tag(m.group(0)))
+        if ref is None or ref.group(1) is None:
+            raise PatchNichtMoeglich(f"Zeile {nr}: Zelle ohne Bezug")
+        vorhanden[column_index_from_string(ref.group(1))] = m.group(0)
+    for spalte, cell in zellen.items():
+        alt = vorhanden.get(spalte, "")
+        if re.search(r'<f\b[^>]*\bt="(?:shared|array)"[^>]*\bref="', alt):
+            raise PatchNichtMoeglich(f"{cell.coordinate}: gemeinsame Formel")
+        basis = int(_attribute(_start_tag(alt)).get("s", 0)) if alt else 0
+        vorhanden[spalte] = _zelle(cell.coordinate, cell, stile.xf(basis, cell.number_format), epoch)
+    return _entferne_attr(kopf, "spans") + "".join(vorhanden[s] for s in sorted(vorhanden)) + "</row>"
+
+
+def _patche_blatt(xml, ws, koordinaten, stile, epoch):
+    # geänderte Zellen des Mieter-Blatts in die Original-XML übernehmen
+    je_zeile = {}
+    for coord in koordinaten:
+        cell = ws[coord]
+        je_zeile.setdefault(cell.row, {})[cell.column] = cell
+    m = _SHEETDATA.search(xml)
+    if m is None:
+        raise PatchNichtMoeglich("Blatt ohne sheetData")
+    inhalt = m.group(1) or ""
+    offen = sorted(je_zeile)
+    i = 0
+    teile = []
+    pos = 0
+    for zeile in _ZEILE.finditer(inhalt):
+        ref = _REF.search(_start_tag(zeile.group(0)))
+        if ref is None:
+            raise PatchNichtMoeglich("Zeile ohne Nummer")
+        nr = int(ref.group(2))
+        teile.append(inhalt[pos:zeile.start()])
+        while i < len(offen) and offen[i] < nr:
+            teile.append(_patche_zeile(f'<row r="{offen[i]}"/>', offen[i], je_zeile[offen[i]], stile, epoch))
+            i += 1
+        if i < len(offen) and offen[i] == nr:
+            teile.append(_patche_zeile(zeile.group(0), nr, je_zeile[nr], stile, epoch))
+            i += 1
+        else:
+            teile.append(zeile.group(0))
+        pos = zeile.end()
+    teile.append(inhalt[pos:])
+    for nr in offen[i:]:
+        teile.append(_patche_zeile(f'<row r="{nr}"/>', nr, je_zeile[nr], stile, epoch))
+    xml = xml[:m.start()] + "<sheetData>" + "".join(teile) + "</sheetData>" + xml[m.end():]
+    return re.sub(r"<dimension\b[^>]*?/>", f'<dimension ref="{ws.dimensions}"/>', xml, count=1)
+
+
+def _kommentare(ws):
+    # Kommentar- und VML-Teil aus den Kommentaren des openpyxl-Blatts (Reihenfolge wie beim Speichern)
+    zellen = sorted((c for c in ws._cells.values() if c.comment is not None), key=lambda c: (c.row, c.column))
+    blatt = CommentSheet.from_comments([CommentRecord.from_cell(c) for c in zellen])
+    vml = blatt.write_shapes(None)
+    return tostring(blatt.to_tree()), vml if isinstance(vml, bytes) else vml.encode("utf-8")
+
+
+def speichere_gepatcht(original_pfad, ziel_pfad, workbook, ws, koordinaten, kommentare=False, blaetter=None):
+    # original_pfad: die geladene XLSX; ws: geändertes Blatt mit den geschriebenen Zellen (koordinaten);
+    # kommentare: Kommentare von ws geändert → Kommentar-/VML-Teil neu;
+    # blaetter: Titel → True (nur neue Zeilen angehängt) / False (vollständig neu geschrieben)
+    blaetter = blaetter or {}
+    with zipfile.ZipFile(original_pfad) as zin:
+        namen = set(zin.namelist())
+
+        def lies(teil):
+            return zin.read(teil).decode("utf-8") if teil in namen else None
+
+        neu = {}  # Teilname → neuer Inhalt (None = entfernen)
+        inhaltstypen = _Inhaltstypen(lies("[Content_Types].xml") or "")
+        paket = _Beziehungen(lies("_rels/.rels"), "")
+        dokument = paket.nach_typ(_TYP_DOKUMENT)
+        if len(dokument) != 1:
+            raise PatchNichtMoeglich("kein eindeutiger Arbeitsmappen-Teil")
+        mappe_pfad = paket.ziel(dokument[0])
+        if inhaltstypen.typ(mappe_pfad) != _CT_MAPPE or not ziel_pfad.lower().endswith(".xlsx"):
+            # z. B. .xlsm: openpyxl verwirft die Makros, der Patch würde sie behalten
+            raise PatchNichtMoeglich("keine einfache XLSX-Arbeitsmappe")
+        mappe = lies(mappe_pfad)
+        mappe_rels_pfad = _rels_pfad(mappe_pfad)
+        mappe_rels = _Beziehungen(lies(mappe_rels_pfad), mappe_pfad)
+        rel_ziele = {e.get("Id"): mappe_rels.ziel(e) for e in mappe_rels.eintraege()}
+
+        # Blätter der Original-Mappe: Titel → Teilname
+        blatt_teile = {}
+        for tag in _BLATT_EINTRAG.findall(mappe):
+            attr = _attribute(tag)
+            rid = next((v for k, v in attr.items() if k.endswith(":id")), None)
+            if rid not in rel_ziele:
+                raise PatchNichtMoeglich(f"Blatt {attr.get('name')} ohne Beziehung")
+            blatt_teile[attr.get("name")] = rel_ziele[rid]
+        if set(blatt_teile) - set(workbook.sheetnames) or set(workbook.sheetnames) - set(blatt_teile) - set(blaetter):
+            raise PatchNichtMoeglich("Blätter hinzugefügt oder entfernt")
+        if ws.title not in blatt_teile or ws.title in blaetter:
+            raise PatchNichtMoeglich(f"Blatt {ws.title} nicht in der Original-Datei")
+
+        stile_teile = mappe_rels.nach_typ(_TYP_STILE)
+        if len(stile_teile) != 1:
+            raise PatchNichtMoeglich("keine styles.xml")
+        stile_pfad = mappe_rels.ziel(stile_teile[0])
+        stile = _Stile(lies(stile_pfad))
+        epoch = workbook.epoch
+
+        # geändertes Blatt: Zellen, ggf. Kommentare/VML
+        teil = blatt_teile[ws.title]
+        blatt_xml = _patche_blatt(lies(teil), ws, koordinaten, stile, epoch)
+        if kommentare:
+            blatt_rels_pfad = _rels_pfad(teil)
+            blatt_rels = _Beziehungen(lies(blatt_rels_pfad), teil)
+            kommentar_teile = blatt_rels.nach_typ(_TYP_KOMMENTARE)
+            vml_teile = blatt_rels.nach_typ(_TYP_VML)
+            if len(kommentar_teile) > 1 or len(vml_teile) > 1:
+                raise PatchNichtMoeglich("mehrere Kommentar-/VML-Teile")
+            if vml_teile:
+                vml_pfad = blatt_rels.ziel(vml_teile[0])
+                vml_alt = lies(vml_pfad) or ""
+                # nur reine Kommentar-VML ersetzen (Formular-Steuerelemente o. Ä. blieben sonst nicht erhalten)
+                formen = re.findall(r"<v:shape\b[^>]*>", vml_alt)
+                if not kommentar_teile or any('type="#_x0000_t202"' not in f for f in formen):
+                    raise PatchNichtMoeglich("VML mit anderen Formen als Kommentaren")
+            else:
+                vml_pfad = _freier_name(namen, "xl/drawings/commentsDrawing{}.vml")
+                rid = blatt_rels.fuege_hinzu(_TYP_VML, vml_pfad)
+                if "<legacyDrawing " in blatt_xml:
+                    raise PatchNichtMoeglich("legacyDrawing ohne Beziehung")
+                blatt_xml = _fuege_ein_vor(blatt_xml, _NACH_LEGACY_DRAWING,
+                                           f'<legacyDrawing xmlns:r="{_NS_BEZIEHUNG}" r:id="{rid}"/>')
+            if kommentar_teile:
+                kommentar_pfad = blatt_rels.ziel(kommentar_teile[0])
+            else:
+                kommentar_pfad = _freier_name(namen, "xl/comments/comment{}.xml")
+                blatt_rels.fuege_hinzu(_TYP_KOMMENTARE, kommentar_pfad)
+            neu[kommentar_pfad], neu[vml_pfad] = _kommentare(ws)
+            inhaltstypen.override(kommentar_pfad, _CT_KOMMENTARE)
+            inhaltstypen.default("vml", _CT_VML)
+            if blatt_rels.geaendert:
+                neu[blatt_rels_pfad] = blatt_rels.xml
+        neu[teil] = blatt_xml
+
+        # neu geschriebene oder ergänzte Blätter; neue Blätter hinter den vorhandenen
+        r_praefix = re.search(rf'xmlns:(\w+)="{re.escape(_NS_BEZIEHUNG)}"', _start_tag(mappe[mappe.index("<workbook"):]))
+        ids = [int(a.get("sheetId", 0)) for a in map(_attribute, _BLATT_EINTRAG.findall(mappe))]
+        for titel in workbook.sheetnames:
+            if titel not in blaetter:
+                continue
+            blatt = workbook[titel]
+            if titel in blatt_teile:
+                pfad = blatt_teile[titel]
+                neu[pfad] = (_ergaenze_blatt(lies(pfad), blatt, stile, epoch) if blaetter[titel]
+                             else _neues_blatt(blatt, stile, epoch))
+                continue
+            pfad = _freier_name(namen | set(neu), "xl/worksheets/sheet{}.xml")
+            neu[pfad] = _neues_blatt(blatt, stile, epoch)
+            rid = mappe_rels.fuege_hinzu(_TYP_BLATT, pfad)
+            inhaltstypen.override(pfad, _CT_BLATT)
+            ids.append(max(ids, default=0) + 1)
+            zustand = f' state="{blatt.sheet_state}"' if blatt.sheet_state != "visible" else ""
+            rid_attr = (f'{r_praefix.group(1)}:id="{rid}"' if r_praefix
+                        else f'xmlns:r="{_NS_BEZIEHUNG}" r:id="{rid}"')
+            eintrag = f'<sheet name="{escape(titel, {chr(34): "&quot;"})}" sheetId="{ids[-1]}"{zustand} {rid_attr}/>'
+            mappe = mappe.replace("</sheets>", eintrag + "</sheets>", 1)
+
+        # Formeln (z. B. Summenspalte) beim Öffnen neu berechnen; die Berechnungskette ist danach veraltet
+        calc = re.search(r"<calcPr\b[^>]*?/?>", mappe)
+        if calc:
+            mappe = mappe[:calc.start()] + _setze_attr(calc.group(0), "fullCalcOnLoad", 1) + mappe[calc.end():]
+        else:
+            mappe = _fuege_ein_vor(mappe, _NACH_CALCPR, '<calcPr fullCalcOnLoad="1"/>')
+        for eintrag in mappe_rels.nach_typ(_TYP_CALCCHAIN):
+            neu[mappe_rels.ziel(eintrag)] = None
+            inhaltstypen.entferne(mappe_rels.ziel(eintrag))
+            mappe_rels.entferne(_TYP_CALCCHAIN)
+        neu[mappe_pfad] = mappe
+        if mappe_rels.geaendert:
+            neu[mappe_rels_pfad] = mappe_rels.xml
+        if stile.geaendert:
+            neu[stile_pfad] = stile.text()
+        neu["[Content_Types].xml"] = inhaltstypen.xml
+
+        # neue ZIP: ersetzte Teile an alter Stelle, übrige Teile unverändert, neue Teile am Ende
+        tmp = f"{ziel_pfad}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename not in neu:
+                        zout.writestr(info, zin.read(info), compress_type=info.compress_type)
+                        continue
+                    inhalt = neu.pop(info.filename)
+                    if inhalt is not None:
+                        zout.writestr(zipfile.ZipInfo(info.filename, info.date_time), inhalt.encode("utf-8")
+                                      if isinstance(inhalt, str) else inhalt, compress_type=zipfile.ZIP_DEFLATED)
+                for teil, inhalt in neu.items():
+                    if inhalt is not None:
+                        zout.writestr(zipfile.ZipInfo(teil, (1980, 1, 1, 0, 0, 0)), inhalt.encode("utf-8")
+                                      if isinstance(inhalt, str) else inhalt, compress_type=zipfile.ZIP_DEFLATED)
+            os.replace(tmp, ziel_pfad)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return ziel_pfad
@@ -0,0 +1,227 @@
+import re
+
+import pandas as pd
+from openpyxl.comments import Comment
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+# Schreibplan für die Monatszellen der Mieterliste: alle zugeordneten Buchungen werden erst im
+# Speicher je Zielzelle (Betrag + Datum/Kommentar) verrechnet – Summe, Duplikatschlüssel und
+# Kommentarzeilen werden fortgeschrieben statt für jede Buchung aus der Zelle zurückgelesen und
+# der Kommentar neu geparst. Am Ende wird jede betroffene Zelle genau einmal geschrieben.
+# Ergebnis identisch zum früheren Schreiben je Buchung (inkl. Reihenfolge der Kommentarzeilen).
+
+BETRAG_FORMAT = "#,##0.00"
+DATUM_FORMAT = "DD.MM.YYYY"
+KOMMENTAR_AUTOR = "System"
+
+_KOMMENTAR_ZEILE = re.compile(r"(\d{1,2}\.\d{1,2}(?:\.\d{2,4})?)\s*(?:\[(.*?)\])?\s*:\s*([+-]?\d+(?:[.,]\d+)?)")
+_DDMMYYYY = re.compile(r"^(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?$")
+
+
+def norm_ddmmyyyy(s: str) -> str:
+    s = (s or "").strip()
+    m = _DDMMYYYY.match(s)
+    if not m:
+        return s
+    d = int(m.group(1)); mth = int(m.group(2)); yr = m.group(3)
+    if yr is None:
+        return f"{d:02d}.{mth:02d}"
+    return f"{d:02d}.{mth:02d}.{int(yr):04d}"
+
+
+def parse_amount_cell(val) -> float:
+    if val is None:
+        return 0.0
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).replace(".", "").replace(",", ".")
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
+
+
+def _parse_zeile(line: str):
+    # (Datum normiert, Betrag, Datum wie angezeigt, Suchwort) oder None
+    m = _KOMMENTAR_ZEILE.search(line)
+    if not m:
+        return None
+    try:
+        amt = round(float(m.group(3).replace(".", "").replace(",", ".")), 2)
+    except Exception:
+        return None
+    return (norm_ddmmyyyy(m.group(1)), amt, m.group(1), (m.group(2) or "").strip())
+
+
+def parse_pairs(txt: str):
+    pairs = []
+    seen = set()
+    if not txt:
+        return pairs
+    for line in txt.splitlines():
+        pair = _parse_zeile(line)
+        if pair is None or pair[:2] in seen:
+            continue
+        seen.add(pair[:2])
+        pairs.append(pair)
+    return pairs
+
+
+def _betrag_text(betrag: float) -> str:
+    return str(f"{betrag:.2f}").replace(".", ",")
+
+
+def _zeile(tag: str, kword: str, betrag: float) -> str:
+    # Kommentarzeile „DD.MM.YYYY [Suchwort]: 123,45 EUR“
+    if kword:
+        tag += f" [{kword}]"
+    return f"{tag}: {_betrag_text(betrag)} EUR"
+
+
+def _datum_text(wert) -> str:
+    return wert.strftime("%d.%m.%Y") if hasattr(wert, "strftime") else (str(wert) if wert else "")
+
+
+def datum_wert(datum):
+    # Zellwert (echtes Datum, bei fehlendem Datum None) und Anzeige DD.MM.YYYY für den Kommentar
+    if pd.isna(datum):
+        return None, ""
+    py_dt = datum.to_pydatetime() if hasattr(datum, "to_pydatetime") else datum
+    return py_dt.date(), py_dt.strftime("%d.%m.%Y")
+
+
+def verbundene_zellen(worksheet, spalten) -> dict:
+    # Koordinate → linke obere Zelle des verbundenen Bereichs, nur für die angegebenen Spalten.
+    # Ersetzt die lineare Suche über alle verbundenen Bereiche je Zugriff.
+    spalten_nr = sorted({column_index_from_string(s) for s in spalten})
+    lookup = {}
+    for bereich in worksheet.merged_cells.ranges:
+        oben_links = f"{get_column_letter(bereich.min_col)}{bereich.min_row}"
+        for col in spalten_nr:
+            if col < bereich.min_col or col > bereich.max_col:
+                continue
+            buchstabe = get_column_letter(col)
+            for row in range(bereich.min_row, bereich.max_row + 1):
+                coord = f"{buchstabe}{row}"
+                if coord != oben_links:
+                    lookup[coord] = oben_links
+    return lookup
+
+
+class _DatumZelle:
+    __slots__ = ("wert", "pairs", "seen", "zeilen", "kommentar", "geschrieben")
+
+    def __init__(self, cell):
+        self.wert = cell.value
+        self.pairs = parse_pairs(cell.comment.text if cell.comment else "")
+        self.seen = {p[:2] for p in self.pairs}
+        # zeilen[i] = formatierte Kommentarzeile zu pairs[i]
+        self.zeilen = [_zeile(disp, kword, amt) for (_, amt, disp, kword) in self.pairs]
+        # None = unverändert, sonst (Anzahl übernommener Zeilen, Startzeile, neue Zeile) bzw. False = löschen
+        self.kommentar = None
+        self.geschrieben = False
+
+    def _uebernimm(self, line):
+        pair = _parse_zeile(line)
+        if pair is None or pair[:2] in self.seen:
+            return
+        self.seen.add(pair[:2])
+        self.pairs.append(pair)
+        self.zeilen.append(_zeile(pair[2], pair[3], pair[1]))
+
+    def kommentar_text(self):
+        anzahl, start, neu = self.kommentar
+        lines = self.zeilen[:anzahl]
+        if start:
+            lines.append(start)
+        lines.append(neu)
+        return "\n".join(lines)
+
+
+class ZellPlan:
+    def __init__(self, worksheet, spalten):
+        self.worksheet = worksheet
+        self._verbunden = verbundene_zellen(worksheet, spalten)
+        self._betraege = {}
+        self._geaendert = set()
+        self._daten = {}
+        # nach schreibe(): geschriebene Koordinaten und ob sich Kommentare geändert haben (für xlsx_patch)
+        self.geschrieben = []
+        self.kommentare_geaendert = False
+
+    def _betrag(self, coord) -> float:
+        coord = self._verbunden.get(coord, coord)
+        if coord not in self._betraege:
+            self._betraege[coord] = parse_amount_cell(self.worksheet[coord].value)
+        return self._betraege[coord]
+
+    def _datum(self, coord) -> _DatumZelle:
+        coord = self._verbunden.get(coord, coord)
+        zelle = self._daten.get(coord)
+        if zelle is None:
+            zelle = self._daten[coord] = _DatumZelle(self.worksheet[coord])
+        return zelle
+
+    def buche(self, betrag_coord, datum_coord, new_key, betrag, datum_neu, kw) -> bool:
+        # Eine Buchung in den Plan übernehmen; False, wenn sie als Duplikat übersprungen wird
+        datum = self._datum(datum_coord)
+        existing_amount = self._betrag(betrag_coord)
+        prev_wert = datum.wert
+
+        # 1) Duplikat prüfen gegen vorhandene Kommentar-Paare
+        if new_key in datum.seen:
+            return False
+        # 2) Duplikat prüfen gegen erste Einzelbuchung ohne Kommentar
+        if (existing_amount > 0.0) and not datum.pairs:
+            prev_key = (norm_ddmmyyyy(_datum_text(prev_wert)), round(existing_amount, 2))
+            if prev_key == new_key:
+                return False
+
+        # Betrag addieren und Datum setzen
+        betrag_coord = self._verbunden.get(betrag_coord, betrag_coord)
+        self._betraege[betrag_coord] = existing_amount + float(betrag)
+        self._geaendert.add(betrag_coord)
+        datum.wert, written_date_str = datum_wert(datum_neu)
+        datum.geschrieben = True
+
+        # Kommentar nur bei „zweitem+“ Eintrag im selben Monat
+        if (existing_amount > 0.0) or datum.pairs:
+            neu = _zeile(written_date_str, kw, float(betrag))
+            if datum.pairs:
+                datum.kommentar = (len(datum.zeilen), None, neu)
+            else:
+                # Es gab bereits einen Betrag, aber noch keinen Kommentar → mit bisherigem Datum/Betrag seeden
+                prev_str = _datum_text(prev_wert)
+                start = f"{prev_str}: {_betrag_text(existing_amount)} EUR" if prev_str else None
+                datum.kommentar = (0, start, neu)
+                if start:
+                    datum._uebernimm(start)
+            datum._uebernimm(neu)
+        else:
+            # Beim ersten Eintrag keinen Kommentar hinterlegen
+            datum.kommentar = False
+        return True
+
+    def schreibe(self) -> int:
+        # jede betroffene Zelle genau einmal schreiben; Rückgabe: Anzahl geschriebener Zellen
+        anzahl = len(self._geaendert)
+        for coord in self._geaendert:
+            cell = self.worksheet[coord]
+            cell.value = self._betraege[coord]
+            cell.number_format = BETRAG_FORMAT
+            self.geschrieben.append(coord)
+        for coord, datum in self._daten.items():
+            if not datum.geschrieben:
+                continue
+            anzahl += 1
+            cell = self.worksheet[coord]
+            cell.value = datum.wert
+            cell.number_format = DATUM_FORMAT
+            self.geschrieben.append(coord)
+            if datum.kommentar is False:
+                self.kommentare_geaendert |= cell.comment is not None
+                cell.comment = None
+            elif datum.kommentar is not None:
+                cell.comment = Comment(datum.kommentar_text(), KOMMENTAR_AUTOR)
+                self.kommentare_geaendert = True
+        return anzahl
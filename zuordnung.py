@@ -0,0 +1,195 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# Zuordnung Buchung → Mieter über Indizes statt einer Suche je Mieter über alle Buchungen:
+# - exakte Treffer (normalisierter Zahlender == Spalte A) über eine Hash-Map
+# - Behördenfall (Mietername aus Spalte B als Teilstring im Verwendungszweck) über einen
+#   Aho-Corasick-Automaten, der alle Mieternamen gleichzeitig sucht.
+# Jede Buchung wird damit genau einmal durchsucht – unabhängig von der Anzahl der Mieter.
+# Optional zusätzlich unscharf (siehe unten) für Zahlende ohne exakten Treffer.
+
+
+def baue_payee_index(norm_payee: pd.Series) -> dict:
+    # normalisierter Zahlender → Positionen (iloc, aufsteigend) in der Trefferliste
+    codes, uniques = pd.factorize(norm_payee.fillna("").astype(str), sort=False)
+    if len(codes) == 0:
+        return {}
+    reihenfolge = np.argsort(codes, kind="stable")
+    grenzen = np.flatnonzero(np.diff(codes[reihenfolge])) + 1
+    index = {}
+    for gruppe in np.split(reihenfolge, grenzen):
+        code = codes[gruppe[0]]
+        if code >= 0:
+            index[uniques[code]] = gruppe
+    return index
+
+
+class AhoCorasick:
+    # Mehrfach-Mustersuche: findet in einem Durchlauf über den Text alle enthaltenen Muster
+    # (auch überlappende), Laufzeit O(Textlänge + Anzahl Treffer).
+
+    def __init__(self, muster):
+        # doppelte Muster nur einmal (dict.fromkeys: Reihenfolge bleibt, Prüfung in O(1))
+        self.muster = [m for m in dict.fromkeys(muster) if m]
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for nr, m in enumerate(self.muster):
+            self._fuege_ein(m, nr)
+        self._baue_fehlerkanten()
+
+    def _fuege_ein(self, wort, nr):
+        zustand = 0
+        for ch in wort:
+            nxt = self._goto[zustand].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[zustand][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            zustand = nxt
+        self._out[zustand].append(nr)
+
+    def _baue_fehlerkanten(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            zustand = queue.popleft()
+            for ch, nxt in self._goto[zustand].items():
+                queue.append(nxt)
+                f = self._fail[zustand]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finde(self, text: str) -> set:
+        # Nummern aller Muster, die in `text` vorkommen
+        gefunden = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        zustand = 0
+        for ch in text:
+            while zustand and ch not in goto[zustand]:
+                zustand = fail[zustand]
+            zustand = goto[zustand].get(ch, 0)
+            if out[zustand]:
+                gefunden.update(out[zustand])
+        return gefunden
+
+
+def baue_teilstring_index(texte: pd.Series, muster) -> dict:
+    # Muster → Positionen (iloc, aufsteigend) aller Texte, die das Muster enthalten
+    automat = AhoCorasick(muster)
+    if not automat.muster:
+        return {}
+    index = {m: [] for m in automat.muster}
+    codes, uniques = pd.factorize(texte.fillna("").astype(str), sort=False)
+    treffer_je_text = [automat.finde(u) for u in uniques]
+    for pos, code in enumerate(codes):
+        if code < 0:
+            continue
+        for nr in treffer_je_text[code]:
+            index[automat.muster[nr]].append(pos)
+    return {m: np.asarray(p, dtype=np.intp) for m, p in index.items()}
+
+
+# Unscharfe Zuordnung (optional): Zahlende ohne exakten Treffer werden über einen Trigramm-Index der
+# Mieternamen (Spalte A) einem Mieter zugeordnet, wenn die Ähnlichkeit die Schwelle erreicht und der
+# nächstbeste Mieter deutlich schlechter abschneidet. Kandidaten kommen nur über gemeinsame, nicht zu
+# häufige Trigramme in Frage; bewertet wird je Kandidat über Trigramm-Mengen (Dice-Koeffizient und
+# Anteil des Mieternamens, der im Zahlenden vorkommt) – damit zählen Wortreihenfolge und Zusätze wie
+# "u. Petra" kaum.
+
+UNSCHARF_SCHWELLE = 0.8
+UNSCHARF_ABSTAND = 0.05     # Mindestvorsprung vor dem zweitbesten Mieter
+UNSCHARF_BLATT = "unscharfe_treffer"
+UNSCHARF_KOPF = ["Zahlender", "Mieter", "Mieterzeile", "Ähnlichkeit", "Buchungen", "Status"]
+
+_MAX_KANDIDATEN = 20
+_HAEUFIG_ANTEIL = 0.05      # Trigramme in mehr als 5 % der Namen (mind. 50) blocken nicht
+# ausgeschriebene Umlaute und ß angleichen: "Müller" (mueller) ≈ "Muller"
+_FALTUNG = (("ae", "a"), ("oe", "o"), ("ue", "u"), ("ss", "s"))
+
+
+def trigramme(text: str) -> frozenset:
+    # Trigramme je Wort mit Wortgrenzen: "hans" → " ha", "han", "ans", "ns "
+    for alt, neu in _FALTUNG:
+        text = text.replace(alt, neu)
+    tri = set()
+    for wort in text.split():
+        w = f" {wort} "
+        tri.update(w[i:i + 3] for i in range(len(w) - 2))
+    return frozenset(tri)
+
+
+def aehnlichkeit(zahlender: frozenset, mieter: frozenset) -> float:
+    # Mittel aus Dice-Koeffizient und Abdeckung des Mieternamens, 0…1
+    if not zahlender or not mieter:
+        return 0.0
+    gemeinsam = len(zahlender & mieter)
+    return (2 * gemeinsam / (len(zahlender) + len(mieter)) + gemeinsam / len(mieter)) / 2
+
+
+class UnscharfIndex:
+    def __init__(self, namen):
+        # namen: normalisierte Mieternamen
+        self.namen = list(dict.fromkeys(n for n in namen if n))
+        self._trigramme = [trigramme(n) for n in self.namen]
+        postings = {}
+        for nr, tri in enumerate(self._trigramme):
+            for t in tri:
+                postings.setdefault(t, []).append(nr)
+        grenze = max(50, int(len(self.namen) * _HAEUFIG_ANTEIL))
+        self._postings = {t: p for t, p in postings.items() if len(p) <= grenze}
+
+    def kandidaten(self, text: str) -> list:
+        # [(Ähnlichkeit, Name)] absteigend, höchstens _MAX_KANDIDATEN
+        tri = trigramme(text)
+        zaehler = {}
+        for t in tri:
+            for nr in self._postings.get(t, ()):
+                zaehler[nr] = zaehler.get(nr, 0) + 1
+        vorauswahl = sorted(zaehler, key=lambda nr: (-zaehler[nr], nr))[:_MAX_KANDIDATEN]
+        bewertet = [(aehnlichkeit(tri, self._trigramme[nr]), self.namen[nr]) for nr in vorauswahl]
+        return sorted(bewertet, key=lambda x: -x[0])
+
+    def ordne_zu(self, text: str, schwelle=UNSCHARF_SCHWELLE, abstand=UNSCHARF_ABSTAND):
+        # (Name, Ähnlichkeit, eindeutig) des besten Kandidaten oder None unterhalb der Schwelle
+        kandidaten = self.kandidaten(text)
+        if not kandidaten or kandidaten[0][0] < schwelle:
+            return None
+        wert, name = kandidaten[0]
+        eindeutig = len(kandidaten) == 1 or kandidaten[1][0] <= wert - abstand
+        return name, wert, eindeutig
+
+
+def ordne_unscharf_zu(zahlende, mieter_namen, schwelle=UNSCHARF_SCHWELLE) -> dict:
+    # normalisierter Zahlender → (Mietername, Ähnlichkeit, eindeutig) für alle Zahlenden über der Schwelle
+    index = UnscharfIndex(mieter_namen)
+    if not index.namen:
+        return {}
+    ergebnis = {}
+    for zahlender in zahlende:
+        if not zahlender:
+            continue
+        treffer = index.ordne_zu(zahlender, schwelle)
+        if treffer is not None:
+            ergebnis[zahlender] = treffer
+    return ergebnis
+
+
+def schreibe_unscharf_bericht(workbook, zeilen, anhaengen=False):
+    # Blatt mit den unscharfen Zuordnungen (inkrementell: an vorhandenes Blatt anhängen)
+    if UNSCHARF_BLATT in workbook.sheetnames and anhaengen:
+        ws = workbook[UNSCHARF_BLATT]
+    else:
+        if UNSCHARF_BLATT in workbook.sheetnames:
+            del workbook[UNSCHARF_BLATT]
+        ws = workbook.create_sheet(UNSCHARF_BLATT)
+        ws.append(UNSCHARF_KOPF)
+    for zeile in zeilen:
+        ws.append(list(zeile))
+    return ws